@@ -1,6 +1,9 @@
 const API_URL = 'https://stationary-app-production.up.railway.app/api';
 let currentProductId = null;
 let deleteProductId = null;
+// Local catalog copy kept current via /products/changes
+let productIndex = new Map();
+let catalogSince = null;
 
 // Initialize
 document.addEventListener('DOMContentLoaded', function() {
@@ -15,6 +18,7 @@ document.addEventListener('DOMContentLoaded', function() {
     closeBtn.addEventListener('click', () => closeProductModal());
     document.getElementById('cancelBtn').addEventListener('click', () => closeProductModal());
     document.getElementById('productForm').addEventListener('submit', saveProduct);
+    document.getElementById('productImageFile').addEventListener('change', uploadImage);
     
     // Delete modal controls
     document.getElementById('cancelDeleteBtn').addEventListener('click', () => {
@@ -41,12 +45,12 @@ async function loadProducts() {
     try {
         loading.style.display = 'block';
         
-        const response = await fetch(`${API_URL}/products`);
+        const query = catalogSince ? `?since=${encodeURIComponent(catalogSince)}` : '';
+        const response = await fetch(`${API_URL}/products/changes${query}`);
         const data = await response.json();
         
         if (response.ok) {
-            const products = data.products || [];
-            displayProducts(products);
+            displayProducts(applyProductChanges(data));
         } else {
             showToast(data.error || 'Failed to load products', 'error');
         }
@@ -58,6 +62,20 @@ async function loadProducts() {
     }
 }
 
+// Merge a change set into the local catalog copy and return it sorted
+function applyProductChanges(data) {
+    if (data.reset) {
+        productIndex = new Map();
+    }
+    (data.products || []).forEach(product => productIndex.set(product.id, product));
+    (data.deleted || []).forEach(id => productIndex.delete(id));
+    catalogSince = data.since;
+    
+    return Array.from(productIndex.values()).sort((a, b) =>
+        (Date.parse(b.created_at) - Date.parse(a.created_at)) || (b.id - a.id)
+    );
+}
+
 // Display products in table
 function displayProducts(products) {
     const tbody = document.getElementById('productsTableBody');
@@ -75,7 +93,7 @@ function displayProducts(products) {
     }
     
     tbody.innerHTML = products.map(product => {
-        const imageUrl = product.image_url || 'https://via.placeholder.com/60x60?text=No+Image';
+        const imageUrl = imageVariant(product.image_url, 'thumb') || 'https://via.placeholder.com/60x60?text=No+Image';
         const stockClass = product.stock === 0 ? 'out-of-stock' : (product.stock < 10 ? 'low-stock' : 'in-stock');
         
         return `
@@ -189,6 +207,41 @@ async function saveProduct(e) {
     }
 }
 
+// Upload an image file to the local image store and use its URL
+async function uploadImage(e) {
+    const file = e.target.files[0];
+    if (!file) return;
+    
+    const formData = new FormData();
+    formData.append('image', file);
+    
+    try {
+        const response = await fetch(`${API_URL}/images`, {
+            method: 'POST',
+            body: formData
+        });
+        const data = await response.json();
+        
+        if (response.ok) {
+            document.getElementById('productImage').value = data.url;
+            showToast('Image uploaded successfully!', 'success');
+        } else {
+            showToast(data.error || 'Failed to upload image', 'error');
+        }
+    } catch (error) {
+        console.error('Error uploading image:', error);
+        showToast('Failed to upload image. Please try again.', 'error');
+    } finally {
+        e.target.value = '';
+    }
+}
+
+// Map a locally stored image URL to one of its pre-generated variants
+function imageVariant(url, variant) {
+    const match = url && url.match(/^(.*\/api\/images\/[0-9a-f]{64})\.\w+$/);
+    return match ? `${match[1]}/${variant}.webp` : url;
+}
+
 // Edit product
 async function editProduct(productId) {
     try {
@@ -9,6 +9,24 @@ def create_app():
     
     # Enable CORS
     CORS(app)
+
+    # Encode the compact row objects hot queries return as JSON objects
+    from app.models.rows import RowJSONProvider
+    app.json = RowJSONProvider(app)
+
+    # Structured, sampled request logging drained by a background thread
+    from app.models import db
+    from app.services import request_log
+    request_log.init_app(app, 'backend', db_timer=(db.reset_db_time, db.get_db_time))
+
+    # One pooled connection per shard for all DB calls of a request
+    from app.services import unit_of_work
+    unit_of_work.init_app(app)
+
+    # Head-sampled request/DB tracing exported to a rotating OTLP JSON file
+    from app.services import tracing
+    if tracing.TRACING_ENABLED:
+        tracing.init_app(app, 'backend')
     
     # Register blueprints
     try:
@@ -30,6 +48,14 @@ def create_app():
         # Register orders blueprint
         from app.routes.orders import orders_bp
         app.register_blueprint(orders_bp)
+
+        # Register admin analytics blueprint
+        from app.routes.admin import admin_bp
+        app.register_blueprint(admin_bp)
+
+        # Register product images blueprint
+        from app.routes.images import images_bp
+        app.register_blueprint(images_bp)
         
         app.logger.info("All blueprints registered successfully")
     except Exception as e:
@@ -45,5 +71,9 @@ def create_app():
         app.logger.error(f"Error initializing database: {e}")
         # Don't raise - allow app to start even if DB init fails
         # Routes will handle DB errors gracefully
+
+    # Start refreshing readiness status before the first probe arrives
+    from app.services.health import monitor
+    monitor.start()
     
     return app
\ No newline at end of file
@@ -0,0 +1,297 @@
+"""ASGI serving mode: async handlers in front of the Flask app.
+
+The shop's hot API routes (products, cart including add to cart, checkout,
+orders and registration) have coroutine handlers, registered on a
+``Router`` the way Flask routes are registered on a blueprint. They share
+validation with the Flask routes (``app.routes.validation``) and reach
+MySQL through ``app.models.aio``, so a worker holds thousands of open
+requests while only a few database threads work. Health probes are
+answered on the event loop itself. Every other request is handed to the
+Flask app on a separate fallback thread, so the whole API is served either
+way. This includes CORS preflights, admin, images and bulk product updates.
+Fallback responses are streamed chunk by chunk as the WSGI app yields
+them, so large exports are never held in memory.
+
+Run it with uvicorn workers under the usual gunicorn config::
+
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \\
+        gunicorn -c gunicorn.conf.py asgi:app
+"""
+import asyncio
+import io
+import json
+import logging
+import re
+import sys
+import time
+from urllib.parse import parse_qsl, unquote_plus
+
+from flask_cors.core import get_cors_headers, get_cors_options, parse_resources, try_match
+from werkzeug.datastructures import Headers
+from werkzeug.exceptions import BadRequest, HTTPException, UnsupportedMediaType
+
+from app.models import aio
+from app.services import request_log
+
+logger = logging.getLogger(__name__)
+
+_CONVERTERS = {'int': (r'\d+', int), 'string': (r'[^/]+', str)}
+
+
+class Request:
+    """The parts of an ASGI HTTP request the handlers use."""
+
+    __slots__ = ('method', 'path', 'args', 'headers', 'body', 'scope', 'dumps')
+
+    def __init__(self, scope, body, dumps=json.dumps):
+        self.scope = scope
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = dict(parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True))
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                        for name, value in scope['headers']}
+        self.body = body
+        # Encodes a payload exactly as the native response will
+        self.dumps = dumps
+
+    def get_json(self):
+        """Decode a JSON body like Flask's ``get_json``.
+
+        Raises ``UnsupportedMediaType`` (415) unless the content type is
+        JSON and ``BadRequest`` (400) if the body does not parse, which the
+        app turns into the same error pages Flask sends.
+        """
+        mimetype = self.headers.get('content-type', '').split(';', 1)[0].strip().lower()
+        if not (mimetype == 'application/json'
+                or (mimetype.startswith('application/') and mimetype.endswith('+json'))):
+            raise UnsupportedMediaType(
+                "Did not attempt to load JSON data because the request"
+                " Content-Type was not 'application/json'."
+            )
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            raise BadRequest()
+
+    def get_int_arg(self, name):
+        try:
+            return int(self.args[name])
+        except (KeyError, ValueError):
+            return None
+
+
+class Router:
+    """Route table for coroutine handlers, with Flask-style rules."""
+
+    def __init__(self):
+        self.routes = []
+
+    def route(self, rule, methods=('GET',)):
+        """Register ``async def handler(request, **params) -> (payload, status)``."""
+        converters = {}
+
+        def replace(match):
+            kind, name = match.group(1) or 'string', match.group(2)
+            pattern, converters[name] = _CONVERTERS[kind]
+            return f'(?P<{name}>{pattern})'
+
+        pattern = re.compile('^' + re.sub(r'<(?:(\w+):)?(\w+)>', replace, rule) + '$')
+
+        def decorator(handler):
+            self.routes.append((set(methods), pattern, converters, rule, handler))
+            return handler
+        return decorator
+
+    def match(self, method, path):
+        for methods, pattern, converters, rule, handler in self.routes:
+            if method not in methods:
+                continue
+            found = pattern.match(path)
+            if found:
+                params = {name: converters[name](value) for name, value in found.groupdict().items()}
+                return rule, handler, params
+        return None
+
+
+class CorsHeaders:
+    """The headers flask-cors would add to a response of ``flask_app``.
+
+    ``create_app`` configures flask-cors only through the app config
+    (``CORS_*`` keys), which is read here the same way ``CORS.init_app``
+    reads it, so native responses carry identical headers: the request's
+    Origin echoed back plus ``Vary: Origin`` by default.
+    """
+
+    def __init__(self, flask_app):
+        options = get_cors_options(flask_app)
+        self.resources = [
+            (pattern, get_cors_options(flask_app, options, resource_options))
+            for pattern, resource_options in parse_resources(options.get('resources'))
+        ]
+
+    def __call__(self, scope):
+        path = unquote_plus(scope['path'])
+        for pattern, options in self.resources:
+            if try_match(path, pattern):
+                request_headers = Headers([
+                    (name.decode('latin-1'), value.decode('latin-1'))
+                    for name, value in scope['headers']
+                ])
+                cors = get_cors_headers(options, request_headers, scope['method'])
+                return [
+                    (name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in cors.items()
+                ]
+        return []
+
+
+class AsgiApp:
+    """ASGI application serving ``router``'s routes natively and the rest through Flask."""
+
+    def __init__(self, flask_app, router):
+        self.flask_app = flask_app
+        self.router = router
+        self.cors_headers = CorsHeaders(flask_app)
+        self.request_logger = logging.getLogger('backend.requests')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # Queued database calls finish first
+                await asyncio.get_running_loop().run_in_executor(None, aio.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        found = self.router.match(scope['method'], scope['path'])
+        if found is None:
+            loop = asyncio.get_running_loop()
+
+            def send_from_thread(message):
+                asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+            await aio.run_fallback(self._call_flask, scope, bytes(body), send_from_thread)
+            return
+
+        rule, handler, params = found
+        started = time.perf_counter()
+        aio.start_request_timer()
+        request = Request(scope, bytes(body), self.dumps)
+        extra_headers = []
+        try:
+            payload, status, *extra = await handler(request, **params)
+            if extra:
+                extra_headers = extra[0]
+            # Already encoded JSON, such as a stored idempotent response
+            content = payload if isinstance(payload, bytes) else self.dumps(payload).encode()
+            headers = [(b'content-type', b'application/json')]
+        except HTTPException as e:
+            status, content = e.code, e.get_body().encode()
+            headers = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in e.get_headers()
+            ]
+        except Exception as e:
+            logger.exception('Unhandled error in ASGI handler', extra={'route': rule})
+            status, content = 500, self.dumps({'error': str(e)}).encode()
+            headers = [(b'content-type', b'application/json')]
+        headers += [*extra_headers, *self.cors_headers(scope)]
+        await _respond(send, status, headers, content)
+        request_log.log_request(
+            self.request_logger, rule, scope['method'], status,
+            (time.perf_counter() - started) * 1000, aio.get_request_db_time(),
+        )
+
+    def dumps(self, payload):
+        """Encode ``payload`` the way ``jsonify`` does in the Flask app."""
+        provider = self.flask_app.json
+        if (provider.compact is None and self.flask_app.debug) or provider.compact is False:
+            return provider.dumps(payload, indent=2) + '\n'
+        return provider.dumps(payload, separators=(',', ':')) + '\n'
+
+    def _call_flask(self, scope, body, send):
+        """Run one request through the Flask app, streaming its response with ``send``.
+
+        Runs on a fallback thread; ``send`` blocks until the event loop has
+        sent each message, so a slow client slows the WSGI iterator down.
+        """
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': scope['path'],
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name != 'CONTENT_LENGTH':
+                key = f'HTTP_{name}'
+                environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+            ]
+
+        result = self.flask_app(environ, start_response)
+        try:
+            send({'type': 'http.response.start', 'status': response['status'],
+                  'headers': response['headers']})
+            for chunk in result:
+                if chunk:
+                    send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+
+async def _respond(send, status, headers, content):
+    headers = [(name, value) for name, value in headers if name != b'content-length']
+    headers.append((b'content-length', str(len(content)).encode()))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': content})
+
+
+def create_asgi_app():
+    """Create the Flask app and wrap it with the async routes."""
+    from app import create_app
+    from app.routes.async_routes import router
+    return AsgiApp(create_app(), router)
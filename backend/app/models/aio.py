@@ -0,0 +1,129 @@
+"""Asyncio access to the database layer for the ASGI app.
+
+mysql-connector-python 8.2 has no asyncio protocol, so coroutines reach
+MySQL through a fixed set of threads, each running ordinary ``db`` calls
+on the existing pools. Requests waiting for the database cost a suspended
+coroutine rather than a blocked worker; the thread count bounds how many
+run against MySQL at once, and the rest queue in the event loop.
+
+``run`` executes a function (usually several ``db`` calls) in its own
+unit of work, so it checks out one connection per shard, just like a
+Flask request. ``run_fallback`` runs requests handed to the Flask app on a
+separate, small set of threads, so slow ones (exports, uploads) never hold
+up the async handlers' database calls. Both sets share the pools: keep
+ASGI_DB_THREADS plus ASGI_FALLBACK_THREADS near half of MYSQL_POOL_SIZE,
+because id allocation can briefly borrow a second connection from the same
+pool (see ``db.UnitOfWork``) and an exhausted pool fails instead of waiting.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
+from functools import partial
+from threading import Lock
+
+from . import db
+
+ASGI_DB_THREADS = int(os.environ.get('ASGI_DB_THREADS', max(db.POOL_SIZE // 2, 1)))
+# Threads running requests through the Flask app (see ``app.asgi``)
+ASGI_FALLBACK_THREADS = int(os.environ.get('ASGI_FALLBACK_THREADS', 1))
+
+_EXECUTOR_THREADS = {'db': ASGI_DB_THREADS, 'fallback': ASGI_FALLBACK_THREADS}
+_executors = {}
+_executor_lock = Lock()
+_stats_lock = Lock()
+_stats = {'calls': 0, 'waiting': 0, 'wait_seconds': 0.0, 'fallback_calls': 0, 'fallback_waiting': 0}
+# Database seconds of the current request, summed across its ``run`` calls
+_request_db_seconds = ContextVar('request_db_seconds', default=None)
+
+
+def _get_executor(name='db'):
+    executor = _executors.get(name)
+    if executor is None:
+        with _executor_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                executor = _executors[name] = ThreadPoolExecutor(
+                    max_workers=_EXECUTOR_THREADS[name], thread_name_prefix=name,
+                )
+    return executor
+
+
+def _in_unit_of_work(func, args, kwargs, queued_at):
+    with _stats_lock:
+        _stats['wait_seconds'] += time.perf_counter() - queued_at
+    db.reset_db_time()
+    db.begin_unit_of_work()
+    try:
+        return func(*args, **kwargs), db.get_db_time()
+    finally:
+        db.end_unit_of_work()
+
+
+async def run(func, *args, **kwargs):
+    """Run ``func`` on a database thread in its own unit of work; await its result."""
+    loop = asyncio.get_running_loop()
+    _stats['calls'] += 1
+    _stats['waiting'] += 1
+    try:
+        # The copied context carries the request's tracing span to the thread
+        result, db_seconds = await loop.run_in_executor(
+            _get_executor(),
+            copy_context().run,
+            partial(_in_unit_of_work, func, args, kwargs, time.perf_counter()),
+        )
+    finally:
+        _stats['waiting'] -= 1
+    timer = _request_db_seconds.get()
+    if timer is not None:
+        timer[0] += db_seconds
+    return result
+
+
+async def run_fallback(func, *args):
+    """Run ``func`` on a fallback thread without a unit of work.
+
+    For code that binds its own, such as a Flask request.
+    """
+    loop = asyncio.get_running_loop()
+    _stats['fallback_calls'] += 1
+    _stats['fallback_waiting'] += 1
+    try:
+        return await loop.run_in_executor(
+            _get_executor('fallback'), copy_context().run, partial(func, *args),
+        )
+    finally:
+        _stats['fallback_waiting'] -= 1
+
+
+def start_request_timer():
+    """Start summing database time for the request running in this task."""
+    _request_db_seconds.set([0.0])
+
+
+def get_request_db_time():
+    timer = _request_db_seconds.get()
+    return timer[0] if timer is not None else 0.0
+
+
+def get_stats():
+    """Return call counts, calls in flight or queued, and total queue wait."""
+    return {
+        'threads': ASGI_DB_THREADS,
+        'calls': _stats['calls'],
+        'waiting': _stats['waiting'],
+        'wait_seconds': round(_stats['wait_seconds'], 3),
+        'fallback_threads': ASGI_FALLBACK_THREADS,
+        'fallback_calls': _stats['fallback_calls'],
+        'fallback_waiting': _stats['fallback_waiting'],
+    }
+
+
+def shutdown():
+    """Finish queued calls and stop the database and fallback threads."""
+    with _executor_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=True)
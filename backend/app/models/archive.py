@@ -0,0 +1,73 @@
+"""Cold storage for archived order partitions.
+
+Each archived month is one gzip-compressed NDJSON file holding one order per
+line, with its items nested under ``items``. The archive job in ``db.py``
+writes these files; ``db.get_order_details`` reads them back for order ids
+that no longer live in MySQL.
+"""
+import gzip
+import json
+import os
+from datetime import datetime
+from functools import lru_cache
+
+
+ARCHIVE_DIR = os.environ.get(
+    'ORDER_ARCHIVE_DIR',
+    os.path.join(os.path.dirname(__file__), '..', '..', 'archive'),
+)
+DATETIME_FIELDS = ('created_at',)
+
+
+def archive_path(partition_name):
+    """Return the archive file path for a ``pYYYYMM`` partition."""
+    return os.path.join(ARCHIVE_DIR, f"orders-{partition_name[1:]}.ndjson.gz")
+
+
+class ArchiveWriter:
+    """Write orders to an archive file atomically (temp file + rename)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.count = 0
+        self._file = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = gzip.open(self.tmp_path, 'wt', encoding='utf-8')
+        return self
+
+    def write(self, order):
+        self._file.write(json.dumps(order, default=str, separators=(',', ':')))
+        self._file.write('\n')
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        else:
+            os.remove(self.tmp_path)
+        return False
+
+
+def _restore_types(record):
+    for field in DATETIME_FIELDS:
+        if record.get(field):
+            record[field] = datetime.fromisoformat(record[field])
+    return record
+
+
+@lru_cache(maxsize=256)
+def read_archived_order(path, order_id):
+    """Return an archived order (with items) from an archive file, or None."""
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, 'rt', encoding='utf-8') as fh:
+        for line in fh:
+            order = json.loads(line)
+            if order['id'] == order_id:
+                order['items'] = [_restore_types(item) for item in order.get('items', [])]
+                return _restore_types(order)
+    return None
@@ -1,11 +1,21 @@
+import json
 import os
-from threading import Lock
+import re
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from functools import partial
+from threading import Lock, local
 from contextlib import contextmanager
 
 import mysql.connector
 from mysql.connector import errorcode, pooling
 from werkzeug.security import generate_password_hash
 
+from app.services import tracing
+from . import archive, faults, sharding, statements
+from .rows import CartItem, OrderSummary, Product, fetch_rows
+
 
 MYSQL_SETTINGS = {
     'host': os.environ.get('MYSQL_HOST', '127.0.0.1'),
@@ -16,17 +26,92 @@ MYSQL_SETTINGS = {
 MYSQL_DATABASE = os.environ.get('MYSQL_DATABASE', 'app_db')
 POOL_NAME = os.environ.get('MYSQL_POOL_NAME', 'app_pool')
 POOL_SIZE = int(os.environ.get('MYSQL_POOL_SIZE', 5))
+# Protocol implementation: 'c' (C extension), 'pure' (pure Python) or 'auto'
+# (the C extension when it is installed). Rows and types are the same either way.
+MYSQL_DRIVER = os.environ.get('MYSQL_DRIVER', 'auto')
+# Prepared statements kept per pooled connection for hot queries (0 disables;
+# pools then reset sessions on checkin instead of rolling back).
+STATEMENT_CACHE_SIZE = int(os.environ.get('MYSQL_STATEMENT_CACHE_SIZE', 32))
+# Capacity testing only: JSON plan of injected latency and faults (see faults.py).
+DB_FAULT_PLAN = os.environ.get('DB_FAULT_PLAN')
+# Bump whenever init_db changes the schema; readiness probes compare it.
+SCHEMA_VERSION = 11
+# Optional read replica, only used to report replication lag.
+MYSQL_REPLICA_HOST = os.environ.get('MYSQL_REPLICA_HOST')
+MYSQL_REPLICA_PORT = int(os.environ.get('MYSQL_REPLICA_PORT', 3306))
+# How long tombstones for deleted products are kept for delta-sync clients.
+PRODUCT_DELETION_RETENTION_DAYS = int(os.environ.get('PRODUCT_DELETION_RETENTION_DAYS', 30))
+# Re-scan window that covers rows whose transaction committed after a sync read.
+CHANGES_OVERLAP_SECONDS = 2
+# Products written per transaction by bulk admin operations. Each chunk
+# commits on its own, so one failure affects at most one chunk.
+PRODUCT_BULK_CHUNK_SIZE = int(os.environ.get('PRODUCT_BULK_CHUNK_SIZE', 500))
+# Stored responses for Idempotency-Key replays expire after this long.
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 24 * 3600))
+# A claimed key with no response after this long is assumed abandoned.
+IDEMPOTENCY_PENDING_TIMEOUT_SECONDS = 60
+# Monthly order partitions older than this are moved to the cold archive.
+ORDER_RETENTION_MONTHS = int(os.environ.get('ORDER_RETENTION_MONTHS', 24))
+ORDER_PARTITION_MONTHS_AHEAD = 3
+PARTITION_NAME_RE = re.compile(r'^p\d{6}$')
+# User-keyed shards for carts and orders (None: everything on the global node).
+SHARD_CONFIG = sharding.load_config()
+# Workers re-read shard_ranges this often; online moves wait it out.
+SHARD_MAP_TTL_SECONDS = float(os.environ.get('SHARD_MAP_TTL_SECONDS', 2))
+# How long a write waits for a range frozen by a move before giving up.
+SHARD_MOVE_WAIT_SECONDS = 10
+# Orders created this long before a move's bulk copy began are re-checked.
+SHARD_COPY_SLACK_SECONDS = 300
+# Ids reserved from the global sequence per round trip, per table.
+ID_BLOCK_SIZE = 100
+# Background jobs: attempts before dead-lettering, and how long a claimed job
+# may run before it is assumed lost with its worker and handed out again.
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+JOB_LOCK_TIMEOUT_SECONDS = int(os.environ.get('JOB_LOCK_TIMEOUT_SECONDS', 300))
+JOB_RETENTION_DAYS = 7
+# Cart badge counts cached per process. Mutations made here keep entries
+# exact; the TTL bounds drift from other workers and cascading deletes.
+CART_COUNT_TTL_SECONDS = float(os.environ.get('CART_COUNT_TTL_SECONDS', 5))
+CART_COUNT_CACHE_SIZE = 10000
+# Products cached by id per process for multi-gets. Writes made here evict
+# entries; the TTL bounds drift from other workers' writes.
+PRODUCT_CACHE_TTL_SECONDS = float(os.environ.get('PRODUCT_CACHE_TTL_SECONDS', 5))
+PRODUCT_CACHE_SIZE = int(os.environ.get('PRODUCT_CACHE_SIZE', 5000))
+# Carts whose newest line is older than this are purged by expire_carts.py.
+CART_RETENTION_DAYS = int(os.environ.get('CART_RETENTION_DAYS', 30))
+# Batch deletes pause while the replica is further behind than this.
+MAX_REPLICA_LAG_SECONDS = int(os.environ.get('MAX_REPLICA_LAG_SECONDS', 30))
+# Orders with more distinct products than this skip co-occurrence counting
+# (pairs grow quadratically and bulk orders say little about affinity).
+RELATED_MAX_ORDER_LINES = 50
 
 _pool = None
 _pool_lock = Lock()
+_shard_pools = {}
+_shard_map = None
+_shard_map_loaded_at = 0.0
+_shard_map_lock = Lock()
+_id_blocks = {}
+_id_lock = Lock()
+_cart_counts = OrderedDict()
+_cart_counts_lock = Lock()
+_products_by_id = OrderedDict()
+_products_by_id_lock = Lock()
+_statement_cache = statements.StatementCache(STATEMENT_CACHE_SIZE)
+# Per-thread time spent holding pooled connections, read by request logging
+_db_time = local()
+# Per-thread unit of work (see UnitOfWork), bound per request by the app
+_unit_of_work = local()
 
 
-def ensure_database():
+def ensure_database(settings=None, database=None):
     """Create the target database if it does not already exist."""
+    settings = settings or MYSQL_SETTINGS
+    database = database or MYSQL_DATABASE
     try:
-        conn = mysql.connector.connect(**MYSQL_SETTINGS)
+        conn = mysql.connector.connect(**settings)
     except mysql.connector.Error as exc:
-        missing = [k for k, v in MYSQL_SETTINGS.items() if v in (None, '') and k != 'password']
+        missing = [k for k, v in settings.items() if v in (None, '') and k != 'password']
         hint = (
             " Verify your MySQL credentials and environment variables."
             if not missing
@@ -35,50 +120,618 @@ def ensure_database():
         raise RuntimeError(f"Unable to connect to MySQL server.{hint}") from exc
     cursor = conn.cursor()
     cursor.execute(
-        f"CREATE DATABASE IF NOT EXISTS `{MYSQL_DATABASE}` "
+        f"CREATE DATABASE IF NOT EXISTS `{database}` "
         "DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci"
     )
     cursor.close()
     conn.close()
 
 
+def _use_pure():
+    """Whether pools use the pure-Python protocol, per MYSQL_DRIVER."""
+    if MYSQL_DRIVER == 'pure':
+        return True
+    if MYSQL_DRIVER == 'c':
+        if not mysql.connector.HAVE_CEXT:
+            raise RuntimeError("MYSQL_DRIVER=c but the MySQL C extension is not installed")
+        return False
+    if MYSQL_DRIVER == 'auto':
+        return not mysql.connector.HAVE_CEXT
+    raise RuntimeError(f"MYSQL_DRIVER must be auto, c or pure, not '{MYSQL_DRIVER}'")
+
+
+def get_driver():
+    """Name the protocol implementation pools use: ``c`` or ``pure``."""
+    return 'pure' if _use_pure() else 'c'
+
+
 def get_pool():
     """Return a lazily-instantiated MySQL connection pool."""
     global _pool
     if _pool is None:
         with _pool_lock:
             if _pool is None:
+                if DB_FAULT_PLAN:
+                    faults.install(DB_FAULT_PLAN)
                 ensure_database()
                 config_with_db = {
                     **MYSQL_SETTINGS,
                     'database': MYSQL_DATABASE,
                     'charset': 'utf8mb4',
-                    'use_pure': True,
+                    'use_pure': _use_pure(),
                 }
                 _pool = pooling.MySQLConnectionPool(
                     pool_name=POOL_NAME,
                     pool_size=POOL_SIZE,
+                    pool_reset_session=not _statement_cache.enabled,
                     autocommit=False,
                     **config_with_db,
                 )
                 print(
-                    f"MySQL connection pool '{POOL_NAME}' ready — "
+                    f"MySQL connection pool '{POOL_NAME}' ready ({get_driver()} driver) — "
                     f"{MYSQL_SETTINGS['user']}@{MYSQL_SETTINGS['host']}:{MYSQL_SETTINGS['port']}/{MYSQL_DATABASE}"
                 )
     return _pool
 
 
+def get_shard_pool(shard):
+    """Return a shard's connection pool (``global`` is the main pool)."""
+    if shard == sharding.GLOBAL_SHARD:
+        return get_pool()
+    pool = _shard_pools.get(shard)
+    if pool is None:
+        with _pool_lock:
+            pool = _shard_pools.get(shard)
+            if pool is None:
+                node = SHARD_CONFIG['shards'][shard]
+                settings = {key: node.get(key, value) for key, value in MYSQL_SETTINGS.items()}
+                database = node.get('database', MYSQL_DATABASE)
+                if DB_FAULT_PLAN:
+                    faults.install(DB_FAULT_PLAN)
+                ensure_database(settings, database)
+                pool = pooling.MySQLConnectionPool(
+                    pool_name=f"{POOL_NAME}_{shard}",
+                    pool_size=POOL_SIZE,
+                    pool_reset_session=not _statement_cache.enabled,
+                    autocommit=False,
+                    database=database,
+                    charset='utf8mb4',
+                    use_pure=_use_pure(),
+                    **settings,
+                )
+                _shard_pools[shard] = pool
+                print(
+                    f"MySQL connection pool for shard '{shard}' ready — "
+                    f"{settings['user']}@{settings['host']}:{settings['port']}/{database}"
+                )
+    return pool
+
+
 @contextmanager
-def get_connection():
-    """Context manager that yields a pooled connection."""
-    pool = get_pool()
-    conn = pool.get_connection()
+def get_connection(shard=sharding.GLOBAL_SHARD):
+    """Context manager that yields a pooled connection (to the global node by default).
+
+    Inside a unit of work the shard's shared connection is yielded instead.
+    """
+    started = time.perf_counter()
+    unit = getattr(_unit_of_work, 'current', None)
+    shared = unit.acquire(shard) if unit is not None else None
+    if shared is not None:
+        try:
+            yield shared
+        finally:
+            unit.release(shard)
+            _db_time.seconds = getattr(_db_time, 'seconds', 0.0) + time.perf_counter() - started
+        return
+
+    conn = _checkout(shard)
     try:
         yield conn
+    finally:
+        _return(conn)
+        _db_time.seconds = getattr(_db_time, 'seconds', 0.0) + time.perf_counter() - started
+
+
+def _checkout(shard):
+    pool = get_shard_pool(shard)
+    with tracing.span('db.pool.checkout', tracing.SPAN_KIND_CLIENT):
+        return pool.get_connection()
+
+
+def _return(conn):
+    """Hand a connection back to its pool."""
+    if _statement_cache.enabled:
+        _end_transaction(conn)
+    conn.close()
+
+
+def _end_transaction(conn):
+    """Roll back what a borrower left open, in place of the pool's session
+    reset (which would also drop the connection's prepared statements)."""
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+    except mysql.connector.Error:
+        # The pool reconnects it on the next checkout
+        conn.disconnect()
+
+
+def _discard(conn):
+    """Return a broken connection to its pool; it is reconnected on next checkout."""
+    try:
+        conn.disconnect()
+        conn.close()
+    except mysql.connector.Error:
+        pass
+
+
+class _SharedConnection:
+    """A unit of work's connection as db functions see it.
+
+    In an atomic unit, commits are deferred to the end of the unit and a
+    rollback marks the whole unit as failed.
+    """
+
+    def __init__(self, conn, unit):
+        self._conn = conn
+        self._unit = unit
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def commit(self):
+        if not self._unit.atomic:
+            self._conn.commit()
+
+    def rollback(self):
+        if self._unit.atomic:
+            self._unit.failed = True
+        else:
+            self._conn.rollback()
+
+
+class UnitOfWork:
+    """Pooled connections shared by the sequential db calls of one thread.
+
+    Each shard's connection is checked out on first use and kept until
+    ``end_unit_of_work``, so a request pays for one checkout per shard
+    rather than one per call. Between calls, a read transaction left open
+    is rolled back, so every call still sees fresh data. A call made while
+    another call holds the shard's connection borrows its own connection
+    from the pool, so it can never commit the outer call's transaction.
+    Id allocation (``_new_id``) always uses a private connection and
+    commits at once, even inside an atomic unit, so a rolled-back unit
+    burns the ids it drew instead of returning them.
+    """
+
+    def __init__(self):
+        # shard -> [connection, calls currently using it]
+        self.connections = {}
+        self.atomic = False
+        self.failed = False
+        # Callbacks run once an atomic unit has committed (see _after_commit)
+        self.on_commit = []
+
+    def acquire(self, shard):
+        entry = self.connections.get(shard)
+        if entry is None:
+            entry = self.connections[shard] = [_SharedConnection(_checkout(shard), self), 0]
+        elif entry[1]:
+            return None
+        entry[1] += 1
+        return entry[0]
+
+    def release(self, shard):
+        entry = self.connections[shard]
+        entry[1] -= 1
+        if self.atomic:
+            return
+        conn = entry[0]._conn
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except mysql.connector.Error:
+            del self.connections[shard]
+            _discard(conn)
+
+    def finish(self, commit):
+        """Commit or roll back every shard's open transaction."""
+        callbacks, self.on_commit = self.on_commit, []
+        for shard, (shared, _) in list(self.connections.items()):
+            conn = shared._conn
+            try:
+                if commit:
+                    conn.commit()
+                else:
+                    conn.rollback()
+            except mysql.connector.Error:
+                del self.connections[shard]
+                _discard(conn)
+                if commit:
+                    raise
+        if commit:
+            for callback in callbacks:
+                callback()
+
+    def close(self):
+        while self.connections:
+            _, (shared, _) = self.connections.popitem()
+            _return(shared._conn)
+
+
+def begin_unit_of_work():
+    """Bind a new unit of work to this thread and return it."""
+    if getattr(_unit_of_work, 'current', None) is not None:
+        raise RuntimeError('A unit of work is already bound to this thread')
+    _unit_of_work.current = UnitOfWork()
+    return _unit_of_work.current
+
+
+def end_unit_of_work():
+    """Unbind this thread's unit of work and return its connections to the pools."""
+    unit = getattr(_unit_of_work, 'current', None)
+    _unit_of_work.current = None
+    if unit is not None:
+        unit.close()
+
+
+@contextmanager
+def transaction():
+    """Run every db call in the block in one transaction per shard.
+
+    Commits when the block completes, unless a call inside it rolled back;
+    rolls back if the block raises. Shards commit one after another, not
+    atomically across shards. Without a bound unit of work, one is bound
+    for the duration of the block.
+    """
+    unit = getattr(_unit_of_work, 'current', None)
+    owned = unit is None
+    if owned:
+        unit = begin_unit_of_work()
+    if unit.atomic:
+        yield unit
+        return
+
+    unit.atomic, unit.failed = True, False
+    try:
+        yield unit
+    except BaseException:
+        unit.finish(commit=False)
+        raise
+    else:
+        unit.finish(commit=not unit.failed)
+    finally:
+        unit.atomic = False
+        if owned:
+            end_unit_of_work()
+
+
+def _after_commit(callback):
+    """Run ``callback`` once the current write is committed.
+
+    Inside an atomic unit that is when the unit commits (never, if it rolls
+    back); otherwise the caller has already committed, so it runs at once.
+    """
+    unit = getattr(_unit_of_work, 'current', None)
+    if unit is not None and unit.atomic:
+        unit.on_commit.append(callback)
+    else:
+        callback()
+
+
+def get_statement_cache_stats():
+    """Return this process's prepared statement cache counters."""
+    return _statement_cache.stats()
+
+
+def reset_db_time():
+    """Reset this thread's accumulated database time."""
+    _db_time.seconds = 0.0
+
+
+def get_db_time():
+    """Return seconds this thread has spent in the database since the last reset."""
+    return getattr(_db_time, 'seconds', 0.0)
+
+
+def check_database():
+    """Probe the database without waiting for a pooled connection.
+
+    Returns ``(status, schema_version)`` where status is ``'ok'`` or
+    ``'busy'`` (every pooled connection is checked out, so the probe stepped
+    aside instead of queueing behind customer traffic). Raises on
+    connectivity errors.
+    """
+    pool = get_pool()
+    try:
+        conn = pool.get_connection()
+    except pooling.PoolError:
+        return 'busy', None
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT version FROM schema_version WHERE id = 1')
+        row = cursor.fetchone()
+        return 'ok', row[0] if row else None
+    finally:
+        conn.close()
+
+
+def get_replica_lag():
+    """Return replica lag in seconds, or None if no replica is configured."""
+    if not MYSQL_REPLICA_HOST:
+        return None
+    conn = mysql.connector.connect(
+        **{**MYSQL_SETTINGS, 'host': MYSQL_REPLICA_HOST, 'port': MYSQL_REPLICA_PORT},
+        connection_timeout=2,
+    )
+    try:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute('SHOW REPLICA STATUS')
+        except mysql.connector.Error:
+            cursor.execute('SHOW SLAVE STATUS')
+        row = cursor.fetchone()
+        if not row:
+            raise RuntimeError('Replica is not replicating')
+        lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+        if lag is None:
+            raise RuntimeError('Replication is stopped')
+        return int(lag)
     finally:
         conn.close()
 
 
+# Shard routing
+def get_shard_map(refresh=False):
+    """Return the shard map, re-read from shard_ranges every SHARD_MAP_TTL_SECONDS."""
+    global _shard_map, _shard_map_loaded_at
+    shard_map = _shard_map
+    if (
+        not refresh
+        and shard_map is not None
+        and time.monotonic() - _shard_map_loaded_at < SHARD_MAP_TTL_SECONDS
+    ):
+        return shard_map
+
+    with _shard_map_lock:
+        if _shard_map is shard_map or refresh:
+            with get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(
+                    """
+                    SELECT lo_user_id AS lo, hi_user_id AS hi, shard, state,
+                           target_shard AS target
+                    FROM shard_ranges
+                    """
+                )
+                _shard_map = sharding.ShardMap(cursor.fetchall())
+            _shard_map_loaded_at = time.monotonic()
+        return _shard_map
+
+
+def _route(user_id, write):
+    """Return the shard owning ``user_id``, waiting out a frozen range for writes."""
+    if SHARD_CONFIG is None or user_id is None:
+        return sharding.GLOBAL_SHARD
+    entry = get_shard_map().lookup(user_id)
+    if write and entry['state'] == sharding.STATE_FROZEN:
+        deadline = time.monotonic() + SHARD_MOVE_WAIT_SECONDS
+        while entry['state'] == sharding.STATE_FROZEN:
+            if time.monotonic() > deadline:
+                raise sharding.ShardUnavailableError(
+                    f"User {user_id} is being moved to another shard, try again shortly"
+                )
+            time.sleep(0.1)
+            entry = get_shard_map(refresh=True).lookup(user_id)
+    return entry['shard']
+
+
+@contextmanager
+def user_connection(user_id, write=False):
+    """Yield ``(shard, conn)`` for the shard holding a user's carts and orders.
+
+    Without sharding (or for an unknown user) this is the global node.
+    """
+    shard = _route(user_id, write)
+    with get_connection(shard) as conn:
+        yield shard, conn
+
+
+@contextmanager
+def _global_connection(shard, conn):
+    """Yield ``conn`` if it is on the global node, else a global connection."""
+    if shard == sharding.GLOBAL_SHARD:
+        yield conn
+    else:
+        with get_connection() as global_conn:
+            yield global_conn
+
+
+def _new_id(table):
+    """Return a cluster-wide unique id for a sharded table.
+
+    Ids come from the global ``id_sequences`` table in blocks of
+    ID_BLOCK_SIZE, so rows keep their id when they move between shards.
+    Without sharding this returns None and AUTO_INCREMENT assigns the id.
+    The block is claimed on a private connection and committed at once,
+    outside any unit of work, so an open transaction never holds the
+    sequence row lock and a rolled-back one never hands out ids twice.
+    """
+    if SHARD_CONFIG is None:
+        return None
+    with _id_lock:
+        block = _id_blocks.get(table)
+        # A forked worker must not reuse its parent's block
+        if block is None or block[0] != os.getpid() or block[1] >= block[2]:
+            conn = _checkout(sharding.GLOBAL_SHARD)
+            try:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    UPDATE id_sequences SET next_id = LAST_INSERT_ID(next_id + %s)
+                    WHERE name = %s
+                    """,
+                    (ID_BLOCK_SIZE, table),
+                )
+                cursor.execute('SELECT LAST_INSERT_ID()')
+                end = cursor.fetchone()[0]
+                conn.commit()
+            finally:
+                _return(conn)
+            block = _id_blocks[table] = [os.getpid(), end - ID_BLOCK_SIZE, end]
+        block[1] += 1
+        return block[1] - 1
+
+
+def _find_owner(table, row_id):
+    """Return the user_id owning a row of a sharded table, searching every shard."""
+    if SHARD_CONFIG is None:
+        return None
+    for shard in get_shard_map().shard_names():
+        with get_connection(shard) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT user_id FROM `{table}` WHERE id = %s", (row_id,))
+            row = cursor.fetchone()
+        if row:
+            return row[0]
+    return None
+
+
+def _fetch_products(product_ids, columns='*'):
+    """Look up products on the global node for rows read from another shard."""
+    product_ids = sorted({pid for pid in product_ids if pid is not None})
+    if not product_ids:
+        return {}
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        cursor.execute(
+            f"SELECT {columns} FROM products WHERE id IN ({placeholders})", product_ids
+        )
+        return {row['id']: row for row in cursor.fetchall()}
+
+
+def _ensure_index(cursor, table, index_name, columns):
+    """Create an index unless it already exists (MySQL lacks CREATE INDEX IF NOT EXISTS)."""
+    cursor.execute(
+        """
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        """,
+        (table, index_name),
+    )
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"CREATE INDEX `{index_name}` ON `{table}` ({columns})")
+
+
+def _ensure_column(cursor, table, column, definition):
+    """Add a column to an existing table unless it is already there."""
+    cursor.execute(
+        """
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """,
+        (table, column),
+    )
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"ALTER TABLE `{table}` ADD COLUMN `{column}` {definition}")
+
+
+# Per-user tables on shards other than the global node. Users and products
+# live on the global node, so these carry no foreign keys.
+SHARD_TABLES = {
+    'cart_items': """
+        CREATE TABLE IF NOT EXISTS cart_items (
+            id INT PRIMARY KEY,
+            user_id INT,
+            product_id INT NOT NULL,
+            quantity INT DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE KEY unique_user_product (user_id, product_id),
+            INDEX idx_cart_items_created_at (created_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    'orders': """
+        CREATE TABLE IF NOT EXISTS orders (
+            id INT PRIMARY KEY,
+            user_id INT,
+            total_amount DECIMAL(10, 2) NOT NULL,
+            tax_amount DECIMAL(10, 2) NOT NULL,
+            grand_total DECIMAL(10, 2) NOT NULL,
+            status VARCHAR(50) DEFAULT 'completed',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_orders_user (user_id, created_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    'order_items': """
+        CREATE TABLE IF NOT EXISTS order_items (
+            id INT PRIMARY KEY,
+            order_id INT NOT NULL,
+            product_id INT,
+            product_name VARCHAR(255) NOT NULL,
+            product_price DECIMAL(10, 2) NOT NULL,
+            quantity INT NOT NULL,
+            subtotal DECIMAL(10, 2) NOT NULL,
+            discount DECIMAL(10, 2) NOT NULL DEFAULT 0,
+            category VARCHAR(100),
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_order_items_order (order_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    'archived_orders': """
+        CREATE TABLE IF NOT EXISTS archived_orders (
+            id INT PRIMARY KEY,
+            user_id INT,
+            total_amount DECIMAL(10, 2) NOT NULL,
+            tax_amount DECIMAL(10, 2) NOT NULL,
+            grand_total DECIMAL(10, 2) NOT NULL,
+            status VARCHAR(50),
+            created_at TIMESTAMP NULL,
+            archive_file VARCHAR(255) NOT NULL,
+            INDEX idx_archived_orders_user (user_id, created_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+}
+# Tables whose ids come from the global id_sequences table when sharded
+SEQUENCED_TABLES = ('cart_items', 'orders', 'order_items')
+
+
+def _init_shards():
+    """Create per-user tables on every shard and seed the global sequences."""
+    max_ids = dict.fromkeys(SEQUENCED_TABLES, 0)
+    for shard in [sharding.GLOBAL_SHARD, *SHARD_CONFIG['shards']]:
+        with get_connection(shard) as conn:
+            cursor = conn.cursor()
+            if shard != sharding.GLOBAL_SHARD:
+                for ddl in SHARD_TABLES.values():
+                    cursor.execute(ddl)
+                _ensure_index(cursor, 'cart_items', 'idx_cart_items_created_at', 'created_at')
+                _ensure_column(cursor, 'order_items', 'discount', 'DECIMAL(10, 2) NOT NULL DEFAULT 0')
+                _ensure_column(cursor, 'order_items', 'category', 'VARCHAR(100)')
+                conn.commit()
+            for table in SEQUENCED_TABLES:
+                cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM `{table}`")
+                max_ids[table] = max(max_ids[table], cursor.fetchone()[0])
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            """
+            INSERT INTO id_sequences (name, next_id) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE next_id = GREATEST(next_id, VALUES(next_id))
+            """,
+            [(table, max_id + 1) for table, max_id in max_ids.items()],
+        )
+        # The configured ranges only seed the map; later moves own it
+        cursor.execute('SELECT COUNT(*) FROM shard_ranges')
+        if cursor.fetchone()[0] == 0:
+            cursor.executemany(
+                'INSERT INTO shard_ranges (lo_user_id, hi_user_id, shard) VALUES (%s, %s, %s)',
+                SHARD_CONFIG['ranges'],
+            )
+        conn.commit()
+
+
 def init_db():
     """Ensure required tables exist."""
     with get_connection() as conn:
@@ -110,6 +763,37 @@ def init_db():
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
             """
         )
+        _ensure_index(cursor, 'products', 'idx_products_updated_at', 'updated_at')
+
+        # Single-row record of the schema version init_db last applied
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_version (
+                id TINYINT PRIMARY KEY,
+                version INT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO schema_version (id, version) VALUES (1, %s)
+            ON DUPLICATE KEY UPDATE version = GREATEST(version, VALUES(version))
+            """,
+            (SCHEMA_VERSION,),
+        )
+
+        # Deletion log so delta-sync clients can drop removed products
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS product_deletions (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                product_id INT NOT NULL,
+                deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_product_deletions_deleted_at (deleted_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+        )
         
         cursor.execute(
             """
@@ -125,6 +809,8 @@ def init_db():
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
             """
         )
+        # Lets abandoned-cart expiry find old lines without a table scan
+        _ensure_index(cursor, 'cart_items', 'idx_cart_items_created_at', 'created_at')
         
         cursor.execute(
             """
@@ -151,258 +837,2306 @@ def init_db():
                 product_price DECIMAL(10, 2) NOT NULL,
                 quantity INT NOT NULL,
                 subtotal DECIMAL(10, 2) NOT NULL,
+                discount DECIMAL(10, 2) NOT NULL DEFAULT 0,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (order_id) REFERENCES orders(id) ON DELETE CASCADE,
                 FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE SET NULL
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
             """
         )
-        
-        conn.commit()
-
-
-def create_user(username, email, password, phone=None):
-    password_hash = generate_password_hash(password)
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        try:
-            cursor.execute(
-                """
-                INSERT INTO users (username, email, password_hash, phone)
-                VALUES (%s, %s, %s, %s)
-                """,
-                (username, email, password_hash, phone),
-            )
-            conn.commit()
-            user_id = cursor.lastrowid
-        except mysql.connector.IntegrityError as exc:
-            conn.rollback()
-            if exc.errno == errorcode.ER_DUP_ENTRY:
-                return None
-            raise
-    return user_id
-
-
-def get_user_by_email(email):
-    with get_connection() as conn:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT * FROM users WHERE email = %s', (email,))
-        row = cursor.fetchone()
-    return row
-
+        # Items carry their order's timestamp so both tables partition alike
+        _ensure_column(
+            cursor, 'order_items', 'created_at',
+            'TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP',
+        )
+        # Line promotion plus the line's share of the cart promotion
+        _ensure_column(cursor, 'order_items', 'discount', 'DECIMAL(10, 2) NOT NULL DEFAULT 0')
+        # Product category at order time, which the sales rollups are keyed
+        # by ('' if it had none; NULL for items from before schema version 10)
+        _ensure_column(cursor, 'order_items', 'category', 'VARCHAR(100)')
 
-# Product functions
-def create_product(name, description, price, category, image_url, stock):
-    """Create a new product."""
-    with get_connection() as conn:
-        cursor = conn.cursor()
+        # Headers of orders whose partition was moved to the cold archive
         cursor.execute(
             """
-            INSERT INTO products (name, description, price, category, image_url, stock)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            """,
-            (name, description, price, category, image_url, stock),
+            CREATE TABLE IF NOT EXISTS archived_orders (
+                id INT PRIMARY KEY,
+                user_id INT,
+                total_amount DECIMAL(10, 2) NOT NULL,
+                tax_amount DECIMAL(10, 2) NOT NULL,
+                grand_total DECIMAL(10, 2) NOT NULL,
+                status VARCHAR(50),
+                created_at TIMESTAMP NULL,
+                archive_file VARCHAR(255) NOT NULL,
+                INDEX idx_archived_orders_user (user_id, created_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
         )
-        conn.commit()
-        return cursor.lastrowid
 
+        # Tax and promotion rules compiled by app.services.pricing
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pricing_rules (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                kind VARCHAR(20) NOT NULL,
+                scope VARCHAR(20) NOT NULL DEFAULT 'cart',
+                target VARCHAR(100),
+                value DECIMAL(10, 4) NOT NULL,
+                min_subtotal DECIMAL(10, 2) NOT NULL DEFAULT 0,
+                starts_at DATETIME NULL,
+                ends_at DATETIME NULL,
+                active TINYINT(1) NOT NULL DEFAULT 1,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+        )
 
-def get_all_products():
-    """Get all products."""
-    with get_connection() as conn:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT * FROM products ORDER BY created_at DESC')
-        return cursor.fetchall()
+        # Responses stored for Idempotency-Key replays
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                key_hash CHAR(64) PRIMARY KEY,
+                fingerprint CHAR(64) NOT NULL,
+                status_code SMALLINT NULL,
+                response_body MEDIUMTEXT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_idempotency_keys_created_at (created_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+        )
 
+        # Sales rollups, maintained incrementally by create_order; revenue
+        # is net of discounts (line and cart promotions)
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sales_daily (
+                sale_date DATE PRIMARY KEY,
+                order_count INT NOT NULL DEFAULT 0,
+                units INT NOT NULL DEFAULT 0,
+                revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+                tax DECIMAL(14, 2) NOT NULL DEFAULT 0,
+                grand_total DECIMAL(14, 2) NOT NULL DEFAULT 0
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+        )
 
-def get_product_by_id(product_id):
-    """Get a single product by ID."""
-    with get_connection() as conn:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT * FROM products WHERE id = %s', (product_id,))
-        return cursor.fetchone()
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sales_product_daily (
+                sale_date DATE NOT NULL,
+                product_id INT NOT NULL,
+                product_name VARCHAR(255) NOT NULL,
+                units INT NOT NULL DEFAULT 0,
+                revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+                PRIMARY KEY (sale_date, product_id)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+        )
 
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sales_category_daily (
+                sale_date DATE NOT NULL,
+                category VARCHAR(100) NOT NULL,
+                units INT NOT NULL DEFAULT 0,
+                revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+                PRIMARY KEY (sale_date, category)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+        )
 
-def update_product(product_id, name, description, price, category, image_url, stock):
-    """Update an existing product."""
-    with get_connection() as conn:
-        cursor = conn.cursor()
+        # How many orders contained each pair of products, both directions
         cursor.execute(
             """
-            UPDATE products
-            SET name = %s, description = %s, price = %s, category = %s,
-                image_url = %s, stock = %s
-            WHERE id = %s
-            """,
-            (name, description, price, category, image_url, stock, product_id),
+            CREATE TABLE IF NOT EXISTS product_pairs (
+                product_id INT NOT NULL,
+                related_id INT NOT NULL,
+                orders INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (product_id, related_id)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+        )
+        # Orders already counted into product_pairs, so job retries skip them
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS product_pair_orders (
+                order_id INT PRIMARY KEY,
+                counted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_product_pair_orders_counted_at (counted_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
         )
-        conn.commit()
-        return cursor.rowcount > 0
 
+        # Latest related-products index file, published for every host
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS related_index (
+                id TINYINT PRIMARY KEY,
+                content LONGBLOB NOT NULL,
+                built_at TIMESTAMP(6) NOT NULL
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+        )
 
-def delete_product(product_id):
-    """Delete a product."""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM products WHERE id = %s', (product_id,))
+        # Latest demand forecast per product (see app/services/forecast.py)
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS stock_projections (
+                product_id INT PRIMARY KEY,
+                stock INT NOT NULL,
+                daily_demand DECIMAL(12, 4) NOT NULL,
+                days_of_cover DECIMAL(10, 1) NULL,
+                stockout_date DATE NULL,
+                computed_at DATETIME NOT NULL,
+                INDEX idx_stock_projections_cover (days_of_cover)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+        )
+
+        # User-id ranges per shard (see app/models/sharding.py)
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS shard_ranges (
+                lo_user_id BIGINT PRIMARY KEY,
+                hi_user_id BIGINT NOT NULL,
+                shard VARCHAR(64) NOT NULL,
+                state VARCHAR(16) NOT NULL DEFAULT 'active',
+                target_shard VARCHAR(64) NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+        )
+
+        # Durable queue of out-of-band work (see app/services/jobs.py)
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                kind VARCHAR(64) NOT NULL,
+                payload JSON NOT NULL,
+                status VARCHAR(16) NOT NULL DEFAULT 'queued',
+                attempts INT NOT NULL DEFAULT 0,
+                max_attempts INT NOT NULL,
+                run_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                locked_by VARCHAR(64) NULL,
+                locked_at DATETIME NULL,
+                last_error TEXT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                INDEX idx_jobs_status_run_at (status, run_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+        )
+        # Last run of each periodic task, claimed by one worker at a time
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS periodic_tasks (
+                name VARCHAR(64) PRIMARY KEY,
+                last_run_at DATETIME NOT NULL
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+        )
+        # Orders whose confirmation mail was sent, so job retries skip them
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS order_mails (
+                order_id INT PRIMARY KEY,
+                sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_order_mails_sent_at (sent_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+        )
+
+        # Cluster-wide id blocks for rows of sharded tables
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS id_sequences (
+                name VARCHAR(64) PRIMARY KEY,
+                next_id BIGINT NOT NULL
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+        )
+        
         conn.commit()
-        return cursor.rowcount > 0
 
+    if SHARD_CONFIG is not None:
+        _init_shards()
 
-# Cart functions
-def add_to_cart(user_id, product_id, quantity=1):
-    """Add or update item in cart."""
+
+def create_user(username, email, password, phone=None):
+    password_hash = generate_password_hash(password)
     with get_connection() as conn:
         cursor = conn.cursor()
         try:
             cursor.execute(
                 """
-                INSERT INTO cart_items (user_id, product_id, quantity)
-                VALUES (%s, %s, %s)
-                ON DUPLICATE KEY UPDATE quantity = quantity + %s
+                INSERT INTO users (username, email, password_hash, phone)
+                VALUES (%s, %s, %s, %s)
                 """,
-                (user_id, product_id, quantity, quantity),
+                (username, email, password_hash, phone),
             )
             conn.commit()
-            return True
-        except mysql.connector.Error:
+            user_id = cursor.lastrowid
+        except mysql.connector.IntegrityError as exc:
             conn.rollback()
-            return False
+            if exc.errno == errorcode.ER_DUP_ENTRY:
+                return None
+            raise
+    return user_id
 
 
-def get_cart_items(user_id):
-    """Get all cart items for a user with product details."""
+def get_user_by_email(email):
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute('SELECT * FROM users WHERE email = %s', (email,))
+        row = cursor.fetchone()
+    return row
+
+
+def get_user_by_id(user_id):
     with get_connection() as conn:
         cursor = conn.cursor(dictionary=True)
+        cursor.execute('SELECT id, username, email, phone FROM users WHERE id = %s', (user_id,))
+        row = cursor.fetchone()
+    return row
+
+
+# Hot statements run through the prepared statement cache. They must stay
+# module-level constants: the cache recognises them by string identity.
+_PRODUCT_BY_ID = f"SELECT {', '.join(Product._fields)} FROM products WHERE id = %s"
+# Column order must match CartItem._fields
+_CART_ITEMS_JOINED = """
+    SELECT c.id, c.quantity, p.id as product_id, p.name, p.description,
+           p.price, p.category, p.image_url, p.stock,
+           (c.quantity * p.price) as subtotal
+    FROM cart_items c
+    JOIN products p ON c.product_id = p.id
+    WHERE c.user_id = %s
+    ORDER BY c.created_at DESC
+"""
+_CART_ITEMS = """
+    SELECT id, quantity, product_id FROM cart_items
+    WHERE user_id = %s
+    ORDER BY created_at DESC
+"""
+# Covered by the (user_id, product_id) unique key: no join, no row reads
+_CART_COUNT = 'SELECT COUNT(*) FROM cart_items WHERE user_id = %s'
+_ADD_CART_ITEM = """
+    INSERT INTO cart_items (id, user_id, product_id, quantity)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE quantity = quantity + %s
+"""
+
+
+# Product functions
+def create_product(name, description, price, category, image_url, stock):
+    """Create a new product."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
         cursor.execute(
             """
-            SELECT c.id, c.quantity, p.id as product_id, p.name, p.description,
-                   p.price, p.image_url, p.stock,
-                   (c.quantity * p.price) as subtotal
-            FROM cart_items c
-            JOIN products p ON c.product_id = p.id
-            WHERE c.user_id = %s
-            ORDER BY c.created_at DESC
+            INSERT INTO products (name, description, price, category, image_url, stock)
+            VALUES (%s, %s, %s, %s, %s, %s)
             """,
-            (user_id,),
+            (name, description, price, category, image_url, stock),
         )
-        return cursor.fetchall()
+        conn.commit()
+        return cursor.lastrowid
 
 
-def update_cart_quantity(cart_item_id, quantity):
-    """Update quantity of a cart item."""
+def get_all_products():
+    """Get all products."""
     with get_connection() as conn:
         cursor = conn.cursor()
-        if quantity <= 0:
-            cursor.execute('DELETE FROM cart_items WHERE id = %s', (cart_item_id,))
-        else:
+        cursor.execute(
+            f"SELECT {', '.join(Product._fields)} FROM products ORDER BY created_at DESC"
+        )
+        return fetch_rows(cursor, Product)
+
+
+def get_product_by_id(product_id):
+    """Get a single product by ID."""
+    with get_connection() as conn:
+        cursor = _statement_cache.execute(conn, _PRODUCT_BY_ID, (product_id,))
+        rows = fetch_rows(cursor, Product)
+        return rows[0] if rows else None
+
+
+def _forget_products(product_ids):
+    """Evict products from this process's by-id cache."""
+    with _products_by_id_lock:
+        for product_id in product_ids:
+            _products_by_id.pop(product_id, None)
+
+
+def get_products_by_ids(product_ids):
+    """Get products by id, in the order given, skipping ids that do not exist.
+
+    Fresh entries come from a per-process LRU; the misses are read with one
+    ``IN`` query and cached.
+    """
+    product_ids = list(dict.fromkeys(product_ids))
+    found, misses = {}, []
+    now = time.monotonic()
+    with _products_by_id_lock:
+        for product_id in product_ids:
+            entry = _products_by_id.get(product_id)
+            if entry is not None and entry[0] > now:
+                _products_by_id.move_to_end(product_id)
+                found[product_id] = entry[1]
+            else:
+                misses.append(product_id)
+
+    if misses:
+        with get_connection() as conn:
+            cursor = conn.cursor()
             cursor.execute(
-                'UPDATE cart_items SET quantity = %s WHERE id = %s',
-                (quantity, cart_item_id),
+                f"SELECT {', '.join(Product._fields)} FROM products "
+                f"WHERE id IN ({', '.join(['%s'] * len(misses))})",
+                misses,
             )
-        conn.commit()
-        return cursor.rowcount > 0
+            rows = fetch_rows(cursor, Product)
+        expires = time.monotonic() + PRODUCT_CACHE_TTL_SECONDS
+        with _products_by_id_lock:
+            for row in rows:
+                found[row['id']] = row
+                _products_by_id[row['id']] = (expires, row)
+                _products_by_id.move_to_end(row['id'])
+            while len(_products_by_id) > PRODUCT_CACHE_SIZE:
+                _products_by_id.popitem(last=False)
 
+    return [found[product_id] for product_id in product_ids if product_id in found]
 
-def remove_from_cart(cart_item_id):
-    """Remove an item from cart."""
+
+def update_product(product_id, name, description, price, category, image_url, stock):
+    """Update an existing product."""
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('DELETE FROM cart_items WHERE id = %s', (cart_item_id,))
+        cursor.execute(
+            """
+            UPDATE products
+            SET name = %s, description = %s, price = %s, category = %s,
+                image_url = %s, stock = %s
+            WHERE id = %s
+            """,
+            (name, description, price, category, image_url, stock, product_id),
+        )
         conn.commit()
+        _forget_products([product_id])
         return cursor.rowcount > 0
 
 
-def clear_cart(user_id):
-    """Clear all items from user's cart."""
+def delete_product(product_id):
+    """Delete a product and record a tombstone for delta-sync clients."""
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('DELETE FROM cart_items WHERE user_id = %s', (user_id,))
+        cursor.execute('DELETE FROM products WHERE id = %s', (product_id,))
+        deleted = cursor.rowcount > 0
+        if deleted:
+            cursor.execute(
+                'INSERT INTO product_deletions (product_id) VALUES (%s)',
+                (product_id,),
+            )
+            cursor.execute(
+                'DELETE FROM product_deletions WHERE deleted_at < NOW() - INTERVAL %s DAY',
+                (PRODUCT_DELETION_RETENTION_DAYS,),
+            )
         conn.commit()
-        return True
+        _forget_products([product_id])
+        return deleted
 
 
-# Order functions
-def create_order(user_id, total_amount, tax_amount, grand_total, cart_items):
-    """Create a new order from cart items."""
-    with get_connection() as conn:
-        cursor = conn.cursor()
+def _bulk_update_chunk(cursor, updates):
+    """Apply one chunk of partial updates; return per-item results and new rows."""
+    ids = [item['id'] for item in updates]
+    placeholders = ', '.join(['%s'] * len(ids))
+    cursor.execute(
+        f"SELECT id, stock FROM products WHERE id IN ({placeholders}) FOR UPDATE", ids
+    )
+    stock = dict(cursor.fetchall())
+
+    results, applied = [], []
+    for item in updates:
+        if item['id'] not in stock:
+            results.append({'id': item['id'], 'status': 'not_found'})
+        elif stock[item['id']] + item.get('stock_delta', 0) < 0:
+            results.append({
+                'id': item['id'], 'status': 'conflict',
+                'error': f"Stock would go below zero (current stock {stock[item['id']]})",
+            })
+        else:
+            results.append({'id': item['id'], 'status': 'updated'})
+            applied.append(item)
+    if not applied:
+        return results, []
+
+    # One UPDATE for the chunk: a CASE per column over the items that set it
+    assignments, params = [], []
+    for field, expression in (('price', '%s'), ('category', '%s'), ('stock_delta', 'stock + %s')):
+        items = [item for item in applied if field in item]
+        if not items:
+            continue
+        column = 'stock' if field == 'stock_delta' else field
+        cases = ' '.join(f"WHEN %s THEN {expression}" for _ in items)
+        assignments.append(f"{column} = CASE id {cases} ELSE {column} END")
+        for item in items:
+            params.extend((item['id'], item[field]))
+    applied_ids = [item['id'] for item in applied]
+    placeholders = ', '.join(['%s'] * len(applied_ids))
+    cursor.execute(
+        f"UPDATE products SET {', '.join(assignments)} WHERE id IN ({placeholders})",
+        params + applied_ids,
+    )
+    cursor.execute(
+        f"SELECT {', '.join(Product._fields)} FROM products WHERE id IN ({placeholders})",
+        applied_ids,
+    )
+    return results, [Product(values) for values in cursor.fetchall()]
+
+
+def _bulk_delete_chunk(cursor, product_ids):
+    """Delete one chunk of products with tombstones; return per-item results."""
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    cursor.execute(
+        f"SELECT id FROM products WHERE id IN ({placeholders}) FOR UPDATE", product_ids
+    )
+    found = {row[0] for row in cursor.fetchall()}
+    if found:
+        cursor.execute(
+            f"DELETE FROM products WHERE id IN ({', '.join(['%s'] * len(found))})", sorted(found)
+        )
+        cursor.executemany(
+            'INSERT INTO product_deletions (product_id) VALUES (%s)',
+            [(product_id,) for product_id in sorted(found)],
+        )
+    return [
+        {'id': product_id, 'status': 'deleted' if product_id in found else 'not_found'}
+        for product_id in product_ids
+    ]
+
+
+def bulk_update_products(updates, deletions):
+    """Apply partial product updates and deletions in chunked transactions.
+
+    ``updates`` are dicts with an ``id`` and any of ``price``, ``category``
+    and ``stock_delta``; ``deletions`` are product ids. Each chunk of up to
+    PRODUCT_BULK_CHUNK_SIZE items is one transaction of set-based
+    statements. Items fail individually (``not_found``, or ``conflict`` for
+    a stock delta below zero); a chunk whose transaction fails is reported
+    as ``failed`` and later chunks still run.
+
+    Returns a dict with per-item ``results``, the updated ``products`` and
+    the ``deleted`` ids.
+    """
+    results, products, deleted = [], [], []
+    chunks = [
+        ('update', updates[i:i + PRODUCT_BULK_CHUNK_SIZE])
+        for i in range(0, len(updates), PRODUCT_BULK_CHUNK_SIZE)
+    ] + [
+        ('delete', deletions[i:i + PRODUCT_BULK_CHUNK_SIZE])
+        for i in range(0, len(deletions), PRODUCT_BULK_CHUNK_SIZE)
+    ]
+    for action, chunk in chunks:
         try:
-            # Create order
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                if action == 'update':
+                    chunk_results, chunk_products = _bulk_update_chunk(cursor, chunk)
+                else:
+                    chunk_results, chunk_products = _bulk_delete_chunk(cursor, chunk), []
+                conn.commit()
+        except mysql.connector.Error as e:
+            ids = [item['id'] for item in chunk] if action == 'update' else chunk
+            results.extend(
+                {'id': product_id, 'action': action, 'status': 'failed', 'error': str(e)}
+                for product_id in ids
+            )
+            continue
+        for result in chunk_results:
+            result['action'] = action
+            if result['status'] == 'deleted':
+                deleted.append(result['id'])
+        results.extend(chunk_results)
+        products.extend(chunk_products)
+        _forget_products(chunk if action == 'delete' else [item['id'] for item in chunk])
+
+    if deleted:
+        with get_connection() as conn:
+            cursor = conn.cursor()
             cursor.execute(
-                """
-                INSERT INTO orders (user_id, total_amount, tax_amount, grand_total)
-                VALUES (%s, %s, %s, %s)
-                """,
-                (user_id, total_amount, tax_amount, grand_total),
+                'DELETE FROM product_deletions WHERE deleted_at < NOW() - INTERVAL %s DAY',
+                (PRODUCT_DELETION_RETENTION_DAYS,),
             )
-            order_id = cursor.lastrowid
-            
-            # Add order items
-            for item in cart_items:
-                cursor.execute(
-                    """
-                    INSERT INTO order_items 
-                    (order_id, product_id, product_name, product_price, quantity, subtotal)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    """,
-                    (order_id, item['product_id'], item['name'], 
-                     item['price'], item['quantity'], item['subtotal']),
-                )
-                
-                # Update product stock
-                cursor.execute(
-                    """
-                    UPDATE products 
-                    SET stock = stock - %s 
-                    WHERE id = %s AND stock >= %s
-                    """,
-                    (item['quantity'], item['product_id'], item['quantity']),
-                )
-            
             conn.commit()
-            return order_id
-        except mysql.connector.Error:
-            conn.rollback()
-            return None
+    return {'results': results, 'products': products, 'deleted': deleted}
 
 
-def get_user_orders(user_id):
-    """Get all orders for a user."""
+def get_product_changes(since=None):
+    """Get products changed and ids deleted since a sync point.
+
+    Returns a dict with ``products``, ``deleted`` ids, the server time to use
+    as the next ``since`` and a ``reset`` flag. A missing or expired ``since``
+    (older than the tombstone retention) yields a full snapshot with
+    ``reset`` set, telling the client to replace its local copy.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute('SELECT NOW() AS server_now')
+        server_now = cursor.fetchone()['server_now']
+
+        oldest_allowed = server_now - timedelta(days=PRODUCT_DELETION_RETENTION_DAYS)
+        if since is None or since < oldest_allowed:
+            cursor.execute('SELECT * FROM products ORDER BY created_at DESC')
+            return {
+                'products': cursor.fetchall(),
+                'deleted': [],
+                'since': server_now,
+                'reset': True,
+            }
+
+        window_start = since - timedelta(seconds=CHANGES_OVERLAP_SECONDS)
+        cursor.execute(
+            'SELECT * FROM products WHERE updated_at >= %s ORDER BY updated_at',
+            (window_start,),
+        )
+        products = cursor.fetchall()
+        cursor.execute(
+            'SELECT DISTINCT product_id FROM product_deletions WHERE deleted_at >= %s',
+            (window_start,),
+        )
+        deleted = [row['product_id'] for row in cursor.fetchall()]
+        return {
+            'products': products,
+            'deleted': deleted,
+            'since': server_now,
+            'reset': False,
+        }
+
+
+# Pricing rule functions
+def get_pricing_rules():
+    """Get all pricing rules."""
     with get_connection() as conn:
         cursor = conn.cursor(dictionary=True)
+        cursor.execute('SELECT * FROM pricing_rules ORDER BY id')
+        return cursor.fetchall()
+
+
+def create_pricing_rule(name, kind, scope, target, value, min_subtotal=0,
+                        starts_at=None, ends_at=None, active=True):
+    """Create a tax or promotion rule."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
         cursor.execute(
             """
-            SELECT * FROM orders 
-            WHERE user_id = %s 
-            ORDER BY created_at DESC
+            INSERT INTO pricing_rules
+            (name, kind, scope, target, value, min_subtotal, starts_at, ends_at, active)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
             """,
-            (user_id,),
+            (name, kind, scope, target, value, min_subtotal, starts_at, ends_at, int(active)),
         )
-        return cursor.fetchall()
+        conn.commit()
+        return cursor.lastrowid
 
 
-def get_order_details(order_id):
-    """Get order with all items."""
+def delete_pricing_rule(rule_id):
+    """Delete a pricing rule."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM pricing_rules WHERE id = %s', (rule_id,))
+        conn.commit()
+        return cursor.rowcount > 0
+
+
+# Idempotency key functions
+def claim_idempotency_key(key_hash, fingerprint):
+    """Claim a key for processing.
+
+    Returns None if this caller now owns the key, otherwise the existing
+    record (``fingerprint``, ``status_code``, ``response_body``; a NULL
+    status means the owner is still working). Expired and abandoned
+    claims are discarded first.
+    """
     with get_connection() as conn:
         cursor = conn.cursor(dictionary=True)
-        
-        # Get order info
-        cursor.execute('SELECT * FROM orders WHERE id = %s', (order_id,))
-        order = cursor.fetchone()
-        
-        if not order:
-            return None
-        
-        # Get order items
         cursor.execute(
             """
-            SELECT oi.*, p.image_url
-            FROM order_items oi
-            LEFT JOIN products p ON oi.product_id = p.id
-            WHERE oi.order_id = %s
+            DELETE FROM idempotency_keys
+            WHERE key_hash = %s
+              AND (created_at < NOW() - INTERVAL %s SECOND
+                   OR (status_code IS NULL AND created_at < NOW() - INTERVAL %s SECOND))
             """,
-            (order_id,),
+            (key_hash, IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_PENDING_TIMEOUT_SECONDS),
         )
-        order['items'] = cursor.fetchall()
-        
-        return order
+        try:
+            cursor.execute(
+                'INSERT INTO idempotency_keys (key_hash, fingerprint) VALUES (%s, %s)',
+                (key_hash, fingerprint),
+            )
+            conn.commit()
+            return None
+        except mysql.connector.IntegrityError as exc:
+            conn.rollback()
+            if exc.errno != errorcode.ER_DUP_ENTRY:
+                raise
+        return _select_idempotency_key(cursor, key_hash)
+
+
+def _select_idempotency_key(cursor, key_hash):
+    cursor.execute(
+        """
+        SELECT fingerprint, status_code, response_body FROM idempotency_keys
+        WHERE key_hash = %s
+        """,
+        (key_hash,),
+    )
+    return cursor.fetchone()
+
+
+def get_idempotency_key(key_hash):
+    """Get the stored record for an idempotency key."""
+    with get_connection() as conn:
+        return _select_idempotency_key(conn.cursor(dictionary=True), key_hash)
+
+
+def complete_idempotency_key(key_hash, status_code, response_body):
+    """Store the response for a claimed idempotency key."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE idempotency_keys SET status_code = %s, response_body = %s
+            WHERE key_hash = %s
+            """,
+            (status_code, response_body, key_hash),
+        )
+        conn.commit()
+
+
+def release_idempotency_key(key_hash):
+    """Drop a claimed key so the request can be retried from scratch."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM idempotency_keys WHERE key_hash = %s', (key_hash,))
+        conn.commit()
+
+
+def purge_idempotency_keys(batch_size=500):
+    """Delete a batch of expired idempotency keys."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            DELETE FROM idempotency_keys
+            WHERE created_at < NOW() - INTERVAL %s SECOND
+            LIMIT %s
+            """,
+            (IDEMPOTENCY_TTL_SECONDS, batch_size),
+        )
+        conn.commit()
+        return cursor.rowcount
+
+
+# Job queue functions
+def _enqueue_job(cursor, kind, payload, delay_seconds=0):
+    """Queue a job on the caller's cursor, so it commits or rolls back with its work."""
+    cursor.execute(
+        """
+        INSERT INTO jobs (kind, payload, max_attempts, run_at)
+        VALUES (%s, %s, %s, NOW() + INTERVAL %s SECOND)
+        """,
+        (kind, json.dumps(payload, default=str), JOB_MAX_ATTEMPTS, delay_seconds),
+    )
+    return cursor.lastrowid
+
+
+def enqueue_job(kind, payload, delay_seconds=0):
+    """Queue a job on its own."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        job_id = _enqueue_job(cursor, kind, payload, delay_seconds)
+        conn.commit()
+        return job_id
+
+
+def claim_jobs(worker_id, limit=10):
+    """Claim up to ``limit`` due jobs for a worker.
+
+    ``SKIP LOCKED`` (MySQL 8) lets several workers poll without blocking on
+    each other's claims. Jobs held past JOB_LOCK_TIMEOUT_SECONDS count as
+    due again, which recovers jobs of crashed workers.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            """
+            SELECT id FROM jobs
+            WHERE (status = 'queued' AND run_at <= NOW())
+               OR (status = 'running' AND locked_at < NOW() - INTERVAL %s SECOND)
+            ORDER BY run_at
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+            """,
+            (JOB_LOCK_TIMEOUT_SECONDS, limit),
+        )
+        ids = [row['id'] for row in cursor.fetchall()]
+        if not ids:
+            conn.rollback()
+            return []
+
+        placeholders = ', '.join(['%s'] * len(ids))
+        cursor.execute(
+            f"""
+            UPDATE jobs
+            SET status = 'running', attempts = attempts + 1,
+                locked_by = %s, locked_at = NOW()
+            WHERE id IN ({placeholders})
+            """,
+            (worker_id, *ids),
+        )
+        cursor.execute(
+            f"SELECT id, kind, payload, attempts, max_attempts FROM jobs WHERE id IN ({placeholders}) ORDER BY run_at",
+            ids,
+        )
+        jobs = cursor.fetchall()
+        conn.commit()
+    for job in jobs:
+        job['payload'] = json.loads(job['payload'])
+    return jobs
+
+
+def complete_job(job_id):
+    """Mark a job as done."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE jobs SET status = 'done', locked_by = NULL, locked_at = NULL, last_error = NULL
+            WHERE id = %s
+            """,
+            (job_id,),
+        )
+        conn.commit()
+
+
+def fail_job(job_id, error, retry_in_seconds):
+    """Record a failed attempt; retry later, or dead-letter once attempts run out."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE jobs
+            SET status = IF(attempts >= max_attempts, 'dead', 'queued'),
+                run_at = NOW() + INTERVAL %s SECOND,
+                locked_by = NULL, locked_at = NULL, last_error = %s
+            WHERE id = %s
+            """,
+            (retry_in_seconds, error[:65535], job_id),
+        )
+        cursor.execute('SELECT status FROM jobs WHERE id = %s', (job_id,))
+        status = cursor.fetchone()[0]
+        conn.commit()
+        return status
+
+
+def get_jobs(status='dead', limit=100):
+    """Get the most recent jobs with a given status."""
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            """
+            SELECT id, kind, payload, status, attempts, max_attempts, run_at,
+                   last_error, created_at, updated_at
+            FROM jobs WHERE status = %s
+            ORDER BY updated_at DESC
+            LIMIT %s
+            """,
+            (status, limit),
+        )
+        return cursor.fetchall()
+
+
+def retry_dead_jobs(job_ids=None):
+    """Put dead-lettered jobs (all, or the given ids) back in the queue."""
+    query = """
+        UPDATE jobs SET status = 'queued', attempts = 0, run_at = NOW(), last_error = NULL
+        WHERE status = 'dead'
+    """
+    params = ()
+    if job_ids:
+        query += f" AND id IN ({', '.join(['%s'] * len(job_ids))})"
+        params = tuple(job_ids)
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        conn.commit()
+        return cursor.rowcount
+
+
+def purge_jobs(batch_size=1000):
+    """Delete a batch of finished jobs older than JOB_RETENTION_DAYS."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            DELETE FROM jobs
+            WHERE status = 'done' AND updated_at < NOW() - INTERVAL %s DAY
+            LIMIT %s
+            """,
+            (JOB_RETENTION_DAYS, batch_size),
+        )
+        conn.commit()
+        return cursor.rowcount
+
+
+def claim_periodic_task(name, interval_seconds):
+    """Claim a periodic task's run if it last ran ``interval_seconds`` ago or more.
+
+    Due-ness is judged by the database clock, so workers whose host clocks
+    differ still agree; only one of several workers polling at once wins.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT IGNORE INTO periodic_tasks (name, last_run_at)
+            VALUES (%s, '1970-01-02 00:00:00')
+            """,
+            (name,),
+        )
+        cursor.execute(
+            """
+            UPDATE periodic_tasks SET last_run_at = NOW()
+            WHERE name = %s AND last_run_at <= NOW() - INTERVAL %s SECOND
+            """,
+            (name, interval_seconds),
+        )
+        conn.commit()
+        return cursor.rowcount > 0
+
+
+def claim_order_mail(order_id):
+    """Record that an order's confirmation mail is being sent.
+
+    Returns False if it already was, so a retried job does not mail twice.
+    Call ``release_order_mail`` if sending then fails.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('INSERT IGNORE INTO order_mails (order_id) VALUES (%s)', (order_id,))
+        conn.commit()
+        return cursor.rowcount > 0
+
+
+def release_order_mail(order_id):
+    """Forget a claimed order mail that could not be sent, so a retry sends it."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM order_mails WHERE order_id = %s', (order_id,))
+        conn.commit()
+
+
+def purge_order_mails(batch_size=1000):
+    """Forget mailed order ids older than JOB_RETENTION_DAYS (their jobs are gone)."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            DELETE FROM order_mails
+            WHERE sent_at < NOW() - INTERVAL %s DAY
+            LIMIT %s
+            """,
+            (JOB_RETENTION_DAYS, batch_size),
+        )
+        conn.commit()
+        return cursor.rowcount
+
+
+# Cart functions
+def _cache_cart_count(user_id, count=None, delta=0):
+    """Store a user's cart count, or adjust a fresh cached one by ``delta``."""
+    if user_id is None:
+        return
+    with _cart_counts_lock:
+        if count is not None:
+            _cart_counts[user_id] = (time.monotonic() + CART_COUNT_TTL_SECONDS, count)
+            _cart_counts.move_to_end(user_id)
+            while len(_cart_counts) > CART_COUNT_CACHE_SIZE:
+                _cart_counts.popitem(last=False)
+            return
+        entry = _cart_counts.get(user_id)
+        if entry is not None:
+            # Keep the original expiry so the TTL still bounds drift
+            _cart_counts[user_id] = (entry[0], max(entry[1] + delta, 0))
+
+
+def get_cart_count(user_id):
+    """Get the number of items in a user's cart, cached per process."""
+    with _cart_counts_lock:
+        entry = _cart_counts.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            _cart_counts.move_to_end(user_id)
+            return entry[1]
+
+    with user_connection(user_id) as (_, conn):
+        cursor = _statement_cache.execute(conn, _CART_COUNT, (user_id,))
+        count = cursor.fetchall()[0][0]
+    _cache_cart_count(user_id, count)
+    return count
+
+
+def add_to_cart(user_id, product_id, quantity=1):
+    """Add or update item in cart."""
+    with user_connection(user_id, write=True) as (_, conn):
+        try:
+            cursor = _statement_cache.execute(
+                conn, _ADD_CART_ITEM,
+                (_new_id('cart_items'), user_id, product_id, quantity, quantity),
+            )
+            conn.commit()
+            # 1 row affected: a new line; 2: an existing line's quantity grew
+            if cursor.rowcount == 1:
+                _after_commit(partial(_cache_cart_count, user_id, delta=1))
+            return True
+        except mysql.connector.Error:
+            conn.rollback()
+            return False
+
+
+def get_cart_items(user_id):
+    """Get all cart items for a user with product details."""
+    with user_connection(user_id) as (shard, conn):
+        if shard == sharding.GLOBAL_SHARD:
+            cursor = _statement_cache.execute(conn, _CART_ITEMS_JOINED, (user_id,))
+            return fetch_rows(cursor, CartItem)
+
+        cursor = _statement_cache.execute(conn, _CART_ITEMS, (user_id,))
+        rows = cursor.fetchall()
+
+    # Products live on the global node: join in Python
+    products = _fetch_products(
+        [product_id for _, _, product_id in rows],
+        'id, name, description, price, category, image_url, stock',
+    )
+    items = []
+    for cart_item_id, quantity, product_id in rows:
+        product = products.get(product_id)
+        if product is None:
+            continue
+        items.append(CartItem((
+            cart_item_id, quantity, product['id'], product['name'], product['description'],
+            product['price'], product['category'], product['image_url'], product['stock'],
+            quantity * product['price'],
+        )))
+    return items
+
+
+def update_cart_quantity(cart_item_id, quantity, user_id=None):
+    """Update quantity of a cart item."""
+    if user_id is None:
+        user_id = _find_owner('cart_items', cart_item_id)
+    with user_connection(user_id, write=True) as (_, conn):
+        cursor = conn.cursor()
+        if quantity <= 0:
+            return _delete_cart_item(conn, cursor, cart_item_id, user_id)
+        cursor.execute(
+            'UPDATE cart_items SET quantity = %s WHERE id = %s',
+            (quantity, cart_item_id),
+        )
+        conn.commit()
+        return cursor.rowcount > 0
+
+
+def remove_from_cart(cart_item_id, user_id=None):
+    """Remove an item from cart."""
+    if user_id is None:
+        user_id = _find_owner('cart_items', cart_item_id)
+    with user_connection(user_id, write=True) as (_, conn):
+        return _delete_cart_item(conn, conn.cursor(), cart_item_id, user_id)
+
+
+def _delete_cart_item(conn, cursor, cart_item_id, user_id):
+    if user_id is None:
+        # Needed to keep the owner's cached cart count exact
+        cursor.execute('SELECT user_id FROM cart_items WHERE id = %s', (cart_item_id,))
+        row = cursor.fetchone()
+        user_id = row[0] if row else None
+    cursor.execute('DELETE FROM cart_items WHERE id = %s', (cart_item_id,))
+    conn.commit()
+    if cursor.rowcount > 0:
+        _after_commit(partial(_cache_cart_count, user_id, delta=-1))
+        return True
+    return False
+
+
+def clear_cart(user_id):
+    """Clear all items from user's cart."""
+    with user_connection(user_id, write=True) as (_, conn):
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM cart_items WHERE user_id = %s', (user_id,))
+        conn.commit()
+    _after_commit(partial(_cache_cart_count, user_id, 0))
+    return True
+
+
+# Abandoned cart expiry
+# Lines of carts with no line newer than the cutoff, oldest first; the
+# created_at index drives the scan, the unique key the per-user check.
+_ABANDONED_CART_ITEMS = """
+    SELECT c.id, c.user_id FROM cart_items c
+    WHERE c.created_at < %s
+      AND NOT EXISTS (
+          SELECT 1 FROM cart_items recent
+          WHERE recent.user_id = c.user_id AND recent.created_at >= %s
+      )
+    ORDER BY c.created_at
+"""
+
+
+def count_abandoned_cart_items(retention_days=CART_RETENTION_DAYS, shard=sharding.GLOBAL_SHARD):
+    """Count cart lines and carts that expire_abandoned_carts would delete."""
+    with get_connection(shard) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT NOW() - INTERVAL %s DAY', (retention_days,))
+        cutoff = cursor.fetchone()[0]
+        cursor.execute(
+            f"SELECT COUNT(*), COUNT(DISTINCT user_id) FROM ({_ABANDONED_CART_ITEMS}) expired",
+            (cutoff, cutoff),
+        )
+        rows, carts = cursor.fetchone()
+        return {'rows': rows, 'carts': carts}
+
+
+def _wait_for_replica():
+    lag = get_replica_lag()
+    while lag is not None and lag > MAX_REPLICA_LAG_SECONDS:
+        time.sleep(1)
+        lag = get_replica_lag()
+
+
+def expire_abandoned_carts(retention_days=CART_RETENTION_DAYS, batch_size=500,
+                           pause_seconds=0.1, shard=sharding.GLOBAL_SHARD, progress=None):
+    """Delete carts idle for ``retention_days`` in small batches.
+
+    Each batch is selected through the created_at index and deleted by
+    primary key in its own short transaction, then the job pauses (and
+    waits for a lagging replica) so row locks and replication stay light.
+    """
+    progress = progress or (lambda deleted, elapsed: None)
+    deleted = 0
+    started = time.perf_counter()
+    with get_connection(shard) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT NOW() - INTERVAL %s DAY', (retention_days,))
+        cutoff = cursor.fetchone()[0]
+        while True:
+            cursor.execute(f"{_ABANDONED_CART_ITEMS} LIMIT %s", (cutoff, cutoff, batch_size))
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                conn.rollback()
+                break
+            cursor.execute(
+                f"DELETE FROM cart_items WHERE id IN ({', '.join(['%s'] * len(ids))})", ids
+            )
+            conn.commit()
+            deleted += cursor.rowcount
+            progress(deleted, time.perf_counter() - started)
+            if len(ids) < batch_size:
+                break
+            time.sleep(pause_seconds)
+            _wait_for_replica()
+
+    elapsed = time.perf_counter() - started
+    return {
+        'shard': shard,
+        'deleted': deleted,
+        'seconds': round(elapsed, 2),
+        'rows_per_second': round(deleted / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def optimize_cart_table(shard=sharding.GLOBAL_SHARD):
+    """Rebuild cart_items (online for InnoDB) to reclaim space after large purges."""
+    with get_connection(shard) as conn:
+        cursor = conn.cursor()
+        cursor.execute('OPTIMIZE TABLE cart_items')
+        cursor.fetchall()
+
+
+# Order functions
+def create_order(user_id, total_amount, tax_amount, grand_total, cart_items, discounts=None):
+    """Create a new order from cart items.
+
+    ``discounts`` holds each line's total discount, aligned with
+    ``cart_items``; line subtotals less discounts sum to ``total_amount``.
+    Returns ``(order_id, sold)``, where ``sold`` lists the cart items whose
+    stock was actually decremented (a line short of stock is left as is),
+    or ``(None, [])`` if the order could not be written.
+
+    The order is written to the user's shard; stock, sales rollups and the
+    ``order.placed`` job (which also counts product pairs) to the global
+    node. When those differ, the shard commits first and its order is
+    deleted again if the global commit fails, so a retry cannot double-order.
+    """
+    with user_connection(user_id, write=True) as (shard, conn), \
+            _global_connection(shard, conn) as global_conn:
+        cursor = conn.cursor()
+        global_cursor = global_conn.cursor()
+        try:
+            # Create order
+            order_id = _new_id('orders')
+            cursor.execute(
+                """
+                INSERT INTO orders (id, user_id, total_amount, tax_amount, grand_total)
+                VALUES (%s, %s, %s, %s, %s)
+                """,
+                (order_id, user_id, total_amount, tax_amount, grand_total),
+            )
+            order_id = order_id or cursor.lastrowid
+            cursor.execute('SELECT created_at FROM orders WHERE id = %s', (order_id,))
+            created_at = cursor.fetchone()[0]
+            
+            if discounts is None:
+                discounts = [0] * len(cart_items)
+            sold = []
+
+            # Add order items
+            for item, discount in zip(cart_items, discounts):
+                cursor.execute(
+                    """
+                    INSERT INTO order_items 
+                    (id, order_id, product_id, product_name, product_price, quantity, subtotal,
+                     discount, category, created_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    """,
+                    (_new_id('order_items'), order_id, item['product_id'], item['name'],
+                     item['price'], item['quantity'], item['subtotal'], discount,
+                     item.get('category') or '', created_at),
+                )
+                
+                # Update product stock
+                global_cursor.execute(
+                    """
+                    UPDATE products 
+                    SET stock = stock - %s 
+                    WHERE id = %s AND stock >= %s
+                    """,
+                    (item['quantity'], item['product_id'], item['quantity']),
+                )
+                if global_cursor.rowcount > 0:
+                    sold.append(item)
+
+            _apply_sales_rollups(
+                global_cursor, created_at.date(), total_amount, tax_amount, grand_total,
+                cart_items, discounts,
+            )
+            # Follow-up work runs in the job worker once this commits
+            _enqueue_job(global_cursor, 'order.placed', {
+                'order_id': order_id,
+                'user_id': user_id,
+                'product_ids': [item['product_id'] for item in cart_items],
+            })
+            
+            conn.commit()
+            if global_conn is not conn:
+                try:
+                    global_conn.commit()
+                except mysql.connector.Error:
+                    cursor.execute('DELETE FROM order_items WHERE order_id = %s', (order_id,))
+                    cursor.execute('DELETE FROM orders WHERE id = %s', (order_id,))
+                    conn.commit()
+                    raise
+            _forget_products([item['product_id'] for item in cart_items])
+            return order_id, sold
+        except mysql.connector.Error:
+            conn.rollback()
+            global_conn.rollback()
+            return None, []
+
+
+def _apply_sales_rollups(cursor, sale_date, total_amount, tax_amount, grand_total,
+                         cart_items, discounts):
+    """Fold one order's lines into the sales rollup tables.
+
+    Runs inside the checkout transaction so rollups never drift from orders.
+    Revenue is net of discounts, matching ``rebuild_sales_rollups``. Lines
+    are aggregated per product and category first, so each rollup row is
+    touched once per order.
+    """
+    products = {}
+    categories = {}
+    units = 0
+    for item, discount in zip(cart_items, discounts):
+        quantity = int(item['quantity'])
+        net = item['subtotal'] - discount
+        units += quantity
+
+        name, product_units, product_revenue = products.get(
+            item['product_id'], (item['name'], 0, 0)
+        )
+        products[item['product_id']] = (name, product_units + quantity, product_revenue + net)
+
+        category = item.get('category') or 'Uncategorized'
+        category_units, category_revenue = categories.get(category, (0, 0))
+        categories[category] = (category_units + quantity, category_revenue + net)
+
+    cursor.execute(
+        """
+        INSERT INTO sales_daily (sale_date, order_count, units, revenue, tax, grand_total)
+        VALUES (%s, 1, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            order_count = order_count + 1,
+            units = units + VALUES(units),
+            revenue = revenue + VALUES(revenue),
+            tax = tax + VALUES(tax),
+            grand_total = grand_total + VALUES(grand_total)
+        """,
+        (sale_date, units, total_amount, tax_amount, grand_total),
+    )
+    cursor.executemany(
+        """
+        INSERT INTO sales_product_daily (sale_date, product_id, product_name, units, revenue)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            product_name = VALUES(product_name),
+            units = units + VALUES(units),
+            revenue = revenue + VALUES(revenue)
+        """,
+        [
+            (sale_date, product_id, name, product_units, product_revenue)
+            for product_id, (name, product_units, product_revenue) in products.items()
+        ],
+    )
+    cursor.executemany(
+        """
+        INSERT INTO sales_category_daily (sale_date, category, units, revenue)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            units = units + VALUES(units),
+            revenue = revenue + VALUES(revenue)
+        """,
+        [
+            (sale_date, category, category_units, category_revenue)
+            for category, (category_units, category_revenue) in categories.items()
+        ],
+    )
+
+
+def count_product_pairs(order_id, product_ids):
+    """Count one order toward every pair of distinct products it contains.
+
+    Runs once per order: the order id is recorded in the same transaction,
+    so a retried ``order.placed`` job does not count it twice. Returns
+    False if it was already counted.
+    """
+    product_ids = sorted({product_id for product_id in product_ids if product_id})
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                'INSERT IGNORE INTO product_pair_orders (order_id) VALUES (%s)', (order_id,)
+            )
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return False
+            if 2 <= len(product_ids) <= RELATED_MAX_ORDER_LINES:
+                cursor.executemany(
+                    """
+                    INSERT INTO product_pairs (product_id, related_id, orders)
+                    VALUES (%s, %s, 1)
+                    ON DUPLICATE KEY UPDATE orders = orders + 1
+                    """,
+                    [(a, b) for a in product_ids for b in product_ids if a != b],
+                )
+            conn.commit()
+            return True
+        except mysql.connector.Error:
+            conn.rollback()
+            raise
+
+
+def purge_product_pair_orders(batch_size=1000):
+    """Forget counted order ids older than JOB_RETENTION_DAYS (their jobs are gone)."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            DELETE FROM product_pair_orders
+            WHERE counted_at < NOW() - INTERVAL %s DAY
+            LIMIT %s
+            """,
+            (JOB_RETENTION_DAYS, batch_size),
+        )
+        conn.commit()
+        return cursor.rowcount
+
+
+def rebuild_product_pairs():
+    """Recompute product co-occurrence counts from order_items (one set-based pass).
+
+    Every order it saw is marked counted, so its pending job leaves it alone.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute('DELETE FROM product_pairs')
+            cursor.execute(
+                """
+                INSERT IGNORE INTO product_pair_orders (order_id)
+                SELECT DISTINCT order_id FROM order_items
+                """
+            )
+            cursor.execute(
+                """
+                INSERT INTO product_pairs (product_id, related_id, orders)
+                SELECT a.product_id, b.product_id, COUNT(DISTINCT a.order_id)
+                FROM order_items a
+                JOIN order_items b ON b.order_id = a.order_id AND b.product_id <> a.product_id
+                JOIN (
+                    SELECT order_id FROM order_items
+                    GROUP BY order_id
+                    HAVING COUNT(DISTINCT product_id) BETWEEN 2 AND %s
+                ) eligible ON eligible.order_id = a.order_id
+                GROUP BY a.product_id, b.product_id
+                """,
+                (RELATED_MAX_ORDER_LINES,),
+            )
+            pairs = cursor.rowcount
+            conn.commit()
+            return pairs
+        except mysql.connector.Error:
+            conn.rollback()
+            raise
+
+
+def iter_product_pairs(chunk_size=5000):
+    """Yield ``(product_id, related_id, orders)`` rows, strongest pairs first per product."""
+    with get_connection() as conn:
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(
+            """
+            SELECT product_id, related_id, orders FROM product_pairs
+            ORDER BY product_id, orders DESC, related_id
+            """
+        )
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            if conn.unread_result:
+                conn.consume_results()
+
+
+def publish_related_index(content):
+    """Store a freshly built related-products index file; return its build time."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO related_index (id, content, built_at) VALUES (1, %s, NOW(6))
+            ON DUPLICATE KEY UPDATE content = VALUES(content), built_at = VALUES(built_at)
+            """,
+            (content,),
+        )
+        conn.commit()
+        cursor.execute('SELECT built_at FROM related_index WHERE id = 1')
+        return cursor.fetchone()[0]
+
+
+def get_related_index_built_at():
+    """Get when the published related-products index was built, or None."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT built_at FROM related_index WHERE id = 1')
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+
+def get_related_index():
+    """Get the published related-products index as ``(content, built_at)``, or None."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT content, built_at FROM related_index WHERE id = 1')
+        row = cursor.fetchone()
+        return (bytes(row[0]), row[1]) if row else None
+
+
+def get_live_sales_start():
+    """Return the first day whose orders all still live in MySQL, on every
+    shard (None if no order was ever archived)."""
+    newest = None
+    for shard in _all_nodes():
+        with get_connection(shard) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT MAX(created_at) FROM archived_orders')
+            archived = cursor.fetchone()[0]
+        if archived is not None and (newest is None or archived > newest):
+            newest = archived
+    # Partitions are archived a whole month at a time
+    return _month_start(newest.date(), 1) if newest is not None else None
+
+
+def rebuild_sales_rollups(since=None, batch_size=1000):
+    """Recompute the sales rollups from orders on every shard (for backfills).
+
+    Only days from ``since`` on are replaced; by default that is every day
+    whose orders are all still in MySQL, and an earlier ``since`` raises
+    ``ValueError``. Rollup rows for archived months are kept, since their
+    orders no longer live in MySQL. Categories are the order-time snapshot
+    on ``order_items``, as ``create_order`` rolls them up; items written
+    before schema version 10 fall back to the product's current category.
+    Order items written before schema version 7 carry no discount, so their
+    product and category revenue is counted gross. Returns the first day
+    rebuilt (None: every day).
+    """
+    live_start = get_live_sales_start()
+    if since is None:
+        since = live_start
+    elif live_start is not None and since < live_start:
+        raise ValueError(f"Orders before {live_start} are archived; rebuild from there on")
+
+    date_filter = ' WHERE sale_date >= %s' if since is not None else ''
+    params = (since,) if since is not None else ()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for table in ('sales_daily', 'sales_product_daily', 'sales_category_daily'):
+                cursor.execute(f"DELETE FROM {table}{date_filter}", params)
+            # Shards share days, so each one's totals are added to the others'
+            for shard in _all_nodes():
+                _add_shard_sales(cursor, shard, since, batch_size)
+            conn.commit()
+        except mysql.connector.Error:
+            conn.rollback()
+            raise
+    return since
+
+
+def _all_nodes():
+    """The global node followed by every shard."""
+    return [sharding.GLOBAL_SHARD, *(SHARD_CONFIG['shards'] if SHARD_CONFIG else ())]
+
+
+def _add_shard_sales(cursor, shard, since, batch_size):
+    """Add one shard's orders from ``since`` on to the rollups through ``cursor``."""
+    order_filter = ' WHERE o.created_at >= %s' if since is not None else ''
+    item_filter = ' WHERE created_at >= %s' if since is not None else ''
+    params = (since,) if since is not None else ()
+
+    with get_connection(shard) as conn:
+        source = conn.cursor()
+        source.execute(
+            f"""
+            SELECT DATE(o.created_at), COUNT(*),
+                   COALESCE(SUM(li.units), 0), SUM(o.total_amount),
+                   SUM(o.tax_amount), SUM(o.grand_total)
+            FROM orders o
+            LEFT JOIN (
+                SELECT order_id, SUM(quantity) AS units
+                FROM order_items{item_filter} GROUP BY order_id
+            ) li ON li.order_id = o.id
+            {order_filter}
+            GROUP BY DATE(o.created_at)
+            """,
+            params * 2,
+        )
+        cursor.executemany(
+            """
+            INSERT INTO sales_daily (sale_date, order_count, units, revenue, tax, grand_total)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                order_count = order_count + VALUES(order_count),
+                units = units + VALUES(units),
+                revenue = revenue + VALUES(revenue),
+                tax = tax + VALUES(tax),
+                grand_total = grand_total + VALUES(grand_total)
+            """,
+            source.fetchall(),
+        )
+
+        source = conn.cursor(buffered=False)
+        source.execute(
+            f"""
+            SELECT DATE(o.created_at), COALESCE(oi.product_id, 0), MAX(oi.product_name),
+                   oi.category, SUM(oi.quantity), SUM(oi.subtotal - oi.discount)
+            FROM order_items oi
+            JOIN orders o ON o.id = oi.order_id
+            {order_filter}
+            GROUP BY DATE(o.created_at), COALESCE(oi.product_id, 0), oi.category
+            """,
+            params,
+        )
+        while True:
+            rows = source.fetchmany(batch_size)
+            if not rows:
+                break
+            _add_line_sales(cursor, rows)
+
+
+def _add_line_sales(cursor, rows):
+    """Add ``(sale_date, product_id, name, category, units, revenue)`` rows
+    to the product and category rollups."""
+    # Products live on the global node, so legacy items are resolved here
+    current = _fetch_products(
+        [product_id for _, product_id, _, category, _, _ in rows if category is None],
+        'id, category',
+    )
+    categories = {}
+    for sale_date, product_id, _, category, units, revenue in rows:
+        if category is None:
+            category = (current.get(product_id) or {}).get('category')
+        key = (sale_date, category or 'Uncategorized')
+        category_units, category_revenue = categories.get(key, (0, 0))
+        categories[key] = (category_units + units, category_revenue + revenue)
+
+    cursor.executemany(
+        """
+        INSERT INTO sales_product_daily (sale_date, product_id, product_name, units, revenue)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            product_name = VALUES(product_name),
+            units = units + VALUES(units),
+            revenue = revenue + VALUES(revenue)
+        """,
+        [
+            (sale_date, product_id, name, units, revenue)
+            for sale_date, product_id, name, _, units, revenue in rows
+        ],
+    )
+    cursor.executemany(
+        """
+        INSERT INTO sales_category_daily (sale_date, category, units, revenue)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            units = units + VALUES(units),
+            revenue = revenue + VALUES(revenue)
+        """,
+        [
+            (sale_date, category, units, revenue)
+            for (sale_date, category), (units, revenue) in categories.items()
+        ],
+    )
+
+
+# Analytics functions (read rollups only)
+def get_revenue_series(start_date, end_date, interval='day'):
+    """Get revenue per day or month between two dates (inclusive)."""
+    period = 'sale_date' if interval == 'day' else "DATE_FORMAT(sale_date, '%%Y-%%m-01')"
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            f"""
+            SELECT {period} AS period, SUM(order_count) AS order_count,
+                   SUM(units) AS units, SUM(revenue) AS revenue,
+                   SUM(tax) AS tax, SUM(grand_total) AS grand_total
+            FROM sales_daily
+            WHERE sale_date BETWEEN %s AND %s
+            GROUP BY period
+            ORDER BY period
+            """,
+            (start_date, end_date),
+        )
+        return cursor.fetchall()
+
+
+def get_top_products(start_date, end_date, limit=10, order_by='revenue'):
+    """Get best-selling products between two dates by revenue or units."""
+    order_column = 'units' if order_by == 'units' else 'revenue'
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            f"""
+            SELECT product_id, MAX(product_name) AS product_name,
+                   SUM(units) AS units, SUM(revenue) AS revenue
+            FROM sales_product_daily
+            WHERE sale_date BETWEEN %s AND %s
+            GROUP BY product_id
+            ORDER BY {order_column} DESC
+            LIMIT %s
+            """,
+            (start_date, end_date, limit),
+        )
+        return cursor.fetchall()
+
+
+def get_category_mix(start_date, end_date):
+    """Get units and revenue per category between two dates."""
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            """
+            SELECT category, SUM(units) AS units, SUM(revenue) AS revenue
+            FROM sales_category_daily
+            WHERE sale_date BETWEEN %s AND %s
+            GROUP BY category
+            ORDER BY revenue DESC
+            """,
+            (start_date, end_date),
+        )
+        return cursor.fetchall()
+
+
+def get_user_orders(user_id):
+    """Get all orders for a user, including archived ones."""
+    columns = ', '.join(OrderSummary._fields)
+    with user_connection(user_id) as (_, conn):
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT {columns} FROM orders 
+            WHERE user_id = %s 
+            ORDER BY created_at DESC
+            """,
+            (user_id,),
+        )
+        orders = fetch_rows(cursor, OrderSummary)
+
+        # Archived orders are always older than live ones
+        cursor.execute(
+            f"""
+            SELECT {columns}
+            FROM archived_orders
+            WHERE user_id = %s
+            ORDER BY created_at DESC
+            """,
+            (user_id,),
+        )
+        return orders + fetch_rows(cursor, OrderSummary)
+
+
+def get_order_details(order_id, user_id=None):
+    """Get order with all items."""
+    if user_id is None:
+        user_id = _find_owner('orders', order_id) or _find_owner('archived_orders', order_id)
+    with user_connection(user_id) as (shard, conn):
+        cursor = conn.cursor(dictionary=True)
+        
+        # Get order info
+        cursor.execute('SELECT * FROM orders WHERE id = %s', (order_id,))
+        order = cursor.fetchone()
+        
+        if not order:
+            cursor.execute(
+                'SELECT archive_file FROM archived_orders WHERE id = %s', (order_id,)
+            )
+            archived = cursor.fetchone()
+            if not archived:
+                return None
+            return archive.read_archived_order(
+                os.path.join(archive.ARCHIVE_DIR, archived['archive_file']), order_id
+            )
+        
+        # Get order items
+        if shard == sharding.GLOBAL_SHARD:
+            cursor.execute(
+                """
+                SELECT oi.*, p.image_url
+                FROM order_items oi
+                LEFT JOIN products p ON oi.product_id = p.id
+                WHERE oi.order_id = %s
+                """,
+                (order_id,),
+            )
+            order['items'] = cursor.fetchall()
+            return order
+
+        cursor.execute('SELECT * FROM order_items WHERE order_id = %s', (order_id,))
+        order['items'] = cursor.fetchall()
+
+    products = {
+        product['id']: product
+        for product in get_products_by_ids(
+            item['product_id'] for item in order['items'] if item['product_id'] is not None
+        )
+    }
+    for item in order['items']:
+        product = products.get(item['product_id'])
+        item['image_url'] = product['image_url'] if product else None
+    return order
+
+
+# Stock forecasting functions
+def iter_product_sales_by_age(today, window, chunk_size=50000):
+    """Yield lists of ``(product_id, age, units)`` rows from the product rollup
+    for the ``window`` full days before ``today`` (age 0 = yesterday).
+
+    Rows come in primary key order (date, product), so the scan is a single
+    range read; callers must not rely on rows being grouped by product.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(
+            """
+            SELECT product_id, DATEDIFF(%s, sale_date) - 1, units FROM sales_product_daily
+            WHERE sale_date >= %s AND sale_date < %s AND product_id <> 0
+            """,
+            (today, today - timedelta(days=window), today),
+        )
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            if conn.unread_result:
+                conn.consume_results()
+
+
+def get_stock_levels():
+    """Get ``(product_id, stock)`` for every product."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, stock FROM products')
+        return cursor.fetchall()
+
+
+def save_stock_projections(projections, batch_size=1000):
+    """Replace the stock projections with ``(product_id, stock, daily_demand,
+    days_of_cover, stockout_date)`` rows; return how many were written.
+
+    Rows are upserted in small committed batches, then rows the run did not
+    touch (deleted products) are removed, so readers never see an empty table.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT NOW()')
+            computed_at = cursor.fetchone()[0]
+            written = 0
+            for start in range(0, len(projections), batch_size):
+                batch = projections[start:start + batch_size]
+                cursor.executemany(
+                    """
+                    INSERT INTO stock_projections
+                        (product_id, stock, daily_demand, days_of_cover, stockout_date, computed_at)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                        stock = VALUES(stock),
+                        daily_demand = VALUES(daily_demand),
+                        days_of_cover = VALUES(days_of_cover),
+                        stockout_date = VALUES(stockout_date),
+                        computed_at = VALUES(computed_at)
+                    """,
+                    [(*row, computed_at) for row in batch],
+                )
+                conn.commit()
+                written += len(batch)
+            cursor.execute('DELETE FROM stock_projections WHERE computed_at < %s', (computed_at,))
+            conn.commit()
+            return written
+        except mysql.connector.Error:
+            conn.rollback()
+            raise
+
+
+def get_last_stock_projection():
+    """Get when stock projections were last computed, or None."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT MAX(computed_at) FROM stock_projections')
+        return cursor.fetchone()[0]
+
+
+def get_projected_stockouts(within_days, limit=100):
+    """Get products projected to run out within ``within_days``, soonest first."""
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            """
+            SELECT sp.product_id, p.name, p.category, sp.stock, sp.daily_demand,
+                   sp.days_of_cover, sp.stockout_date, sp.computed_at
+            FROM stock_projections sp
+            JOIN products p ON p.id = sp.product_id
+            WHERE sp.days_of_cover <= %s
+            ORDER BY sp.days_of_cover, sp.daily_demand DESC
+            LIMIT %s
+            """,
+            (within_days, limit),
+        )
+        return cursor.fetchall()
+
+
+# Bulk export
+EXPORT_QUERIES = {
+    'products': 'SELECT * FROM products ORDER BY id',
+    'orders': 'SELECT * FROM orders ORDER BY id',
+    'order_items': 'SELECT * FROM order_items ORDER BY id',
+}
+
+
+def stream_rows(dataset, chunk_size=1000):
+    """Yield a dataset's column names, then row chunks, from an unbuffered cursor.
+
+    Rows are read from the server ``chunk_size`` at a time as plain tuples,
+    so memory stays flat however large the table is. The pooled connection
+    is held until the generator is exhausted or closed.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(EXPORT_QUERIES[dataset])
+        try:
+            yield [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            # An aborted download leaves rows on the wire; drain them so the
+            # connection goes back to the pool clean.
+            if conn.unread_result:
+                conn.consume_results()
+
+
+# Order partitioning and archival
+def _month_start(day, offset=0):
+    """Return the first day of the month ``offset`` months after ``day``."""
+    month_index = day.year * 12 + day.month - 1 + offset
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def _partition_clause(month):
+    upper = _month_start(month, 1)
+    return (
+        f"PARTITION p{month:%Y%m} VALUES LESS THAN "
+        f"(UNIX_TIMESTAMP('{upper:%Y-%m-%d} 00:00:00'))"
+    )
+
+
+def _drop_foreign_keys(cursor, table):
+    cursor.execute(
+        """
+        SELECT constraint_name FROM information_schema.referential_constraints
+        WHERE constraint_schema = %s AND table_name = %s
+        """,
+        (MYSQL_DATABASE, table),
+    )
+    for (name,) in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE `{table}` DROP FOREIGN KEY `{name}`")
+
+
+def is_orders_partitioned():
+    """Return True if the orders table uses monthly range partitioning."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT COUNT(*) FROM information_schema.partitions
+            WHERE table_schema = %s AND table_name = 'orders'
+              AND partition_name IS NOT NULL
+            """,
+            (MYSQL_DATABASE,),
+        )
+        return cursor.fetchone()[0] > 0
+
+
+def partition_order_tables():
+    """Convert orders and order_items to monthly RANGE partitions on created_at.
+
+    MySQL does not allow foreign keys on partitioned tables and requires
+    the partition column in every unique key, so this drops the foreign
+    keys and widens both primary keys to ``(id, created_at)``. Referential
+    integrity for these tables is enforced by ``create_order`` instead.
+    """
+    if is_orders_partitioned():
+        return False
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        _drop_foreign_keys(cursor, 'order_items')
+        _drop_foreign_keys(cursor, 'orders')
+
+        cursor.execute(
+            """
+            UPDATE order_items oi JOIN orders o ON o.id = oi.order_id
+            SET oi.created_at = o.created_at
+            """
+        )
+        conn.commit()
+
+        cursor.execute(
+            """
+            ALTER TABLE orders
+                MODIFY created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                DROP PRIMARY KEY,
+                ADD PRIMARY KEY (id, created_at),
+                ADD INDEX idx_orders_user (user_id, created_at)
+            """
+        )
+        cursor.execute(
+            """
+            ALTER TABLE order_items
+                DROP PRIMARY KEY,
+                ADD PRIMARY KEY (id, created_at),
+                ADD INDEX idx_order_items_order (order_id)
+            """
+        )
+
+        cursor.execute('SELECT MIN(created_at) FROM orders')
+        oldest = cursor.fetchone()[0]
+        first = _month_start(oldest.date() if oldest else date.today())
+        last = _month_start(date.today(), ORDER_PARTITION_MONTHS_AHEAD)
+        clauses = []
+        month = first
+        while month <= last:
+            clauses.append(_partition_clause(month))
+            month = _month_start(month, 1)
+        clauses.append('PARTITION pmax VALUES LESS THAN MAXVALUE')
+
+        for table in ('orders', 'order_items'):
+            cursor.execute(
+                f"ALTER TABLE `{table}` PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) "
+                f"({', '.join(clauses)})"
+            )
+        return True
+
+
+def get_order_partitions():
+    """Return the ``pYYYYMM`` partition names of orders, oldest first."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT partition_name FROM information_schema.partitions
+            WHERE table_schema = %s AND table_name = 'orders'
+              AND partition_name IS NOT NULL AND partition_name <> 'pmax'
+            ORDER BY partition_ordinal_position
+            """,
+            (MYSQL_DATABASE,),
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def ensure_order_partitions(months_ahead=ORDER_PARTITION_MONTHS_AHEAD):
+    """Split ``pmax`` so partitions exist up to ``months_ahead`` months out."""
+    partitions = get_order_partitions()
+    if not partitions:
+        return []
+
+    newest = partitions[-1]
+    month = _month_start(date(int(newest[1:5]), int(newest[5:7]), 1), 1)
+    last = _month_start(date.today(), months_ahead)
+    clauses = []
+    added = []
+    while month <= last:
+        clauses.append(_partition_clause(month))
+        added.append(f"p{month:%Y%m}")
+        month = _month_start(month, 1)
+    if not clauses:
+        return []
+
+    clauses.append('PARTITION pmax VALUES LESS THAN MAXVALUE')
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        for table in ('orders', 'order_items'):
+            cursor.execute(
+                f"ALTER TABLE `{table}` REORGANIZE PARTITION pmax INTO ({', '.join(clauses)})"
+            )
+    return added
+
+
+def get_archivable_partitions(retention_months=ORDER_RETENTION_MONTHS):
+    """Return partitions entirely older than the retention window."""
+    cutoff = f"p{_month_start(date.today(), -retention_months):%Y%m}"
+    return [name for name in get_order_partitions() if name < cutoff]
+
+
+def archive_order_partition(partition_name, batch_size=1000):
+    """Export one partition to the cold archive, index it, then drop it.
+
+    Orders and items are streamed in id order from two connections and
+    merged, so memory stays flat regardless of partition size. Re-running
+    after a failure is safe: the file is rewritten and the header insert
+    ignores rows that were already indexed.
+    """
+    if not PARTITION_NAME_RE.match(partition_name):
+        raise ValueError(f"Not a monthly order partition: {partition_name}")
+
+    path = archive.archive_path(partition_name)
+    archive_file = os.path.basename(path)
+    headers = []
+
+    with get_connection() as orders_conn, get_connection() as items_conn, \
+            get_connection() as index_conn:
+        orders_cursor = orders_conn.cursor(dictionary=True, buffered=False)
+        items_cursor = items_conn.cursor(dictionary=True, buffered=False)
+        index_cursor = index_conn.cursor()
+        orders_cursor.execute(
+            f"SELECT * FROM orders PARTITION ({partition_name}) ORDER BY id"
+        )
+        items_cursor.execute(
+            f"""
+            SELECT oi.*, p.image_url
+            FROM order_items PARTITION ({partition_name}) oi
+            LEFT JOIN products p ON oi.product_id = p.id
+            ORDER BY oi.order_id, oi.id
+            """
+        )
+
+        item = items_cursor.fetchone()
+        with archive.ArchiveWriter(path) as writer:
+            for order in orders_cursor:
+                order['items'] = []
+                while item is not None and item['order_id'] < order['id']:
+                    item = items_cursor.fetchone()
+                while item is not None and item['order_id'] == order['id']:
+                    order['items'].append(item)
+                    item = items_cursor.fetchone()
+                writer.write(order)
+
+                headers.append((
+                    order['id'], order['user_id'], order['total_amount'],
+                    order['tax_amount'], order['grand_total'], order['status'],
+                    order['created_at'], archive_file,
+                ))
+                if len(headers) >= batch_size:
+                    _insert_archived_headers(index_cursor, headers)
+                    index_conn.commit()
+                    headers = []
+        # Drain any items left on the unbuffered cursor
+        while item is not None:
+            item = items_cursor.fetchone()
+
+        if headers:
+            _insert_archived_headers(index_cursor, headers)
+        index_conn.commit()
+
+        index_cursor.execute(f"ALTER TABLE order_items DROP PARTITION {partition_name}")
+        index_cursor.execute(f"ALTER TABLE orders DROP PARTITION {partition_name}")
+
+    archive.read_archived_order.cache_clear()
+    return {'partition': partition_name, 'file': path, 'orders': writer.count}
+
+
+def _insert_archived_headers(cursor, headers):
+    cursor.executemany(
+        """
+        INSERT IGNORE INTO archived_orders
+        (id, user_id, total_amount, tax_amount, grand_total, status, created_at, archive_file)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+        headers,
+    )
+
+
+# Online resharding
+# Where each sharded table's rows for a user range are found: FROM clause
+# (aliasing the table as ``t``), user column and creation-time column.
+_USER_ROW_SOURCES = {
+    'orders': ('orders t', 't.user_id', 't.created_at'),
+    'order_items': ('order_items t JOIN orders o ON o.id = t.order_id', 'o.user_id', 'o.created_at'),
+    'archived_orders': ('archived_orders t', 't.user_id', 't.created_at'),
+    'cart_items': ('cart_items t', 't.user_id', 't.created_at'),
+}
+
+
+def count_user_rows(shard, lo, hi):
+    """Count the rows of each sharded table held on ``shard`` for users ``[lo, hi)``."""
+    counts = {}
+    with get_connection(shard) as conn:
+        cursor = conn.cursor()
+        for table, (source, user_column, _) in _USER_ROW_SOURCES.items():
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {source} WHERE {user_column} >= %s AND {user_column} < %s",
+                (lo, hi),
+            )
+            counts[table] = cursor.fetchone()[0]
+    return counts
+
+
+def _copy_user_rows(source, target, table, lo, hi, since=None, batch_size=1000):
+    """Copy a user range's rows of one table between shards, keyset-paged by id.
+
+    Rows already on the target are skipped (ids are cluster-wide unique), so
+    copies can be repeated. ``since`` limits the copy to rows created after it.
+    """
+    source_from, user_column, created_column = _USER_ROW_SOURCES[table]
+    where = f"{user_column} >= %s AND {user_column} < %s AND t.id > %s"
+    if since is not None:
+        where += f" AND {created_column} >= %s"
+
+    copied = 0
+    last_id = 0
+    with get_connection(source) as source_conn, get_connection(target) as target_conn:
+        source_cursor = source_conn.cursor()
+        target_cursor = target_conn.cursor()
+        while True:
+            params = (lo, hi, last_id) + ((since,) if since is not None else ())
+            source_cursor.execute(
+                f"SELECT t.* FROM {source_from} WHERE {where} ORDER BY t.id LIMIT {int(batch_size)}",
+                params,
+            )
+            rows = source_cursor.fetchall()
+            # End the read snapshot so the next page sees fresh rows
+            source_conn.commit()
+            if not rows:
+                break
+            columns = [column[0] for column in source_cursor.description]
+            target_cursor.executemany(
+                f"INSERT IGNORE INTO `{table}` ({', '.join(f'`{c}`' for c in columns)}) "
+                f"VALUES ({', '.join(['%s'] * len(columns))})",
+                rows,
+            )
+            target_conn.commit()
+            copied += len(rows)
+            last_id = rows[-1][columns.index('id')]
+    return copied
+
+
+def _delete_user_rows(shard, table, lo, hi, batch_size=1000):
+    """Delete a user range's rows of one table from a shard in batches."""
+    source_from, user_column, _ = _USER_ROW_SOURCES[table]
+    deleted = 0
+    with get_connection(shard) as conn:
+        cursor = conn.cursor()
+        while True:
+            cursor.execute(
+                f"SELECT t.id FROM {source_from} "
+                f"WHERE {user_column} >= %s AND {user_column} < %s LIMIT {int(batch_size)}",
+                (lo, hi),
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            cursor.execute(
+                f"DELETE FROM `{table}` WHERE id IN ({', '.join(['%s'] * len(ids))})", ids
+            )
+            conn.commit()
+            deleted += len(ids)
+    return deleted
+
+
+def _split_shard_range(lo, hi):
+    """Carve ``[lo, hi)`` out of the active range containing it; return its shard."""
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            """
+            SELECT * FROM shard_ranges
+            WHERE lo_user_id <= %s AND hi_user_id >= %s
+            FOR UPDATE
+            """,
+            (lo, hi),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            conn.rollback()
+            raise ValueError(f"Users [{lo}, {hi}) span more than one shard range")
+        if row['state'] != sharding.STATE_ACTIVE:
+            conn.rollback()
+            raise ValueError(f"Users [{lo}, {hi}) are already being moved")
+
+        pieces = [
+            (row['lo_user_id'], lo, row['shard']),
+            (lo, hi, row['shard']),
+            (hi, row['hi_user_id'], row['shard']),
+        ]
+        cursor.execute('DELETE FROM shard_ranges WHERE lo_user_id = %s', (row['lo_user_id'],))
+        cursor.executemany(
+            'INSERT INTO shard_ranges (lo_user_id, hi_user_id, shard) VALUES (%s, %s, %s)',
+            [piece for piece in pieces if piece[0] < piece[1]],
+        )
+        conn.commit()
+        return row['shard']
+
+
+def _set_range_state(lo, state, shard, target=None):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE shard_ranges SET state = %s, shard = %s, target_shard = %s
+            WHERE lo_user_id = %s
+            """,
+            (state, shard, target, lo),
+        )
+        conn.commit()
+
+
+def _wait_for_shard_maps():
+    """Sleep until every worker's cached shard map has expired."""
+    time.sleep(SHARD_MAP_TTL_SECONDS + 1)
+
+
+def move_user_range(lo, hi, target, batch_size=1000, progress=None):
+    """Move users ``[lo, hi)`` and their carts and orders to ``target`` online.
+
+    1. ``copying``: the range is split out and its orders (immutable once
+       written) are bulk-copied while the source keeps serving it;
+    2. ``frozen``: writes for the range wait (see ``user_connection``) while
+       recent orders are re-copied and carts are re-synced;
+    3. the range turns ``active`` on the target, then source rows are deleted.
+
+    Every state change waits out SHARD_MAP_TTL_SECONDS so all workers see
+    it. If a copy fails, the range goes back to the source.
+    """
+    progress = progress or (lambda message: None)
+    if SHARD_CONFIG is None:
+        raise ValueError('Sharding is not configured (set SHARD_MAP)')
+    if target != sharding.GLOBAL_SHARD and target not in SHARD_CONFIG['shards']:
+        raise ValueError(f"Unknown shard '{target}'")
+    if not 0 <= lo < hi <= sharding.MAX_USER_ID:
+        raise ValueError(f"Invalid user range [{lo}, {hi})")
+
+    source = _split_shard_range(lo, hi)
+    if source == target:
+        return {'source': source, 'target': target, 'copied': {}, 'deleted': {}}
+
+    copied = dict.fromkeys(_USER_ROW_SOURCES, 0)
+    try:
+        _set_range_state(lo, sharding.STATE_COPYING, source, target)
+        with get_connection(source) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT NOW() - INTERVAL %s SECOND', (SHARD_COPY_SLACK_SECONDS,))
+            copy_since = cursor.fetchone()[0]
+        for table in ('orders', 'order_items', 'archived_orders'):
+            copied[table] += _copy_user_rows(source, target, table, lo, hi, batch_size=batch_size)
+            progress(f"copied {copied[table]} {table} rows")
+
+        _set_range_state(lo, sharding.STATE_FROZEN, source, target)
+        _wait_for_shard_maps()
+        progress("range frozen for writes")
+        for table in ('orders', 'order_items', 'archived_orders'):
+            copied[table] += _copy_user_rows(
+                source, target, table, lo, hi, since=copy_since, batch_size=batch_size
+            )
+        _delete_user_rows(target, 'cart_items', lo, hi, batch_size)
+        copied['cart_items'] = _copy_user_rows(source, target, 'cart_items', lo, hi, batch_size=batch_size)
+        progress(f"re-synced {copied['cart_items']} cart_items rows")
+    except Exception:
+        _set_range_state(lo, sharding.STATE_ACTIVE, source)
+        raise
+
+    _set_range_state(lo, sharding.STATE_ACTIVE, target)
+    _wait_for_shard_maps()
+    progress(f"range now served by {target}")
+
+    # Items go before their orders: their user is found through the join
+    deleted = {}
+    for table in ('order_items', 'orders', 'archived_orders', 'cart_items'):
+        deleted[table] = _delete_user_rows(source, table, lo, hi, batch_size)
+    return {'source': source, 'target': target, 'copied': copied, 'deleted': deleted}
+
+
+# Wrap every public query function in a tracing span. Connection plumbing
+# and generators (whose body runs after the call returns) are left as-is.
+_UNTRACED = {
+    'get_pool', 'get_shard_pool', 'get_connection', 'user_connection',
+    'get_shard_map', 'reset_db_time', 'get_db_time', 'stream_rows',
+    'iter_product_pairs', 'iter_product_sales_by_age', 'get_driver',
+    'get_statement_cache_stats', 'begin_unit_of_work', 'end_unit_of_work', 'transaction',
+}
+for _name, _func in list(globals().items()):
+    if (
+        callable(_func)
+        and not _name.startswith('_')
+        and _name not in _UNTRACED
+        and getattr(_func, '__module__', None) == __name__
+        and not isinstance(_func, type)
+    ):
+        globals()[_name] = tracing.traced(f"db.{_name}", tracing.SPAN_KIND_CLIENT)(_func)
+del _name, _func
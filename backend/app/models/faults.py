@@ -0,0 +1,222 @@
+"""Fault and latency injection between the connection pools and MySQL.
+
+For capacity testing only. When DB_FAULT_PLAN names a JSON file, the pools
+install this shim into the connector's connection classes (pure Python and
+C extension) before opening any connection. Every query, prepared statement
+execution and result fetch then passes through the plan's rules, so a local
+MySQL can behave like a slow replica, a flaky network or a contended table.
+
+A plan looks like::
+
+    {
+      "seed": 42,
+      "rules": [
+        {"match": "FROM cart", "latency": {"median_ms": 20, "p99_ms": 400}},
+        {"match": "^UPDATE products", "lock_wait_rate": 0.05, "lock_wait_seconds": 2},
+        {"host": "10.0.0.7", "drop_rate": 0.01},
+        {"match": "FROM products", "bandwidth_kbps": 800}
+      ]
+    }
+
+The first rule whose ``match`` (case-insensitive regex on the SQL), ``host``
+and ``database`` all fit applies; omitted fields match anything. A rule can:
+
+* ``latency``: delay the statement by ``{"ms": n}`` (fixed),
+  ``{"min_ms": a, "max_ms": b}`` (uniform), ``{"mean_ms": n}``
+  (exponential) or ``{"median_ms": m, "p99_ms": p}`` (lognormal);
+* ``drop_rate``: fraction of statements whose connection is closed before
+  the statement is sent, failing with error 2013 (lost connection);
+* ``lock_wait_rate``: fraction of statements that wait
+  ``lock_wait_seconds`` (default 50, the server default) and then fail with
+  error 1205 (lock wait timeout);
+* ``bandwidth_kbps``: throttle result rows to this many kilobits per second,
+  estimated from the size of the decoded values.
+
+The file is re-read when it changes, so a harness can switch phases under
+load by atomically replacing it (see ``benchmarks/db_faults.py``).
+"""
+import json
+import math
+import os
+import random
+import re
+import time
+from threading import Lock
+
+import mysql.connector
+from mysql.connector import errors
+from mysql.connector.connection import MySQLConnection
+
+# How often the plan file's modification time is checked
+PLAN_CHECK_SECONDS = 0.5
+# z-score of the 99th percentile, to fit a lognormal to median and p99
+_Z99 = 2.3263
+
+_plan_path = None
+_plan_mtime = None
+_checked_at = 0.0
+_rules = []
+_rng = random.Random()
+_lock = Lock()
+_installed = False
+
+
+def _compile(rule):
+    rule = dict(rule)
+    if rule.get('match'):
+        rule['match'] = re.compile(rule['match'], re.IGNORECASE)
+    return rule
+
+
+def set_plan(plan):
+    """Replace the active rules with ``plan`` (a dict shaped like the file)."""
+    global _rules
+    rules = [_compile(rule) for rule in (plan or {}).get('rules', [])]
+    with _lock:
+        if plan and plan.get('seed') is not None:
+            _rng.seed(plan['seed'])
+        _rules = rules
+
+
+def _reload():
+    """Pick up a changed plan file; a missing or invalid file keeps the old plan."""
+    global _plan_mtime, _checked_at
+    now = time.monotonic()
+    if _plan_path is None or now - _checked_at < PLAN_CHECK_SECONDS:
+        return
+    _checked_at = now
+    try:
+        mtime = os.stat(_plan_path).st_mtime_ns
+        if mtime == _plan_mtime:
+            return
+        with open(_plan_path) as f:
+            plan = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️  DB fault plan {_plan_path} not loaded: {e}")
+        _plan_mtime = None
+        return
+    set_plan(plan)
+    _plan_mtime = mtime
+    print(f"⚠️  DB fault plan loaded from {_plan_path} ({len(_rules)} rules)")
+
+
+def _rule_for(cnx, sql):
+    _reload()
+    if not _rules:
+        return None
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode('utf-8', 'replace')
+    for rule in _rules:
+        if rule.get('host') and rule['host'] != cnx._host:
+            continue
+        if rule.get('database') and rule['database'] != cnx._database:
+            continue
+        if rule.get('match') and not rule['match'].search(sql):
+            continue
+        return rule
+    return None
+
+
+def _delay_seconds(latency):
+    if 'ms' in latency:
+        ms = latency['ms']
+    elif 'max_ms' in latency:
+        ms = _rng.uniform(latency.get('min_ms', 0), latency['max_ms'])
+    elif 'mean_ms' in latency:
+        ms = _rng.expovariate(1 / latency['mean_ms'])
+    elif 'median_ms' in latency:
+        sigma = math.log(latency['p99_ms'] / latency['median_ms']) / _Z99
+        ms = _rng.lognormvariate(math.log(latency['median_ms']), sigma)
+    else:
+        raise ValueError(f"Unknown latency distribution: {latency}")
+    return ms / 1000
+
+
+def _before(cnx, sql):
+    """Apply a statement's faults before it is sent; remember the rule for its rows."""
+    rule = cnx._fault_rule = _rule_for(cnx, sql)
+    if rule is None:
+        return
+    if rule.get('latency'):
+        time.sleep(_delay_seconds(rule['latency']))
+    if rule.get('drop_rate') and _rng.random() < rule['drop_rate']:
+        try:
+            cnx.disconnect()
+        except mysql.connector.Error:
+            pass
+        raise errors.OperationalError(
+            msg='Lost connection to MySQL server during query (injected)', errno=2013,
+        )
+    if rule.get('lock_wait_rate') and _rng.random() < rule['lock_wait_rate']:
+        time.sleep(rule.get('lock_wait_seconds', 50))
+        raise errors.get_mysql_exception(
+            1205, 'Lock wait timeout exceeded; try restarting transaction (injected)', 'HY000',
+        )
+
+
+def _throttle(cnx, rows):
+    rule = cnx._fault_rule
+    if rule is None or not rule.get('bandwidth_kbps') or not rows:
+        return
+    size = sum(len(str(value)) for row in rows for value in row)
+    time.sleep(size * 8 / (rule['bandwidth_kbps'] * 1000))
+
+
+def _patch(cls, prepared_key):
+    """Wrap ``cls``'s query, prepare, execute and fetch methods.
+
+    ``prepared_key`` maps what ``cmd_stmt_prepare`` returns to the value
+    ``cmd_stmt_execute`` later receives, so executions can be matched
+    against the statement's SQL.
+    """
+    cmd_query = cls.cmd_query
+    cmd_stmt_prepare = cls.cmd_stmt_prepare
+    cmd_stmt_execute = cls.cmd_stmt_execute
+    get_rows = cls.get_rows
+
+    def query(self, query, *args, **kwargs):
+        _before(self, query)
+        return cmd_query(self, query, *args, **kwargs)
+
+    def prepare(self, statement, *args, **kwargs):
+        prepared = cmd_stmt_prepare(self, statement, *args, **kwargs)
+        if not hasattr(self, '_fault_statements'):
+            self._fault_statements = {}
+        self._fault_statements[prepared_key(prepared)] = statement
+        return prepared
+
+    def execute(self, statement_id, *args, **kwargs):
+        statements = getattr(self, '_fault_statements', {})
+        _before(self, statements.get(prepared_key(statement_id), ''))
+        return cmd_stmt_execute(self, statement_id, *args, **kwargs)
+
+    def rows(self, *args, **kwargs):
+        result = get_rows(self, *args, **kwargs)
+        _throttle(self, result[0])
+        return result
+
+    cls.cmd_query = query
+    cls.cmd_stmt_prepare = prepare
+    cls.cmd_stmt_execute = execute
+    cls.get_rows = rows
+    cls._fault_rule = None
+
+
+def install(path):
+    """Route every MySQL connection through the plan in ``path``; idempotent."""
+    global _plan_path, _installed
+    with _lock:
+        if _installed:
+            return
+        _plan_path = path
+        # The pure driver executes by statement id; the C extension by the
+        # statement object it returned from prepare
+        _patch(MySQLConnection, lambda prepared: (
+            prepared['statement_id'] if isinstance(prepared, dict) else prepared
+        ))
+        if mysql.connector.HAVE_CEXT:
+            from mysql.connector.connection_cext import CMySQLConnection
+            _patch(CMySQLConnection, id)
+        _installed = True
+    print(f"⚠️  DB fault injection enabled (plan: {path}) — capacity testing only")
+    _reload()
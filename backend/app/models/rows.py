@@ -0,0 +1,102 @@
+"""Compact read-only rows for hot query paths.
+
+A dictionary cursor builds one dict per row, which costs several hundred
+bytes and a hash insert per column. Hot list queries instead read plain
+tuples and wrap each one in a ``Row``: an object with a single slot holding
+the driver's tuple, plus a per-type column index shared by every row.
+
+Rows are read-only mappings, so callers keep using ``row['price']`` and
+``row.get('category')`` (and ``row.price``). ``RowJSONProvider`` lets
+``jsonify`` encode them as JSON objects, producing the same output as the
+dicts they replace.
+"""
+from collections.abc import Mapping
+
+from flask.json.provider import DefaultJSONProvider
+
+
+class Row(Mapping):
+    """Read-only mapping over one result tuple; subclass with ``row_type``."""
+
+    __slots__ = ('_values',)
+    _fields = ()
+    _index = {}
+
+    def __init__(self, values):
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self._index[key]]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._values[self._index[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def get(self, key, default=None):
+        index = self._index.get(key)
+        return default if index is None else self._values[index]
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def keys(self):
+        return self._fields
+
+    def _asdict(self):
+        return dict(zip(self._fields, self._values))
+
+    def __repr__(self):
+        pairs = ', '.join(f'{name}={value!r}' for name, value in zip(self._fields, self._values))
+        return f'{type(self).__name__}({pairs})'
+
+
+def row_type(name, fields):
+    """Create a ``Row`` subclass for a fixed column list."""
+    fields = tuple(fields)
+    return type(name, (Row,), {
+        '__slots__': (),
+        '_fields': fields,
+        '_index': {field: position for position, field in enumerate(fields)},
+    })
+
+
+def fetch_rows(cursor, cls):
+    """Fetch every remaining row of a tuple cursor as ``cls`` instances."""
+    return [cls(values) for values in cursor.fetchall()]
+
+
+class RowJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes ``Row`` objects as JSON objects."""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Row):
+            return o._asdict()
+        return DefaultJSONProvider.default(o)
+
+
+PRODUCT_COLUMNS = (
+    'id', 'name', 'description', 'price', 'category', 'image_url', 'stock',
+    'created_at', 'updated_at',
+)
+CART_ITEM_COLUMNS = (
+    'id', 'quantity', 'product_id', 'name', 'description', 'price', 'category',
+    'image_url', 'stock', 'subtotal',
+)
+ORDER_COLUMNS = (
+    'id', 'user_id', 'total_amount', 'tax_amount', 'grand_total', 'status', 'created_at',
+)
+
+Product = row_type('Product', PRODUCT_COLUMNS)
+CartItem = row_type('CartItem', CART_ITEM_COLUMNS)
+OrderSummary = row_type('OrderSummary', ORDER_COLUMNS)
@@ -0,0 +1,82 @@
+"""User-keyed shard map for carts and orders.
+
+``cart_items``, ``orders``, ``order_items`` and ``archived_orders`` rows
+belong to a user and live on that user's shard; everything else (users,
+products, rollups, pricing, idempotency keys) stays on the global node, which
+is the pool ``db.get_pool`` returns and is addressed as shard ``global``.
+
+Sharding is off unless ``SHARD_MAP`` is set to a JSON document (or the path
+of one) naming the extra nodes and the initial user-id ranges::
+
+    {
+      "shards": {
+        "s1": {"host": "10.0.0.12", "database": "app_db"},
+        "s2": {"port": 3307}
+      },
+      "ranges": [[0, 100000, "global"], [100000, 200000, "s1"], [200000, null, "s2"]]
+    }
+
+Node settings default to the global node's ``MYSQL_*`` settings, so several
+databases on one local MySQL server work as separate shards. Ranges are
+half-open ``[lo, hi)``; ``null`` means unbounded. They only seed the
+``shard_ranges`` table: once seeded, the table is authoritative, and
+``db.move_user_range`` changes it while the app is running.
+"""
+import json
+import os
+from bisect import bisect_right
+
+GLOBAL_SHARD = 'global'
+# User ids are INT columns; this bound stands in for "unbounded".
+MAX_USER_ID = 2 ** 31
+
+# Range states during an online move (see db.move_user_range)
+STATE_ACTIVE = 'active'
+STATE_COPYING = 'copying'
+STATE_FROZEN = 'frozen'
+
+
+def load_config(value=None):
+    """Parse ``SHARD_MAP`` (inline JSON or a file path); None if unset."""
+    value = os.environ.get('SHARD_MAP', '') if value is None else value
+    value = value.strip()
+    if not value:
+        return None
+    if not value.startswith('{'):
+        with open(value, encoding='utf-8') as f:
+            value = f.read()
+    config = json.loads(value)
+
+    shards = config.get('shards', {})
+    if GLOBAL_SHARD in shards:
+        raise ValueError(f"'{GLOBAL_SHARD}' is reserved for the global node")
+    ranges = [
+        (int(lo), MAX_USER_ID if hi is None else int(hi), shard)
+        for lo, hi, shard in config.get('ranges', [[0, None, GLOBAL_SHARD]])
+    ]
+    for _, _, shard in ranges:
+        if shard != GLOBAL_SHARD and shard not in shards:
+            raise ValueError(f"Shard map range points at unknown shard '{shard}'")
+    return {'shards': shards, 'ranges': ranges}
+
+
+class ShardMap:
+    """Sorted, non-overlapping user-id ranges, each owned by one shard."""
+
+    def __init__(self, ranges):
+        self.ranges = sorted(ranges, key=lambda r: r['lo'])
+        self._starts = [r['lo'] for r in self.ranges]
+
+    def lookup(self, user_id):
+        """Return the range row covering ``user_id``."""
+        index = bisect_right(self._starts, int(user_id)) - 1
+        if index < 0 or int(user_id) >= self.ranges[index]['hi']:
+            raise LookupError(f"No shard owns user {user_id}")
+        return self.ranges[index]
+
+    def shard_names(self):
+        return sorted({r['shard'] for r in self.ranges} | {GLOBAL_SHARD})
+
+
+class ShardUnavailableError(RuntimeError):
+    """A user's range stayed frozen for a move longer than writes may wait."""
@@ -0,0 +1,164 @@
+"""Per-connection cache of server-side prepared statements for hot queries.
+
+The text protocol sends and parses the full SQL on every call. A prepared
+statement is parsed once per connection; each execution then sends only the
+statement id and binary parameters. Pooled connections live for the life
+of the worker, so each one keeps an LRU of up to ``size`` prepared cursors
+keyed by SQL text. The least recently used statement is closed on the
+server when the cache overflows.
+
+Statements belong to a server session. A reconnect (the pool reconnects
+dead connections on checkout) shows up as a new connection id and drops the
+cache for that connection. A statement the server has forgotten for any
+other reason fails with ER_UNKNOWN_STMT_HANDLER and is prepared again
+once, transparently. Pools that use the cache must not reset sessions on
+checkin (COM_RESET_CONNECTION deallocates every statement); see
+``db.get_connection``.
+
+SQL passed to ``execute`` must be a module-level constant: the connector
+recognises an already prepared statement by the identity of its string.
+"""
+from collections import OrderedDict
+from threading import Lock
+from weakref import WeakKeyDictionary
+
+import mysql.connector
+from mysql.connector import errorcode
+from mysql.connector.cursor import MySQLCursorPrepared
+from mysql.connector.errors import get_mysql_exception
+
+
+class _PureStatement(MySQLCursorPrepared):
+    """Prepared cursor that skips COM_STMT_RESET on re-execution.
+
+    The connector resets a statement before every execution to discard long
+    data sent with ``send_long_data``. Cached statements never send any, and
+    the reset costs a full round trip.
+    """
+
+    def execute(self, operation, params=None, multi=False):
+        if operation is not self._executed or not self._prepared:
+            return super().execute(operation, params)
+        result = self._connection.cmd_stmt_execute(
+            self._prepared['statement_id'],
+            data=params or (),
+            parameters=self._prepared['parameters'],
+        )
+        self._handle_result(result)
+
+
+if mysql.connector.HAVE_CEXT:
+    from _mysql_connector import MySQLInterfaceError
+    from mysql.connector.connection_cext import CMySQLConnection
+    from mysql.connector.cursor_cext import CMySQLCursorPrepared
+
+    class _CStatement(CMySQLCursorPrepared):
+        """C-extension counterpart of ``_PureStatement``.
+
+        ``CMySQLConnection.cmd_stmt_execute`` re-raises server errors as a
+        bare ``InterfaceError`` (errno -1); the server's error is restored
+        here so callers can tell an unknown statement apart.
+        """
+
+        def execute(self, operation, params=None, multi=False):
+            if operation is not self._executed or not self._stmt:
+                return super().execute(operation, params)
+            self._cnx.handle_unread_result(prepared=True)
+            try:
+                result = self._cnx.cmd_stmt_execute(self._stmt, *(params or ()))
+            except mysql.connector.InterfaceError as err:
+                cause = err.__cause__
+                if not isinstance(cause, MySQLInterfaceError) or not getattr(cause, 'errno', None):
+                    raise
+                raise get_mysql_exception(
+                    msg=cause.msg, errno=cause.errno, sqlstate=cause.sqlstate
+                ) from cause
+            if result:
+                self._handle_result(result)
+else:
+    CMySQLConnection = _CStatement = None
+
+
+class StatementCache:
+    """LRU caches of prepared cursors, one per pooled connection."""
+
+    def __init__(self, size):
+        self.size = size
+        self._caches = WeakKeyDictionary()
+        self._lock = Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'reprepares': 0}
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def _count(self, event):
+        with self._lock:
+            self._stats[event] += 1
+
+    def _statements(self, cnx):
+        connection_id = cnx.connection_id
+        cache = self._caches.get(cnx)
+        if cache is None or cache[0] != connection_id:
+            # First use, or the connection was re-established and the server
+            # no longer knows its statements
+            cache = (connection_id, OrderedDict())
+            with self._lock:
+                self._caches[cnx] = cache
+        return cache[1]
+
+    def _cursor(self, cnx, sql):
+        statements = self._statements(cnx)
+        cursor = statements.get(sql)
+        if cursor is not None:
+            statements.move_to_end(sql)
+            self._count('hits')
+            return cursor
+
+        self._count('misses')
+        if CMySQLConnection is not None and isinstance(cnx, CMySQLConnection):
+            cursor = cnx.cursor(cursor_class=_CStatement)
+        else:
+            cursor = cnx.cursor(cursor_class=_PureStatement)
+        statements[sql] = cursor
+        if len(statements) > self.size:
+            _, evicted = statements.popitem(last=False)
+            evicted.close()
+            self._count('evictions')
+        return cursor
+
+    def execute(self, conn, sql, params=()):
+        """Execute ``sql`` as a cached prepared statement and return its cursor.
+
+        Result rows are tuples and must be read with ``fetchall`` before the
+        connection runs anything else. Falls back to a plain cursor when the
+        cache is disabled.
+        """
+        if not self.enabled:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            return cursor
+
+        cnx = getattr(conn, '_cnx', conn)  # unwrap the pool's proxy
+        cursor = self._cursor(cnx, sql)
+        try:
+            cursor.execute(sql, params)
+        except mysql.connector.Error as e:
+            if e.errno != errorcode.ER_UNKNOWN_STMT_HANDLER:
+                raise
+            self._statements(cnx).pop(sql, None)
+            self._count('reprepares')
+            cursor = self._cursor(cnx, sql)
+            cursor.execute(sql, params)
+        return cursor
+
+    def stats(self):
+        """Return hit/miss/eviction counters, hit rate and cached statement count."""
+        with self._lock:
+            stats = dict(self._stats)
+            cached = sum(len(cache[1]) for cache in self._caches.values())
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+        stats['cached'] = cached
+        stats['size'] = self.size
+        return stats
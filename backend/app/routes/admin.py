@@ -0,0 +1,228 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from app.models import db
+from app.services import export, forecast, pricing
+
+admin_bp = Blueprint('admin', __name__)
+
+DEFAULT_RANGE_DAYS = 30
+
+
+def _date_range():
+    """Parse ``from``/``to`` query args (YYYY-MM-DD), defaulting to the last 30 days."""
+    end = request.args.get('to')
+    start = request.args.get('from')
+    end = datetime.strptime(end, '%Y-%m-%d').date() if end else date.today()
+    start = (
+        datetime.strptime(start, '%Y-%m-%d').date()
+        if start
+        else end - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    )
+    return start, end
+
+
+@admin_bp.route('/api/admin/analytics/revenue', methods=['GET'])
+def revenue():
+    """Get revenue over time from the daily sales rollup."""
+    interval = request.args.get('interval', 'day')
+    if interval not in ('day', 'month'):
+        return jsonify({'error': 'interval must be day or month'}), 400
+
+    try:
+        start, end = _date_range()
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+    try:
+        series = db.get_revenue_series(start, end, interval)
+        for row in series:
+            row['period'] = str(row['period'])
+        return jsonify({
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'interval': interval,
+            'series': series
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/api/admin/analytics/top-products', methods=['GET'])
+def top_products():
+    """Get best-selling products from the product sales rollup."""
+    order_by = request.args.get('by', 'revenue')
+    if order_by not in ('revenue', 'units'):
+        return jsonify({'error': 'by must be revenue or units'}), 400
+
+    try:
+        start, end = _date_range()
+        limit = int(request.args.get('limit', 10))
+        if limit <= 0:
+            return jsonify({'error': 'limit must be positive'}), 400
+    except ValueError:
+        return jsonify({'error': 'Invalid date or limit'}), 400
+
+    try:
+        products = db.get_top_products(start, end, min(limit, 100), order_by)
+        return jsonify({
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'products': products
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/api/admin/analytics/categories', methods=['GET'])
+def category_mix():
+    """Get revenue share per category from the category sales rollup."""
+    try:
+        start, end = _date_range()
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+    try:
+        categories = db.get_category_mix(start, end)
+        total = sum(float(row['revenue']) for row in categories)
+        for row in categories:
+            row['share'] = round(float(row['revenue']) / total, 4) if total else 0
+        return jsonify({
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'categories': categories
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/api/admin/inventory/stockouts', methods=['GET'])
+def projected_stockouts():
+    """Get products the latest demand forecast expects to run out of stock."""
+    try:
+        within_days = int(request.args.get('days', forecast.STOCKOUT_HORIZON_DAYS))
+        limit = int(request.args.get('limit', 100))
+        if within_days < 0 or limit <= 0:
+            return jsonify({'error': 'days must be non-negative and limit positive'}), 400
+    except ValueError:
+        return jsonify({'error': 'Invalid days or limit'}), 400
+
+    try:
+        products = db.get_projected_stockouts(within_days, min(limit, 1000))
+        for row in products:
+            row['stockout_date'] = row['stockout_date'].isoformat() if row['stockout_date'] else None
+            row['computed_at'] = row['computed_at'].isoformat()
+        last = db.get_last_stock_projection()
+        return jsonify({
+            'days': within_days,
+            'computed_at': last.isoformat() if last else None,
+            'products': products
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/api/admin/export/<dataset>', methods=['GET'])
+def export_dataset(dataset):
+    """Stream a full table export as CSV or NDJSON, optionally gzipped."""
+    fmt = request.args.get('format', 'csv')
+    compress = request.args.get('gzip') in ('1', 'true', 'True')
+
+    if dataset not in db.EXPORT_QUERIES:
+        return jsonify({'error': f"Unknown dataset, expected one of: {', '.join(db.EXPORT_QUERIES)}"}), 404
+    if fmt not in export.FORMATS:
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+
+    try:
+        rows = db.stream_rows(dataset)
+        columns = next(rows)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    stats = export.ExportStats()
+    logger = current_app.logger
+
+    def generate():
+        body = export.encode(fmt, columns, rows, stats)
+        if compress:
+            body = export.gzip_stream(body)
+        try:
+            yield from body
+        finally:
+            rows.close()
+            logger.info(f"Export {dataset}.{fmt}: {stats.summary()}")
+
+    filename = f"{dataset}.{fmt}" + ('.gz' if compress else '')
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+    mimetype = 'application/gzip' if compress else export.FORMATS[fmt]
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers=headers)
+
+
+@admin_bp.route('/api/admin/pricing-rules', methods=['GET'])
+def get_pricing_rules():
+    """Get all tax and promotion rules."""
+    try:
+        return jsonify({'rules': db.get_pricing_rules()}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/api/admin/pricing-rules', methods=['POST'])
+def create_pricing_rule():
+    """Create a tax or promotion rule."""
+    data = request.get_json() or {}
+
+    name = data.get('name')
+    kind = data.get('kind')
+    scope = data.get('scope', 'cart')
+    target = data.get('target')
+    value = data.get('value')
+
+    # Validation
+    if not name or value is None:
+        return jsonify({'error': 'name and value are required'}), 400
+    if kind not in pricing.RULE_KINDS:
+        return jsonify({'error': f"kind must be one of: {', '.join(pricing.RULE_KINDS)}"}), 400
+    if scope not in pricing.RULE_SCOPES:
+        return jsonify({'error': f"scope must be one of: {', '.join(pricing.RULE_SCOPES)}"}), 400
+    if scope != 'cart' and not target:
+        return jsonify({'error': 'target is required for category and product rules'}), 400
+
+    try:
+        value = Decimal(str(value))
+        min_subtotal = Decimal(str(data.get('min_subtotal', 0)))
+        starts_at = datetime.fromisoformat(data['starts_at']) if data.get('starts_at') else None
+        ends_at = datetime.fromisoformat(data['ends_at']) if data.get('ends_at') else None
+        if scope == 'product':
+            target = str(int(target))
+        if value < 0 or min_subtotal < 0:
+            return jsonify({'error': 'value and min_subtotal must be non-negative'}), 400
+    except (ValueError, TypeError, ArithmeticError):
+        return jsonify({'error': 'Invalid value, target or date'}), 400
+
+    try:
+        rule_id = db.create_pricing_rule(
+            name, kind, scope, target, value, min_subtotal,
+            starts_at, ends_at, data.get('active', True),
+        )
+        pricing.invalidate()
+        return jsonify({
+            'message': 'Pricing rule created successfully',
+            'rule_id': rule_id
+        }), 201
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/api/admin/pricing-rules/<int:rule_id>', methods=['DELETE'])
+def delete_pricing_rule(rule_id):
+    """Delete a pricing rule."""
+    try:
+        success = db.delete_pricing_rule(rule_id)
+        if not success:
+            return jsonify({'error': 'Pricing rule not found'}), 404
+        pricing.invalidate()
+        return jsonify({'message': 'Pricing rule deleted successfully'}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,353 @@
+"""Coroutine handlers for the ASGI app (see ``app.asgi``).
+
+Each handler answers with the same status, JSON body (encoded the way
+``jsonify`` encodes it) and CORS headers as the Flask route with the same
+rule in main.py, products.py, cart.py, orders.py or auth.py, and validates
+input with the same ``validation`` helpers. Other response headers, such
+as ``Date`` and ``Server``, come from the ASGI server instead of gunicorn's
+sync worker. Idempotency-Key writes go through ``idempotency.run_once``
+just like the Flask ``@idempotent`` decorator. Work that touches the
+database runs through ``aio.run``; calls that belong together go in one
+function so they share a unit of work, as they would within one Flask
+request. Health probes never touch the database, so they run on the event
+loop and answer even while every database thread is busy.
+"""
+import os
+from functools import partial
+
+from app.asgi import Router
+from app.models import aio, db
+from app.routes import validation
+from app.services import checkout, facets, idempotency, pricing, related
+from app.services.health import monitor
+
+router = Router()
+
+
+def _idempotent(request, scope, process):
+    """Run ``process() -> (payload, status)`` once per Idempotency-Key, like ``@idempotent``.
+
+    Runs on a database thread (through ``aio.run``): waiting for a
+    duplicate in flight blocks.
+    """
+    key = request.headers.get(idempotency.HEADER.lower())
+    if not key:
+        return process()
+
+    def run():
+        payload, status = process()
+        return status, request.dumps(payload), (payload, status)
+
+    outcome = idempotency.run_once(scope, key, request.body, run)
+    if outcome.error:
+        return {'error': outcome.error}, outcome.status_code
+    if outcome.replayed:
+        return outcome.body.encode(), outcome.status_code, [(b'idempotent-replayed', b'true')]
+    return outcome.response
+
+
+# Health
+@router.route('/api/health', methods=['GET'])
+async def health(request):
+    return {
+        'status': 'ok',
+        'message': 'API is healthy',
+        'port': os.environ.get('PORT', 'unknown'),
+        'worker_pid': os.getpid(),
+        'db_driver': db.get_driver(),
+        'statement_cache': db.get_statement_cache_stats(),
+    }, 200
+
+
+@router.route('/api/health/live', methods=['GET'])
+async def liveness(request):
+    return {'status': 'ok', 'worker_pid': os.getpid()}, 200
+
+
+@router.route('/api/health/ready', methods=['GET'])
+async def readiness(request):
+    status = monitor.status()
+    return {
+        'status': 'ready' if status['ready'] else 'unavailable',
+        'worker_pid': os.getpid(),
+        **status,
+    }, 200 if status['ready'] else 503
+
+
+# Products
+@router.route('/api/products', methods=['GET'])
+async def get_products(request):
+    ids = request.args.get('ids')
+    if ids is not None:
+        product_ids, error = validation.parse_product_ids(ids)
+        if error:
+            return {'error': error}, 400
+
+    try:
+        if ids is None:
+            return {'products': await aio.run(db.get_all_products)}, 200
+        products = await aio.run(db.get_products_by_ids, product_ids)
+        found = {product['id'] for product in products}
+        return {
+            'products': products,
+            'missing': [pid for pid in dict.fromkeys(product_ids) if pid not in found],
+        }, 200
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+@router.route('/api/products/changes', methods=['GET'])
+async def get_product_changes(request):
+    since, error = validation.parse_since(request.args.get('since'))
+    if error:
+        return {'error': error}, 400
+
+    try:
+        changes = await aio.run(db.get_product_changes, since)
+        return {
+            'products': changes['products'],
+            'deleted': changes['deleted'],
+            'since': changes['since'].strftime(validation.SYNC_TOKEN_FORMAT),
+            'reset': changes['reset'],
+        }, 200
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+@router.route('/api/products/facets', methods=['GET'])
+async def get_product_facets(request):
+    try:
+        return await aio.run(
+            facets.get_facets,
+            request.args.get('q', '').strip() or None,
+            request.args.get('category') or None,
+        ), 200
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+@router.route('/api/products/<int:product_id>', methods=['GET'])
+async def get_product(request, product_id):
+    try:
+        product = await aio.run(db.get_product_by_id, product_id)
+        if not product:
+            return {'error': 'Product not found'}, 404
+        return {'product': product}, 200
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+@router.route('/api/products/<int:product_id>/related', methods=['GET'])
+async def get_related_products(request, product_id):
+    limit, error = validation.parse_limit(request.args.get('limit'), related.RELATED_TOP_K)
+    if error:
+        return {'error': error}, 400
+
+    try:
+        return {'related': await aio.run(related.related_products, product_id, limit)}, 200
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+def _create_product(product):
+    product_id = db.create_product(**product)
+    facets.product_saved({'id': product_id, **product})
+    return product_id
+
+
+@router.route('/api/products', methods=['POST'])
+async def create_product(request):
+    product, error = validation.parse_product(request.get_json() or {})
+    if error:
+        return {'error': error}, 400
+
+    try:
+        product_id = await aio.run(_create_product, product)
+        return {'message': 'Product created successfully', 'product_id': product_id}, 201
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+def _update_product(product_id, product):
+    success = db.update_product(product_id, **product)
+    if success:
+        facets.product_saved({'id': product_id, **product})
+    return success
+
+
+@router.route('/api/products/<int:product_id>', methods=['PUT'])
+async def update_product(request, product_id):
+    product, error = validation.parse_product(request.get_json() or {})
+    if error:
+        return {'error': error}, 400
+
+    try:
+        if not await aio.run(_update_product, product_id, product):
+            return {'error': 'Product not found'}, 404
+        return {'message': 'Product updated successfully'}, 200
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+def _delete_product(product_id):
+    success = db.delete_product(product_id)
+    if success:
+        facets.product_deleted(product_id)
+    return success
+
+
+@router.route('/api/products/<int:product_id>', methods=['DELETE'])
+async def delete_product(request, product_id):
+    try:
+        if not await aio.run(_delete_product, product_id):
+            return {'error': 'Product not found'}, 404
+        return {'message': 'Product deleted successfully'}, 200
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+# Cart
+def _priced_cart(user_id):
+    items = db.get_cart_items(user_id)
+    return items, pricing.get_plan().price(items)
+
+
+@router.route('/api/cart/<int:user_id>', methods=['GET'])
+async def get_cart(request, user_id):
+    try:
+        items, priced = await aio.run(_priced_cart, user_id)
+        return {
+            'cart_items': items,
+            **pricing.serialize(priced),
+            'item_count': len(items),
+        }, 200
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+def _add_to_cart(request):
+    parsed, error = validation.parse_cart_add(request.get_json() or {})
+    if error:
+        return {'error': error}, 400
+    user_id, product_id, quantity = parsed
+
+    try:
+        # Stock check and insert run in one transaction on one connection
+        with db.transaction():
+            product = db.get_product_by_id(product_id)
+            if not product:
+                return {'error': 'Product not found'}, 404
+            if product['stock'] < quantity:
+                return {'error': 'Insufficient stock'}, 400
+            success = db.add_to_cart(user_id, product_id, quantity)
+        if not success:
+            return {'error': 'Failed to add item to cart'}, 500
+        return {'message': 'Item added to cart successfully'}, 201
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+@router.route('/api/cart', methods=['POST'])
+async def add_to_cart(request):
+    return await aio.run(_idempotent, request, 'cart.add', partial(_add_to_cart, request))
+
+
+@router.route('/api/cart/<int:user_id>/count', methods=['GET'])
+async def get_cart_count(request, user_id):
+    try:
+        return {'item_count': await aio.run(db.get_cart_count, user_id)}, 200
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+@router.route('/api/cart/<int:cart_item_id>', methods=['PUT'])
+async def update_cart_item(request, cart_item_id):
+    update, error = validation.parse_cart_quantity(request.get_json() or {})
+    if error:
+        return {'error': error}, 400
+
+    quantity, user_id = update
+    try:
+        if not await aio.run(db.update_cart_quantity, cart_item_id, quantity, user_id):
+            return {'error': 'Cart item not found'}, 404
+        message = 'Cart item removed' if quantity <= 0 else 'Cart item updated successfully'
+        return {'message': message}, 200
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+@router.route('/api/cart/<int:cart_item_id>', methods=['DELETE'])
+async def remove_from_cart(request, cart_item_id):
+    try:
+        if not await aio.run(db.remove_from_cart, cart_item_id, request.get_int_arg('user_id')):
+            return {'error': 'Cart item not found'}, 404
+        return {'message': 'Item removed from cart'}, 200
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+@router.route('/api/cart/clear/<int:user_id>', methods=['POST'])
+async def clear_cart(request, user_id):
+    try:
+        await aio.run(db.clear_cart, user_id)
+        return {'message': 'Cart cleared successfully'}, 200
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+# Orders
+def _checkout(request):
+    user_id, error = validation.parse_checkout(request.get_json() or {})
+    if error:
+        return {'error': error}, 400
+
+    try:
+        return checkout.place_order(user_id)
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+@router.route('/api/orders/checkout', methods=['POST'])
+async def checkout_order(request):
+    return await aio.run(_idempotent, request, 'orders.checkout', partial(_checkout, request))
+
+
+@router.route('/api/orders/<int:user_id>', methods=['GET'])
+async def get_orders(request, user_id):
+    try:
+        return {'orders': await aio.run(db.get_user_orders, user_id)}, 200
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+@router.route('/api/orders/detail/<int:order_id>', methods=['GET'])
+async def get_order(request, order_id):
+    try:
+        order = await aio.run(db.get_order_details, order_id, request.get_int_arg('user_id'))
+        if not order:
+            return {'error': 'Order not found'}, 404
+        return {'order': order}, 200
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+# Auth
+def _register(username, email, password, phone):
+    with db.transaction():
+        if db.get_user_by_email(email):
+            return None, 409
+        return db.create_user(username, email, password, phone), 201
+
+
+@router.route('/api/register', methods=['POST'])
+async def register(request):
+    registration, error = validation.parse_registration(request.get_json() or {})
+    if error:
+        return {'error': error}, 400
+
+    user_id, status = await aio.run(_register, *registration)
+    if status == 409:
+        return {'error': 'email already registered'}, 409
+    if not user_id:
+        return {'error': 'could not create user'}, 500
+    return {'message': 'user created', 'user_id': user_id}, 201
@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from app.models import db
+from app.routes import validation
+from app.services import pricing
+from app.services.idempotency import idempotent
 
 cart_bp = Blueprint('cart', __name__)
 
@@ -9,46 +12,45 @@ def get_cart(user_id):
     """Get all cart items for a user."""
     try:
         items = db.get_cart_items(user_id)
-        total = sum(float(item['subtotal']) for item in items)
+        priced = pricing.get_plan().price(items)
         return jsonify({
             'cart_items': items,
-            'total': round(total, 2),
+            **pricing.serialize(priced),
             'item_count': len(items)
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@cart_bp.route('/api/cart/<int:user_id>/count', methods=['GET'])
+def get_cart_count(user_id):
+    """Get the number of items in a user's cart (for the cart badge)."""
+    try:
+        return jsonify({'item_count': db.get_cart_count(user_id)}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @cart_bp.route('/api/cart', methods=['POST'])
+@idempotent('cart.add')
 def add_to_cart():
     """Add an item to cart."""
-    data = request.get_json() or {}
-    
-    user_id = data.get('user_id')
-    product_id = data.get('product_id')
-    quantity = data.get('quantity', 1)
-    
-    # Validation
-    if not user_id or not product_id:
-        return jsonify({'error': 'user_id and product_id are required'}), 400
+    parsed, error = validation.parse_cart_add(request.get_json() or {})
+    if error:
+        return jsonify({'error': error}), 400
+    user_id, product_id, quantity = parsed
     
     try:
-        quantity = int(quantity)
-        if quantity <= 0:
-            return jsonify({'error': 'Quantity must be positive'}), 400
-    except (ValueError, TypeError):
-        return jsonify({'error': 'Invalid quantity'}), 400
-    
-    # Check if product exists and has enough stock
-    product = db.get_product_by_id(product_id)
-    if not product:
-        return jsonify({'error': 'Product not found'}), 404
-    
-    if product['stock'] < quantity:
-        return jsonify({'error': 'Insufficient stock'}), 400
-    
-    try:
-        success = db.add_to_cart(user_id, product_id, quantity)
+        # Stock check and insert run in one transaction on one connection
+        with db.transaction():
+            product = db.get_product_by_id(product_id)
+            if not product:
+                return jsonify({'error': 'Product not found'}), 404
+            
+            if product['stock'] < quantity:
+                return jsonify({'error': 'Insufficient stock'}), 400
+            
+            success = db.add_to_cart(user_id, product_id, quantity)
         if not success:
             return jsonify({'error': 'Failed to add item to cart'}), 500
         return jsonify({'message': 'Item added to cart successfully'}), 201
@@ -60,18 +62,14 @@ def add_to_cart():
 def update_cart_item(cart_item_id):
     """Update quantity of a cart item."""
     data = request.get_json() or {}
-    quantity = data.get('quantity')
-    
-    if quantity is None:
-        return jsonify({'error': 'Quantity is required'}), 400
-    
-    try:
-        quantity = int(quantity)
-    except (ValueError, TypeError):
-        return jsonify({'error': 'Invalid quantity'}), 400
+    update, error = validation.parse_cart_quantity(data)
+    if error:
+        return jsonify({'error': error}), 400
+    # user_id is optional: routes straight to the user's shard instead of searching
+    quantity, user_id = update
     
     try:
-        success = db.update_cart_quantity(cart_item_id, quantity)
+        success = db.update_cart_quantity(cart_item_id, quantity, user_id)
         if not success:
             return jsonify({'error': 'Cart item not found'}), 404
         
@@ -85,7 +83,7 @@ def update_cart_item(cart_item_id):
 def remove_from_cart(cart_item_id):
     """Remove an item from cart."""
     try:
-        success = db.remove_from_cart(cart_item_id)
+        success = db.remove_from_cart(cart_item_id, request.args.get('user_id', type=int))
         if not success:
             return jsonify({'error': 'Cart item not found'}), 404
         return jsonify({'message': 'Item removed from cart'}), 200
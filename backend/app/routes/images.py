@@ -0,0 +1,80 @@
+import os
+
+from flask import Blueprint, request, jsonify, send_file
+from app.services import images
+
+images_bp = Blueprint('images', __name__)
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+
+
+def _image_urls(digest, ext):
+    base = f"{request.host_url}api/images/{digest}"
+    return {
+        'url': f"{base}.{ext}",
+        'variants': {
+            variant: {fmt: f"{base}/{variant}.{fmt}" for fmt in images.VARIANT_FORMATS}
+            for variant in images.VARIANTS
+        },
+    }
+
+
+def _send(path, mimetype, cache_control):
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=True)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+@images_bp.route('/api/images', methods=['POST'])
+def upload_image():
+    """Upload a product image (multipart field ``image``)."""
+    upload = request.files.get('image')
+    if upload is None:
+        return jsonify({'error': 'image file is required'}), 400
+
+    data = upload.read(images.MAX_IMAGE_BYTES + 1)
+    try:
+        digest, ext = images.store_image(data)
+    except images.ImageError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({
+        'message': 'Image uploaded successfully',
+        'digest': digest,
+        **_image_urls(digest, ext)
+    }), 201
+
+
+@images_bp.route('/api/images/<digest>.<ext>', methods=['GET'])
+def get_original(digest, ext):
+    """Serve an original image; its URL is content-addressed and never changes."""
+    if not images.DIGEST_RE.match(digest) or ext not in images.ORIGINAL_TYPES:
+        return jsonify({'error': 'Image not found'}), 404
+
+    path = images.original_path(digest, ext)
+    if not os.path.exists(path):
+        return jsonify({'error': 'Image not found'}), 404
+    return _send(path, images.ORIGINAL_TYPES[ext], IMMUTABLE_CACHE)
+
+
+@images_bp.route('/api/images/<digest>/<variant>.<fmt>', methods=['GET'])
+def get_variant(digest, variant, fmt):
+    """Serve a resized variant, or the original while it is still being generated."""
+    if (
+        not images.DIGEST_RE.match(digest)
+        or variant not in images.VARIANTS
+        or fmt not in images.VARIANT_FORMATS
+    ):
+        return jsonify({'error': 'Image not found'}), 404
+
+    path = images.variant_path(digest, variant, fmt)
+    if os.path.exists(path):
+        return _send(path, images.VARIANT_FORMATS[fmt][1], IMMUTABLE_CACHE)
+
+    original, ext = images.find_original(digest)
+    if original is None:
+        return jsonify({'error': 'Image not found'}), 404
+    images.schedule_variants(digest)
+    return _send(original, images.ORIGINAL_TYPES[ext], 'no-cache')
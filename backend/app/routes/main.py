@@ -1,4 +1,8 @@
+import os
+
 from flask import Blueprint, jsonify
+from app.models import db
+from app.services.health import monitor
 
 main_bp = Blueprint('main', __name__)
 
@@ -19,9 +23,26 @@ def health():
         'status': 'ok',
         'message': 'API is healthy',
         'port': os.environ.get('PORT', 'unknown'),
-        'worker_pid': os.getpid()
+        'worker_pid': os.getpid(),
+        'db_driver': db.get_driver(),
+        'statement_cache': db.get_statement_cache_stats()
     }), 200
 
+@main_bp.route('/api/health/live', methods=['GET'])
+def liveness():
+    """Liveness probe: the worker is up and serving requests."""
+    return jsonify({'status': 'ok', 'worker_pid': os.getpid()}), 200
+
+@main_bp.route('/api/health/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: cached dependency status, refreshed in the background."""
+    status = monitor.status()
+    return jsonify({
+        'status': 'ready' if status['ready'] else 'unavailable',
+        'worker_pid': os.getpid(),
+        **status
+    }), 200 if status['ready'] else 503
+
 @main_bp.route('/api/items', methods=['GET'])
 def get_items():
     # This is just a sample response - you can modify based on your needs
@@ -1,15 +1,65 @@
+import math
+
 from flask import Blueprint, request, jsonify
 from app.models import db
+from app.routes import validation
+from app.services import facets, related
+from app.services.idempotency import idempotent
 
 products_bp = Blueprint('products', __name__)
 
+BULK_MAX_ITEMS = 10000
+
 
 @products_bp.route('/api/products', methods=['GET'])
 def get_products():
-    """Get all products."""
+    """Get all products, or only those listed in ``?ids=1,2,3``."""
+    ids = request.args.get('ids')
+    if ids is not None:
+        product_ids, error = validation.parse_product_ids(ids)
+        if error:
+            return jsonify({'error': error}), 400
+
+    try:
+        if ids is None:
+            return jsonify({'products': db.get_all_products()}), 200
+        products = db.get_products_by_ids(product_ids)
+        found = {product['id'] for product in products}
+        return jsonify({
+            'products': products,
+            'missing': [pid for pid in dict.fromkeys(product_ids) if pid not in found],
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@products_bp.route('/api/products/changes', methods=['GET'])
+def get_product_changes():
+    """Get products changed and deleted since a sync token."""
+    since, error = validation.parse_since(request.args.get('since'))
+    if error:
+        return jsonify({'error': error}), 400
+
     try:
-        products = db.get_all_products()
-        return jsonify({'products': products}), 200
+        changes = db.get_product_changes(since)
+        return jsonify({
+            'products': changes['products'],
+            'deleted': changes['deleted'],
+            'since': changes['since'].strftime(validation.SYNC_TOKEN_FORMAT),
+            'reset': changes['reset'],
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@products_bp.route('/api/products/facets', methods=['GET'])
+def get_product_facets():
+    """Get category, stock and price facet counts, optionally for a search."""
+    try:
+        return jsonify(facets.get_facets(
+            request.args.get('q', '').strip() or None,
+            request.args.get('category') or None,
+        )), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -26,32 +76,29 @@ def get_product(product_id):
         return jsonify({'error': str(e)}), 500
 
 
+@products_bp.route('/api/products/<int:product_id>/related', methods=['GET'])
+def get_related_products(product_id):
+    """Get products frequently bought together with a product."""
+    limit, error = validation.parse_limit(request.args.get('limit'), related.RELATED_TOP_K)
+    if error:
+        return jsonify({'error': error}), 400
+
+    try:
+        return jsonify({'related': related.related_products(product_id, limit)}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @products_bp.route('/api/products', methods=['POST'])
 def create_product():
     """Create a new product."""
-    data = request.get_json() or {}
-    
-    name = data.get('name')
-    description = data.get('description', '')
-    price = data.get('price')
-    category = data.get('category', '')
-    image_url = data.get('image_url', '')
-    stock = data.get('stock', 0)
-    
-    # Validation
-    if not name or price is None:
-        return jsonify({'error': 'Name and price are required'}), 400
-    
-    try:
-        price = float(price)
-        stock = int(stock)
-        if price < 0 or stock < 0:
-            return jsonify({'error': 'Price and stock must be non-negative'}), 400
-    except (ValueError, TypeError):
-        return jsonify({'error': 'Invalid price or stock value'}), 400
-    
+    product, error = validation.parse_product(request.get_json() or {})
+    if error:
+        return jsonify({'error': error}), 400
+
     try:
-        product_id = db.create_product(name, description, price, category, image_url, stock)
+        product_id = db.create_product(**product)
+        facets.product_saved({'id': product_id, **product})
         return jsonify({
             'message': 'Product created successfully',
             'product_id': product_id
@@ -63,31 +110,15 @@ def create_product():
 @products_bp.route('/api/products/<int:product_id>', methods=['PUT'])
 def update_product(product_id):
     """Update an existing product."""
-    data = request.get_json() or {}
-    
-    name = data.get('name')
-    description = data.get('description', '')
-    price = data.get('price')
-    category = data.get('category', '')
-    image_url = data.get('image_url', '')
-    stock = data.get('stock', 0)
-    
-    # Validation
-    if not name or price is None:
-        return jsonify({'error': 'Name and price are required'}), 400
-    
-    try:
-        price = float(price)
-        stock = int(stock)
-        if price < 0 or stock < 0:
-            return jsonify({'error': 'Price and stock must be non-negative'}), 400
-    except (ValueError, TypeError):
-        return jsonify({'error': 'Invalid price or stock value'}), 400
-    
+    product, error = validation.parse_product(request.get_json() or {})
+    if error:
+        return jsonify({'error': error}), 400
+
     try:
-        success = db.update_product(product_id, name, description, price, category, image_url, stock)
+        success = db.update_product(product_id, **product)
         if not success:
             return jsonify({'error': 'Product not found'}), 404
+        facets.product_saved({'id': product_id, **product})
         return jsonify({'message': 'Product updated successfully'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -100,7 +131,90 @@ def delete_product(product_id):
         success = db.delete_product(product_id)
         if not success:
             return jsonify({'error': 'Product not found'}), 404
+        facets.product_deleted(product_id)
         return jsonify({'message': 'Product deleted successfully'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+
+def _is_product_id(value):
+    # bool is an int subclass, but true/false are never product ids
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _parse_bulk_update(item):
+    """Validate one bulk update; return (update, error)."""
+    if not isinstance(item, dict) or not _is_product_id(item.get('id')):
+        return None, 'An integer id is required'
+    update = {'id': item['id']}
+    try:
+        if item.get('price') is not None:
+            update['price'] = float(item['price'])
+            if not math.isfinite(update['price']):
+                return None, 'Price must be a finite number'
+            if update['price'] < 0:
+                return None, 'Price must be non-negative'
+        if item.get('stock_delta') is not None:
+            update['stock_delta'] = int(item['stock_delta'])
+    except (ValueError, TypeError):
+        return None, 'Invalid price or stock_delta value'
+    if item.get('category') is not None:
+        update['category'] = str(item['category'])
+    if len(update) == 1:
+        return None, 'Nothing to update: set price, stock_delta or category'
+    return update, None
+
+
+@products_bp.route('/api/products/bulk', methods=['PATCH'])
+@idempotent('products.bulk')
+def bulk_update_products():
+    """Apply partial updates and deletions to many products.
+
+    Body: ``{"update": [{"id", "price"?, "stock_delta"?, "category"?}, ...],
+    "delete": [id, ...]}``. Items succeed or fail individually; see
+    ``results``.
+    """
+    data = request.get_json() or {}
+    items = data.get('update') or []
+    deletions = data.get('delete') or []
+    if not isinstance(items, list) or not isinstance(deletions, list):
+        return jsonify({'error': 'update and delete must be lists'}), 400
+    if not items and not deletions:
+        return jsonify({'error': 'Nothing to do'}), 400
+    if len(items) + len(deletions) > BULK_MAX_ITEMS:
+        return jsonify({'error': f'At most {BULK_MAX_ITEMS} items per request'}), 400
+
+    results, updates, delete_ids, seen = [], [], [], set()
+    for item in items:
+        update, error = _parse_bulk_update(item)
+        if update is not None and update['id'] in seen:
+            update, error = None, 'Product appears more than once in this request'
+        if error:
+            product_id = item.get('id') if isinstance(item, dict) else None
+            results.append({'id': product_id, 'action': 'update', 'status': 'invalid', 'error': error})
+            continue
+        seen.add(update['id'])
+        updates.append(update)
+    for product_id in deletions:
+        if not _is_product_id(product_id) or product_id in seen:
+            results.append({
+                'id': product_id, 'action': 'delete', 'status': 'invalid',
+                'error': 'Delete ids must be integers listed once per request',
+            })
+            continue
+        seen.add(product_id)
+        delete_ids.append(product_id)
+
+    try:
+        outcome = db.bulk_update_products(updates, delete_ids)
+        # One cache refresh for the whole batch
+        facets.products_changed(outcome['products'], outcome['deleted'])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    results.extend(outcome['results'])
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return jsonify({'results': results, 'summary': summary}), 200
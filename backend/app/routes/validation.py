@@ -0,0 +1,146 @@
+"""Request validation shared by the Flask routes and the ASGI handlers.
+
+Each parser takes raw query values or a decoded JSON body and returns
+``(value, error)``: ``error`` is the message for a 400 response, ``None``
+when the input is valid.
+"""
+import math
+from datetime import datetime
+
+SYNC_TOKEN_FORMAT = '%Y-%m-%dT%H:%M:%S'
+MULTI_GET_MAX_IDS = 1000
+
+
+def _parse_id(value, name):
+    """Parse an id from a JSON body: an integer or a numeric string, never a
+    bool or float (``int()`` would quietly accept both)."""
+    if isinstance(value, (bool, float)):
+        return None, f'Invalid {name}'
+    try:
+        return int(value), None
+    except (ValueError, TypeError):
+        return None, f'Invalid {name}'
+
+
+def parse_product_ids(ids):
+    """Parse ``?ids=1,2,3`` for the product multi-get."""
+    try:
+        product_ids = [int(part) for part in ids.split(',') if part.strip()]
+    except ValueError:
+        return None, 'ids must be a comma-separated list of integers'
+    if len(product_ids) > MULTI_GET_MAX_IDS:
+        return None, f'At most {MULTI_GET_MAX_IDS} ids per request'
+    return product_ids, None
+
+
+def parse_since(since):
+    """Parse a product sync token; an empty token means a full snapshot."""
+    if not since:
+        return None, None
+    try:
+        return datetime.strptime(since, SYNC_TOKEN_FORMAT), None
+    except ValueError:
+        return None, 'Invalid since token'
+
+
+def parse_limit(limit, maximum):
+    """Parse an optional ``?limit=`` of at least 1, capped at ``maximum``."""
+    try:
+        limit = int(limit if limit is not None else maximum)
+    except ValueError:
+        return None, 'Invalid limit'
+    if limit < 1:
+        return None, 'Limit must be at least 1'
+    return min(limit, maximum), None
+
+
+def parse_product(data):
+    """Validate a product body for create and update."""
+    name = data.get('name')
+    price = data.get('price')
+    stock = data.get('stock', 0)
+
+    if not name or price is None:
+        return None, 'Name and price are required'
+    try:
+        price = float(price)
+        stock = int(stock)
+    except (ValueError, TypeError):
+        return None, 'Invalid price or stock value'
+    if not math.isfinite(price):
+        return None, 'Price must be a finite number'
+    if price < 0 or stock < 0:
+        return None, 'Price and stock must be non-negative'
+
+    return {
+        'name': name,
+        'description': data.get('description', ''),
+        'price': price,
+        'category': data.get('category', ''),
+        'image_url': data.get('image_url', ''),
+        'stock': stock,
+    }, None
+
+
+def parse_cart_add(data):
+    """Validate an add-to-cart body; returns ``(user_id, product_id, quantity)``."""
+    user_id = data.get('user_id')
+    product_id = data.get('product_id')
+    if not user_id or not product_id:
+        return None, 'user_id and product_id are required'
+    user_id, error = _parse_id(user_id, 'user_id')
+    if error:
+        return None, error
+    product_id, error = _parse_id(product_id, 'product_id')
+    if error:
+        return None, error
+    try:
+        quantity = int(data.get('quantity', 1))
+    except (ValueError, TypeError):
+        return None, 'Invalid quantity'
+    if quantity <= 0:
+        return None, 'Quantity must be positive'
+    return (user_id, product_id, quantity), None
+
+
+def parse_cart_quantity(data):
+    """Validate a cart line quantity update; returns ``(quantity, user_id)``.
+
+    Zero or less removes the line. ``user_id`` is optional (it routes the
+    update straight to the user's shard) but must be an integer if given.
+    """
+    quantity = data.get('quantity')
+    if quantity is None:
+        return None, 'Quantity is required'
+    try:
+        quantity = int(quantity)
+    except (ValueError, TypeError):
+        return None, 'Invalid quantity'
+
+    user_id = data.get('user_id')
+    if user_id is not None:
+        user_id, error = _parse_id(user_id, 'user_id')
+        if error:
+            return None, error
+    return (quantity, user_id), None
+
+
+def parse_checkout(data):
+    """Validate a checkout body; returns the ``user_id``."""
+    user_id = data.get('user_id')
+    if not user_id:
+        return None, 'user_id is required'
+    return _parse_id(user_id, 'user_id')
+
+
+def parse_registration(data):
+    """Validate a registration body; returns ``(username, email, password, phone)``."""
+    username = data.get('fullName') or data.get('username')
+    email = data.get('email')
+    password = data.get('password')
+
+    if not username or not email or not password:
+        return None, 'username, email and password are required'
+    if len(password) < 6:
+        return None, 'password must be at least 6 characters long'
+    return (username, email, password, data.get('phone')), None
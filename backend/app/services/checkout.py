@@ -0,0 +1,40 @@
+"""Checkout: price a user's cart and turn it into an order.
+
+Shared by the Flask route (``app.routes.orders``) and its ASGI handler so
+both price, record and clear the cart the same way.
+"""
+from app.models import db
+from app.services import facets, pricing
+
+
+def place_order(user_id):
+    """Create an order from the user's cart; return ``(payload, status)``."""
+    cart_items = db.get_cart_items(user_id)
+    if not cart_items:
+        return {'error': 'Cart is empty'}, 400
+
+    # Calculate totals with the same pricing plan as GET /api/cart
+    priced = pricing.get_plan().price(cart_items)
+    total_amount = pricing.cents_to_decimal(priced['total'])
+    tax_amount = pricing.cents_to_decimal(priced['tax'])
+    grand_total = pricing.cents_to_decimal(priced['grand_total'])
+    discounts = [
+        pricing.cents_to_decimal(line['discount'] + line['cart_discount'])
+        for line in priced['lines']
+    ]
+
+    order_id, sold = db.create_order(
+        user_id, total_amount, tax_amount, grand_total, cart_items, discounts
+    )
+    if not order_id:
+        return {'error': 'Failed to create order'}, 500
+
+    # Only lines whose guarded stock update matched a row changed stock
+    facets.stock_sold(sold)
+    db.clear_cart(user_id)
+    return {
+        'message': 'Order placed successfully!',
+        'order_id': order_id,
+        'grand_total': float(grand_total),
+        'promotions': priced['promotions']
+    }, 201
@@ -0,0 +1,78 @@
+"""Streaming encoders for bulk CSV/NDJSON exports.
+
+Rows arrive as ``(columns, chunk_iterator)`` from ``db.stream_rows`` and are
+encoded chunk by chunk, so memory use is bounded by the chunk size rather
+than the table size.
+"""
+import csv
+import io
+import json
+import time
+import zlib
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class ExportStats:
+    """Row counter with throughput reporting."""
+
+    def __init__(self):
+        self.rows = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add(self, count):
+        self.rows += count
+        self.elapsed = time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return f"{self.rows} rows in {self.elapsed:.2f}s ({self.rows_per_second:,.0f} rows/s)"
+
+
+def _encode_csv(columns, chunks, stats):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for chunk in chunks:
+        writer.writerows(chunk)
+        stats.add(len(chunk))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def _encode_ndjson(columns, chunks, stats):
+    for chunk in chunks:
+        lines = [
+            json.dumps(dict(zip(columns, row)), default=str, separators=(',', ':'))
+            for row in chunk
+        ]
+        stats.add(len(chunk))
+        yield '\n'.join(lines) + '\n'
+
+
+def encode(fmt, columns, chunks, stats):
+    """Yield encoded text chunks in ``fmt`` ('csv' or 'ndjson')."""
+    if fmt == 'csv':
+        return _encode_csv(columns, chunks, stats)
+    if fmt == 'ndjson':
+        return _encode_ndjson(columns, chunks, stats)
+    raise ValueError(f"Unsupported export format: {fmt}")
+
+
+def gzip_stream(text_chunks, level=6):
+    """Gzip-compress a stream of text chunks on the fly."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for text in text_chunks:
+        data = compressor.compress(text.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,201 @@
+"""In-memory catalog facets: category counts, in-stock counts, price histograms.
+
+Each worker keeps a compact copy of the fields facets need (category,
+price, stock, lower-cased name and description) and running totals per category and price
+bucket. Product routes and checkout apply their own changes immediately;
+changes made by other workers arrive through the same delta feed the shop
+uses (``db.get_product_changes``), polled at most every FACETS_SYNC_SECONDS.
+Since rows carry absolute values, replaying a change twice is harmless.
+
+Unscoped requests read the running totals. A ``query`` or ``category``
+scope is answered by one pass over the in-memory copy. Neither case runs an
+aggregate query.
+"""
+import os
+import time
+from bisect import bisect_right
+from threading import Lock
+
+from app.models import db
+
+FACETS_SYNC_SECONDS = float(os.environ.get('FACETS_SYNC_SECONDS', 5))
+# Lower edges of the price buckets; the last bucket is open-ended
+PRICE_BUCKET_EDGES = tuple(
+    int(edge) for edge in os.environ.get('FACET_PRICE_EDGES', '0,5,10,25,50,100,250').split(',')
+)
+UNCATEGORIZED = 'Uncategorized'
+
+
+def _cents(price):
+    return int(round(float(price) * 100))
+
+
+def _bucket(price_cents):
+    return max(bisect_right(PRICE_BUCKET_EDGES, price_cents / 100) - 1, 0)
+
+
+class FacetIndex:
+    """Facet totals for a set of products, updated one product at a time."""
+
+    def __init__(self):
+        self.products = {}
+        # category -> [count, in_stock, per-bucket counts]
+        self.categories = {}
+        self.total = 0
+        self.in_stock = 0
+        self.buckets = [0] * len(PRICE_BUCKET_EDGES)
+
+    def _count(self, entry, sign):
+        category, price_cents, stock, _ = entry
+        totals = self.categories.get(category)
+        if totals is None:
+            totals = self.categories[category] = [0, 0, [0] * len(PRICE_BUCKET_EDGES)]
+        bucket = _bucket(price_cents)
+        totals[0] += sign
+        totals[2][bucket] += sign
+        self.total += sign
+        self.buckets[bucket] += sign
+        if stock > 0:
+            totals[1] += sign
+            self.in_stock += sign
+        if totals[0] == 0:
+            del self.categories[category]
+
+    def upsert(self, product):
+        """Add a product row, or replace the earlier version of it."""
+        entry = (
+            product.get('category') or UNCATEGORIZED,
+            _cents(product['price']),
+            int(product.get('stock') or 0),
+            f"{product.get('name') or ''} {product.get('description') or ''}".lower(),
+        )
+        previous = self.products.get(product['id'])
+        if previous == entry:
+            return
+        if previous is not None:
+            self._count(previous, -1)
+        self.products[product['id']] = entry
+        self._count(entry, 1)
+
+    def remove(self, product_id):
+        previous = self.products.pop(product_id, None)
+        if previous is not None:
+            self._count(previous, -1)
+
+    def adjust_stock(self, product_id, delta):
+        previous = self.products.get(product_id)
+        if previous is None:
+            return
+        category, price_cents, stock, text = previous
+        self._count(previous, -1)
+        entry = (category, price_cents, stock + delta, text)
+        self.products[product_id] = entry
+        self._count(entry, 1)
+
+    def summary(self, query=None, category=None):
+        """Return facet counts, optionally for products matching a scope."""
+        if not query and not category:
+            categories = {
+                name: (totals[0], totals[1]) for name, totals in self.categories.items()
+            }
+            return _format(categories, self.total, self.in_stock, self.buckets)
+
+        needle = query.lower() if query else None
+        categories = {}
+        buckets = [0] * len(PRICE_BUCKET_EDGES)
+        total = in_stock = 0
+        for entry_category, price_cents, stock, text in self.products.values():
+            if needle and needle not in text:
+                continue
+            # Category counts ignore the category scope so the dropdown
+            # still offers every category that matches the query
+            count, available = categories.get(entry_category, (0, 0))
+            categories[entry_category] = (count + 1, available + (stock > 0))
+            if category and entry_category != category:
+                continue
+            total += 1
+            in_stock += stock > 0
+            buckets[_bucket(price_cents)] += 1
+        return _format(categories, total, in_stock, buckets)
+
+
+def _format(categories, total, in_stock, buckets):
+    edges = PRICE_BUCKET_EDGES
+    return {
+        'total': total,
+        'in_stock': in_stock,
+        'categories': [
+            {'category': name, 'count': count, 'in_stock': available}
+            for name, (count, available) in sorted(categories.items())
+        ],
+        'price_buckets': [
+            {'min': edges[i], 'max': edges[i + 1] if i + 1 < len(edges) else None, 'count': count}
+            for i, count in enumerate(buckets)
+        ],
+    }
+
+
+_index = None
+_since = None
+_synced_at = 0.0
+_lock = Lock()
+
+
+def _sync(force=False):
+    """Fold catalog changes made anywhere into this worker's index."""
+    global _index, _since, _synced_at
+    if not force and _index is not None and time.monotonic() - _synced_at < FACETS_SYNC_SECONDS:
+        return
+    with _lock:
+        if not force and _index is not None and time.monotonic() - _synced_at < FACETS_SYNC_SECONDS:
+            return
+        changes = db.get_product_changes(_since)
+        index = FacetIndex() if changes['reset'] or _index is None else _index
+        for product in changes['products']:
+            index.upsert(product)
+        for product_id in changes['deleted']:
+            index.remove(product_id)
+        _index = index
+        _since = changes['since']
+        _synced_at = time.monotonic()
+
+
+def get_facets(query=None, category=None):
+    """Return facet counts for the catalog, or for a query/category scope."""
+    _sync()
+    with _lock:
+        return _index.summary(query, category)
+
+
+def warm():
+    _sync(force=True)
+
+
+# Local write hooks: keep this worker exact without waiting for a sync
+def product_saved(product):
+    with _lock:
+        if _index is not None:
+            _index.upsert(product)
+
+
+def product_deleted(product_id):
+    with _lock:
+        if _index is not None:
+            _index.remove(product_id)
+
+
+def stock_sold(cart_items):
+    with _lock:
+        if _index is not None:
+            for item in cart_items:
+                _index.adjust_stock(item['product_id'], -int(item['quantity']))
+
+
+def products_changed(products, deleted_ids):
+    """Apply a bulk operation's saved rows and deletions in one step."""
+    with _lock:
+        if _index is not None:
+            for product in products:
+                _index.upsert(product)
+            for product_id in deleted_ids:
+                _index.remove(product_id)
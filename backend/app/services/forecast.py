@@ -0,0 +1,111 @@
+"""Batch demand forecasting and stock-out projection.
+
+Daily demand per product is an exponentially weighted average of units
+sold over the last FORECAST_WINDOW_DAYS full days (a year by default), so
+recent sales count most (weights halve every FORECAST_HALF_LIFE_DAYS).
+Days of cover is stock divided by that rate. Sales come from the
+``sales_product_daily`` rollup, which checkout keeps current and which
+already holds one row per product and day; a year of history for the
+whole catalog is a single range scan.
+
+The math is NumPy array operations over the catalog: each fetched chunk of
+rollup rows is weighted by age and summed into its products' slots with
+one ``bincount``, then rates, cover and stock-out dates are computed for
+every product at once. Memory is O(products + chunk), not
+O(products x days). NumPy is imported when a forecast runs, so the web
+app still starts without it.
+"""
+import os
+import time
+from datetime import date
+from itertools import chain
+
+from app.models import db
+
+FORECAST_WINDOW_DAYS = int(os.environ.get('FORECAST_WINDOW_DAYS', 365))
+FORECAST_HALF_LIFE_DAYS = float(os.environ.get('FORECAST_HALF_LIFE_DAYS', 14))
+FORECAST_INTERVAL_SECONDS = int(os.environ.get('FORECAST_INTERVAL_SECONDS', 3600))
+STOCKOUT_HORIZON_DAYS = int(os.environ.get('STOCKOUT_HORIZON_DAYS', 14))
+# Cover beyond this is reported as "no projected stock-out"
+MAX_COVER_DAYS = 3650
+
+
+def demand_weights(window=FORECAST_WINDOW_DAYS, half_life=FORECAST_HALF_LIFE_DAYS):
+    """Weight of a day's sales by age in days (0 = yesterday)."""
+    import numpy as np
+    return 0.5 ** (np.arange(window) / half_life)
+
+
+def _project(product_ids, stock, weighted_units, total_weight, today):
+    """Turn per-product weighted unit sums into projection rows.
+
+    All arguments but ``today`` are aligned NumPy arrays (``total_weight``
+    is the sum of the demand weights).
+    """
+    import numpy as np
+    rate = weighted_units / total_weight
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cover = np.where(rate > 0, stock / rate, np.inf)
+    cover[stock <= 0] = 0.0
+    cover = np.round(cover, 1)
+    projected = cover <= MAX_COVER_DAYS
+    days = np.where(projected, cover, 0.0).astype(np.int64)
+    stockout = np.datetime64(today, 'D') + days.astype('timedelta64[D]')
+
+    return [
+        (product_id, units, demand, days_of_cover if has_date else None,
+         day if has_date else None)
+        for product_id, units, demand, days_of_cover, day, has_date in zip(
+            product_ids.tolist(), stock.tolist(), np.round(rate, 4).tolist(),
+            cover.tolist(), stockout.tolist(), projected.tolist(),
+        )
+    ]
+
+
+def compute_projections(today=None, window=FORECAST_WINDOW_DAYS, half_life=FORECAST_HALF_LIFE_DAYS):
+    """Return ``(product_id, stock, daily_demand, days_of_cover, stockout_date)``
+    for every product. Today's partial sales are left out."""
+    import numpy as np
+    today = today or date.today()
+    weights = demand_weights(window, half_life)
+
+    levels = np.array(db.get_stock_levels(), dtype=np.int64).reshape(-1, 2)
+    if not len(levels):
+        return []
+    product_ids, stock = levels[:, 0], levels[:, 1]
+    # Product ids are AUTO_INCREMENT keys, so a dense id -> slot table is
+    # small and much faster than a sorted search
+    slot_of = np.full(product_ids.max() + 1, -1, dtype=np.int64)
+    slot_of[product_ids] = np.arange(len(product_ids))
+    weighted_units = np.zeros(len(product_ids))
+
+    for chunk in db.iter_product_sales_by_age(today, window):
+        rows = np.fromiter(
+            chain.from_iterable(chunk), dtype=np.int64, count=3 * len(chunk),
+        ).reshape(-1, 3)
+        slots = slot_of[rows[:, 0].clip(max=len(slot_of) - 1)]
+        # Sales of products deleted since have no slot
+        known = (slots >= 0) & (rows[:, 0] < len(slot_of))
+        weighted_units += np.bincount(
+            slots[known], weights=rows[known, 2] * weights[rows[known, 1]],
+            minlength=len(product_ids),
+        )
+
+    return _project(product_ids, stock, weighted_units, weights.sum(), today)
+
+
+def run_forecast():
+    """Recompute and store projections for the whole catalog; return run stats."""
+    started = time.perf_counter()
+    projections = compute_projections()
+    computed = time.perf_counter()
+    written = db.save_stock_projections(projections)
+    return {
+        'products': written,
+        'at_risk': sum(
+            1 for row in projections
+            if row[3] is not None and row[3] <= STOCKOUT_HORIZON_DAYS
+        ),
+        'compute_seconds': round(computed - started, 2),
+        'seconds': round(time.perf_counter() - started, 2),
+    }
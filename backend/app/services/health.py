@@ -0,0 +1,99 @@
+"""Cached dependency status for readiness probes.
+
+A daemon thread per worker refreshes the database status every
+``HEALTH_REFRESH_SECONDS``; probes only read the last snapshot, so they are
+O(1) and never take a connection away from customer requests. A snapshot
+older than ``HEALTH_STALE_SECONDS`` (the refresher is stuck) counts as not
+ready.
+"""
+import logging
+import os
+import threading
+import time
+
+from app.models import db
+
+logger = logging.getLogger(__name__)
+
+HEALTH_REFRESH_SECONDS = float(os.environ.get('HEALTH_REFRESH_SECONDS', 5))
+HEALTH_STALE_SECONDS = HEALTH_REFRESH_SECONDS * 3
+
+
+class HealthMonitor:
+    """Background-refreshed snapshot of dependency health."""
+
+    def __init__(self, interval=HEALTH_REFRESH_SECONDS):
+        self.interval = interval
+        self._status = {'ready': False, 'checks': {}, 'checked_at': None}
+        self._checked_monotonic = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the refresher in this process (again after a fork)."""
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='health-monitor', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(self.interval)
+
+    def refresh(self):
+        checks = {}
+        ready = True
+
+        try:
+            pool_status, version = db.check_database()
+            checks['database'] = {'status': pool_status}
+            if pool_status == 'ok':
+                current = version is not None and version >= db.SCHEMA_VERSION
+                checks['schema'] = {
+                    'status': 'ok' if current else 'outdated',
+                    'version': version,
+                    'expected': db.SCHEMA_VERSION,
+                }
+                ready = ready and current
+            elif self._status['checks'].get('schema'):
+                # Pool saturated: the last schema result still stands
+                checks['schema'] = self._status['checks']['schema']
+                ready = ready and checks['schema']['status'] == 'ok'
+        except Exception as e:
+            checks['database'] = {'status': 'error', 'error': str(e)}
+            ready = False
+
+        try:
+            lag = db.get_replica_lag()
+            if lag is not None:
+                lagging = lag > db.MAX_REPLICA_LAG_SECONDS
+                checks['replica'] = {'status': 'lagging' if lagging else 'ok', 'lag_seconds': lag}
+                ready = ready and not lagging
+        except Exception as e:
+            checks['replica'] = {'status': 'error', 'error': str(e)}
+            ready = False
+
+        if not ready and self._status['ready']:
+            logger.warning('Readiness lost', extra={'checks': checks})
+        self._status = {'ready': ready, 'checks': checks, 'checked_at': time.time()}
+        self._checked_monotonic = time.monotonic()
+
+    def status(self):
+        """Return the cached snapshot, marking it unready if it went stale."""
+        self.start()
+        status = self._status
+        checked = self._checked_monotonic
+        age = None if checked is None else time.monotonic() - checked
+        ready = status['ready'] and age is not None and age <= HEALTH_STALE_SECONDS
+        return {
+            'ready': ready,
+            'checks': status['checks'],
+            'age_seconds': None if age is None else round(age, 2),
+        }
+
+
+monitor = HealthMonitor()
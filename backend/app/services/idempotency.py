@@ -0,0 +1,207 @@
+"""``Idempotency-Key`` support for retry-prone write endpoints.
+
+A request carrying the header is processed once; replays with the same key
+get the stored response back instead of redoing the work. Keys are scoped
+per endpoint and bound to a hash of the request body, so reusing a key for a
+different payload is rejected.
+
+Two tiers keep replays cheap:
+    * a bounded in-process LRU with TTL eviction answers hot replays without
+      touching MySQL, and lets duplicates arriving at the same worker wait on
+      the first request's event;
+    * the ``idempotency_keys`` table coordinates across workers: the first
+      request claims the key with an INSERT, concurrent duplicates poll the
+      row until its response is stored.
+
+Responses with a 5xx status are not stored, so the client can retry them.
+``run_once`` holds the protocol; ``idempotent`` applies it to Flask views
+and the ASGI handlers call it directly.
+"""
+import hashlib
+import random
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Event, Lock
+
+from flask import Response, jsonify, make_response, request
+
+from app.models import db
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+LOCAL_CACHE_SIZE = 10000
+WAIT_TIMEOUT_SECONDS = 10
+POLL_INTERVAL_SECONDS = 0.05
+PURGE_PROBABILITY = 0.01
+
+
+class _LocalStore:
+    """Bounded LRU of completed responses plus per-key in-flight events."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = Lock()
+
+    def get(self, key_hash):
+        with self._lock:
+            entry = self._entries.get(key_hash)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key_hash]
+                return None
+            self._entries.move_to_end(key_hash)
+            return entry[1:]
+
+    def put(self, key_hash, fingerprint, status_code, body):
+        with self._lock:
+            self._entries[key_hash] = (time.monotonic() + self.ttl, fingerprint, status_code, body)
+            self._entries.move_to_end(key_hash)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def begin(self, key_hash):
+        """Return ``(event, owner)``; only the owner processes the request."""
+        with self._lock:
+            event = self._in_flight.get(key_hash)
+            if event is not None:
+                return event, False
+            event = self._in_flight[key_hash] = Event()
+            return event, True
+
+    def finish(self, key_hash):
+        with self._lock:
+            event = self._in_flight.pop(key_hash, None)
+        if event is not None:
+            event.set()
+
+
+_store = _LocalStore(LOCAL_CACHE_SIZE, db.IDEMPOTENCY_TTL_SECONDS)
+
+
+class Outcome:
+    """Result of ``run_once``: the request's own response, a replay or an error."""
+
+    __slots__ = ('status_code', 'body', 'replayed', 'response', 'error')
+
+    def __init__(self, status_code, body=None, replayed=False, response=None, error=None):
+        self.status_code = status_code
+        self.body = body
+        self.replayed = replayed
+        self.response = response
+        self.error = error
+
+
+_IN_PROGRESS = f'A request with this {HEADER} is still in progress'
+
+
+def _replay(fingerprint, record):
+    stored_fingerprint, status_code, body = record
+    if stored_fingerprint != fingerprint:
+        return Outcome(422, error=f'{HEADER} was already used with a different request')
+    return Outcome(status_code, body, replayed=True)
+
+
+def _wait_for_owner(key_hash, fingerprint):
+    """Poll the key's row until the owning request stores its response."""
+    deadline = time.monotonic() + WAIT_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL_SECONDS)
+        row = db.get_idempotency_key(key_hash)
+        if row is None:
+            return None
+        if row['status_code'] is not None:
+            record = (row['fingerprint'], row['status_code'], row['response_body'])
+            _store.put(key_hash, *record)
+            return _replay(fingerprint, record)
+    return Outcome(409, error=_IN_PROGRESS)
+
+
+def run_once(scope, key, data, process):
+    """Run ``process`` at most once per ``key`` within ``scope``; return an ``Outcome``.
+
+    ``data`` is the raw request body the key is bound to. ``process()``
+    returns ``(status_code, body, response)``: ``body`` (JSON text) is
+    stored for replays and ``response`` is handed back to the first
+    request as ``Outcome.response``. Blocks while a duplicate is in flight,
+    so async callers run it on a thread.
+    """
+    if len(key) > MAX_KEY_LENGTH:
+        return Outcome(400, error=f'{HEADER} must be at most {MAX_KEY_LENGTH} characters')
+
+    key_hash = hashlib.sha256(f"{scope}:{key}".encode('utf-8')).hexdigest()
+    fingerprint = hashlib.sha256(data).hexdigest()
+
+    record = _store.get(key_hash)
+    if record is not None:
+        return _replay(fingerprint, record)
+
+    event, owner = _store.begin(key_hash)
+    if not owner:
+        event.wait(WAIT_TIMEOUT_SECONDS)
+        record = _store.get(key_hash)
+        if record is not None:
+            return _replay(fingerprint, record)
+        return Outcome(409, error=_IN_PROGRESS)
+
+    try:
+        existing = db.claim_idempotency_key(key_hash, fingerprint)
+        if existing is not None:
+            if existing['status_code'] is not None:
+                record = (existing['fingerprint'], existing['status_code'], existing['response_body'])
+                _store.put(key_hash, *record)
+                return _replay(fingerprint, record)
+            replay = _wait_for_owner(key_hash, fingerprint)
+            if replay is not None:
+                return replay
+            # The owner gave up and released the key; take it over
+            if db.claim_idempotency_key(key_hash, fingerprint) is not None:
+                return Outcome(409, error=_IN_PROGRESS)
+
+        try:
+            status_code, body, response = process()
+        except Exception:
+            db.release_idempotency_key(key_hash)
+            raise
+
+        if status_code >= 500:
+            db.release_idempotency_key(key_hash)
+            return Outcome(status_code, body, response=response)
+
+        db.complete_idempotency_key(key_hash, status_code, body)
+        _store.put(key_hash, fingerprint, status_code, body)
+        if random.random() < PURGE_PROBABILITY:
+            db.purge_idempotency_keys()
+        return Outcome(status_code, body, response=response)
+    finally:
+        _store.finish(key_hash)
+
+
+def idempotent(scope):
+    """Decorate a view so requests with an ``Idempotency-Key`` run at most once."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return view(*args, **kwargs)
+
+            def process():
+                response = make_response(view(*args, **kwargs))
+                return response.status_code, response.get_data(as_text=True), response
+
+            outcome = run_once(scope, key, request.get_data(), process)
+            if outcome.error:
+                return jsonify({'error': outcome.error}), outcome.status_code
+            if outcome.replayed:
+                response = Response(outcome.body, status=outcome.status_code, mimetype='application/json')
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+            return outcome.response
+
+        return wrapper
+    return decorator
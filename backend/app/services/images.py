@@ -0,0 +1,147 @@
+"""Content-addressed product image store with pre-generated variants.
+
+Uploads are stored once under their SHA-256 digest, so identical images are
+de-duplicated and every URL is immutable. Resized variants (thumbnail and
+medium, in WebP and JPEG) are generated on a background thread right after
+upload; until a variant exists, requests for it are served the original.
+"""
+import hashlib
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+IMAGE_DIR = os.environ.get(
+    'IMAGE_STORE_DIR',
+    os.path.join(os.path.dirname(__file__), '..', '..', 'media', 'images'),
+)
+MAX_IMAGE_BYTES = int(os.environ.get('MAX_IMAGE_BYTES', 10 * 1024 * 1024))
+
+# name -> longest edge in pixels
+VARIANTS = {
+    'thumb': 320,
+    'medium': 800,
+}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpg': ('JPEG', 'image/jpeg'),
+}
+ORIGINAL_TYPES = {
+    'jpg': 'image/jpeg',
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'gif': 'image/gif',
+}
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-variants')
+_pending = set()
+_pending_lock = Lock()
+
+
+class ImageError(ValueError):
+    """Raised for uploads that are not acceptable images."""
+
+
+def _sniff_type(data):
+    """Return the file extension for supported image bytes, or None."""
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    return None
+
+
+def _directory(digest):
+    return os.path.join(IMAGE_DIR, digest[:2], digest[2:4])
+
+
+def original_path(digest, ext):
+    return os.path.join(_directory(digest), f"{digest}.{ext}")
+
+
+def variant_path(digest, variant, fmt):
+    return os.path.join(_directory(digest), f"{digest}-{variant}.{fmt}")
+
+
+def find_original(digest):
+    """Return ``(path, ext)`` of the stored original, or ``(None, None)``."""
+    for ext in ORIGINAL_TYPES:
+        path = original_path(digest, ext)
+        if os.path.exists(path):
+            return path, ext
+    return None, None
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as fh:
+        fh.write(data)
+    os.replace(tmp_path, path)
+
+
+def store_image(data):
+    """Store uploaded image bytes and schedule variant generation.
+
+    Returns ``(digest, ext)``. Storing the same bytes twice is a no-op.
+    """
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ImageError(f"Image exceeds {MAX_IMAGE_BYTES} bytes")
+    ext = _sniff_type(data)
+    if ext is None:
+        raise ImageError('Unsupported image type (expected JPEG, PNG, WebP or GIF)')
+
+    digest = hashlib.sha256(data).hexdigest()
+    path = original_path(digest, ext)
+    if not os.path.exists(path):
+        _write_atomic(path, data)
+    schedule_variants(digest)
+    return digest, ext
+
+
+def schedule_variants(digest):
+    """Queue background generation of any missing variants for an image."""
+    with _pending_lock:
+        if digest in _pending:
+            return
+        _pending.add(digest)
+    _executor.submit(_generate_variants, digest)
+
+
+def _generate_variants(digest):
+    try:
+        from PIL import Image
+    except ImportError:
+        logger.warning("Pillow is not installed; image variants are disabled")
+        return
+
+    try:
+        source, _ = find_original(digest)
+        if source is None:
+            return
+        with Image.open(source) as image:
+            image.seek(0)
+            image = image.convert('RGB')
+            for variant, edge in VARIANTS.items():
+                resized = image.copy()
+                resized.thumbnail((edge, edge), Image.LANCZOS)
+                for fmt, (pil_format, _) in VARIANT_FORMATS.items():
+                    path = variant_path(digest, variant, fmt)
+                    if os.path.exists(path):
+                        continue
+                    tmp_path = f"{path}.{os.getpid()}.tmp"
+                    resized.save(tmp_path, pil_format, quality=82, optimize=True)
+                    os.replace(tmp_path, path)
+    except Exception:
+        logger.exception(f"Failed to generate variants for image {digest}")
+    finally:
+        with _pending_lock:
+            _pending.discard(digest)
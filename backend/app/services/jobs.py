@@ -0,0 +1,212 @@
+"""Durable background jobs, run out of band by ``worker.py``.
+
+Jobs are rows in the MySQL ``jobs`` table. Request code queues them inside
+its own transaction (``db._enqueue_job``), so a job exists exactly when the
+work that produced it committed. Workers claim due jobs in batches, run the
+handler registered for the job's kind, and on failure retry with exponential
+backoff until ``max_attempts``, after which the job is dead-lettered
+(``status = 'dead'``) for inspection and manual retry.
+
+Handlers must be idempotent: a job whose worker dies mid-run is handed out
+again after JOB_LOCK_TIMEOUT_SECONDS.
+"""
+import logging
+import os
+import random
+import signal
+import smtplib
+import socket
+import time
+import traceback
+from email.message import EmailMessage
+
+from app.models import db
+from app.services import forecast, related
+
+logger = logging.getLogger(__name__)
+
+JOB_BACKOFF_BASE_SECONDS = float(os.environ.get('JOB_BACKOFF_BASE_SECONDS', 10))
+JOB_BACKOFF_MAX_SECONDS = float(os.environ.get('JOB_BACKOFF_MAX_SECONDS', 3600))
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 1))
+JOB_BATCH_SIZE = 10
+PURGE_INTERVAL_SECONDS = 3600
+
+LOW_STOCK_THRESHOLD = int(os.environ.get('LOW_STOCK_THRESHOLD', 5))
+SMTP_HOST = os.environ.get('SMTP_HOST')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', 25))
+MAIL_FROM = os.environ.get('MAIL_FROM', 'orders@stationary.local')
+
+HANDLERS = {}
+PERIODIC = []
+
+
+def handler(kind):
+    """Register a function as the handler of one job kind."""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def periodic(seconds):
+    """Register a function every worker runs about once per ``seconds``."""
+    def decorator(func):
+        PERIODIC.append({'func': func, 'seconds': seconds, 'last_run': 0.0})
+        return func
+    return decorator
+
+
+def backoff_seconds(attempts):
+    """Delay before retry number ``attempts``: exponential, capped, jittered."""
+    delay = min(JOB_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), JOB_BACKOFF_MAX_SECONDS)
+    return int(delay * random.uniform(0.8, 1.2))
+
+
+class Worker:
+    """Poll the jobs table and run due jobs until stopped."""
+
+    def __init__(self, worker_id=None, batch_size=JOB_BATCH_SIZE, poll_seconds=JOB_POLL_SECONDS):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.running = False
+        self._last_purge = 0.0
+
+    def run_job(self, job):
+        """Run one claimed job and record the outcome."""
+        started = time.perf_counter()
+        fields = {'job_id': job['id'], 'kind': job['kind'], 'attempt': job['attempts']}
+        func = HANDLERS.get(job['kind'])
+        try:
+            if job['attempts'] > job['max_attempts']:
+                raise RuntimeError('Worker was lost while running this job')
+            if func is None:
+                raise LookupError(f"No handler for job kind '{job['kind']}'")
+            func(job['payload'])
+        except Exception:
+            error = traceback.format_exc()
+            status = db.fail_job(job['id'], error, backoff_seconds(job['attempts']))
+            level = logging.ERROR if status == 'dead' else logging.WARNING
+            logger.log(level, 'Job failed', extra={**fields, 'status': status, 'error': error})
+            return False
+
+        db.complete_job(job['id'])
+        logger.info('Job done', extra={
+            **fields, 'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+        })
+        return True
+
+    def run_once(self):
+        """Claim and run one batch of due jobs; return how many were claimed."""
+        jobs = db.claim_jobs(self.worker_id, self.batch_size)
+        for job in jobs:
+            self.run_job(job)
+        return len(jobs)
+
+    def run_periodic(self):
+        """Run registered periodic tasks that are due."""
+        for task in PERIODIC:
+            if time.monotonic() - task['last_run'] < task['seconds']:
+                continue
+            task['last_run'] = time.monotonic()
+            started = time.perf_counter()
+            try:
+                task['func']()
+            except Exception:
+                logger.exception('Periodic task failed', extra={'task': task['func'].__name__})
+                continue
+            logger.info('Periodic task done', extra={
+                'task': task['func'].__name__,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+            })
+
+    def stop(self, *_):
+        self.running = False
+
+    def run(self):
+        """Run until SIGTERM/SIGINT; the current job is always finished first."""
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        logger.info('Job worker started', extra={'worker_id': self.worker_id})
+        while self.running:
+            try:
+                claimed = self.run_once()
+                if time.monotonic() - self._last_purge > PURGE_INTERVAL_SECONDS:
+                    db.purge_jobs()
+                    db.purge_product_pair_orders()
+                    db.purge_order_mails()
+                    self._last_purge = time.monotonic()
+                self.run_periodic()
+            except Exception:
+                logger.exception('Job polling failed')
+                claimed = 0
+            if not claimed:
+                time.sleep(self.poll_seconds)
+        logger.info('Job worker stopped', extra={'worker_id': self.worker_id})
+
+
+# Built-in handlers
+def _send_mail(to, subject, body):
+    if not SMTP_HOST:
+        logger.info('Mail not sent (SMTP_HOST unset)', extra={'to': to, 'subject': subject})
+        return
+    message = EmailMessage()
+    message['From'] = MAIL_FROM
+    message['To'] = to
+    message['Subject'] = subject
+    message.set_content(body)
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=10) as smtp:
+        smtp.send_message(message)
+
+
+@handler('order.placed')
+def order_placed(payload):
+    """Count product pairs, send the order confirmation and raise low-stock alerts."""
+    order = db.get_order_details(payload['order_id'], payload['user_id'])
+    if order is None:
+        return
+
+    db.count_product_pairs(payload['order_id'], payload.get('product_ids', []))
+
+    user = db.get_user_by_id(payload['user_id'])
+    # The marker goes in before sending: a worker lost mid-send never mails twice
+    if user and user['email'] and db.claim_order_mail(order['id']):
+        lines = [
+            f"{item['quantity']} x {item['product_name']}  ${item['subtotal']}"
+            for item in order['items']
+        ]
+        try:
+            _send_mail(
+                user['email'],
+                f"Order #{order['id']} confirmed",
+                "\n".join([f"Hi {user['username']},", "", *lines, "",
+                           f"Total: ${order['grand_total']}"]),
+            )
+        except Exception:
+            db.release_order_mail(order['id'])
+            raise
+
+    for product_id in set(payload.get('product_ids', [])):
+        product = db.get_product_by_id(product_id)
+        if product and product['stock'] <= LOW_STOCK_THRESHOLD:
+            logger.warning('Low stock', extra={
+                'product_id': product_id, 'product_name': product['name'], 'stock': product['stock'],
+            })
+
+
+@periodic(forecast.FORECAST_INTERVAL_SECONDS)
+def refresh_stock_projections():
+    """Recompute demand forecasts unless another worker just did."""
+    if not db.claim_periodic_task('stock_projections', forecast.FORECAST_INTERVAL_SECONDS):
+        return
+    result = forecast.run_forecast()
+    logger.info('Stock projections refreshed', extra=result)
+
+
+@periodic(related.RELATED_REBUILD_SECONDS)
+def rebuild_related_index():
+    """Rebuild and publish the "frequently bought together" index unless another worker just did."""
+    if not db.claim_periodic_task('related_index', related.RELATED_REBUILD_SECONDS):
+        return
+    related.build_index()
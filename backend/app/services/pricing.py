@@ -0,0 +1,242 @@
+"""Cart pricing: tax and promotion rules compiled into a cached plan.
+
+Rules live in the ``pricing_rules`` table and are loaded once, compiled into
+lookup tables keyed by product id and category, and reused for every cart
+until they change (local invalidation, a short TTL for other workers, or a
+rule starting/ending). All money is handled as integer cents; rates are
+``Decimal`` fractions and every rounding is half-up to the cent.
+
+Rule kinds:
+    tax          value is a rate (0.10 = 10%); cart scope sets the default,
+                 category/product scope overrides it for matching lines
+    percent_off  value is a fraction of the line (or cart) amount
+    amount_off   value is money off per unit (product/category scope) or
+                 off the whole cart (cart scope)
+
+Each line gets its single best product/category promotion and the cart gets
+its single best cart promotion whose ``min_subtotal`` is met; promotions do
+not stack.
+"""
+import os
+import time
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from threading import Lock
+
+from app.models import db
+
+DEFAULT_TAX_RATE = Decimal(os.environ.get('DEFAULT_TAX_RATE', '0.10'))
+RULES_TTL_SECONDS = int(os.environ.get('PRICING_RULES_TTL', 30))
+
+RULE_KINDS = ('tax', 'percent_off', 'amount_off')
+RULE_SCOPES = ('cart', 'category', 'product')
+
+_plan = None
+_plan_loaded_at = 0.0
+_plan_lock = Lock()
+
+
+def to_cents(value):
+    """Convert a money value (Decimal, str, int or float) to integer cents."""
+    return int((Decimal(str(value)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def cents_to_decimal(cents):
+    return (Decimal(cents) / 100).quantize(Decimal('0.01'))
+
+
+def _percent_of(cents, rate):
+    return int((cents * rate).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def _allocate(cents, weights):
+    """Split ``cents`` pro rata over ``weights`` so the shares sum exactly."""
+    total = sum(weights)
+    if not cents or not total:
+        return [0] * len(weights)
+    shares = [cents * weight // total for weight in weights]
+    # Hand leftover cents to the largest weights
+    remainder = cents - sum(shares)
+    for index in sorted(range(len(weights)), key=lambda i: -weights[i])[:remainder]:
+        shares[index] += 1
+    return shares
+
+
+class PricingPlan:
+    """Compiled rule set that prices a whole cart in one pass."""
+
+    def __init__(self, rules, now=None):
+        now = now or datetime.now()
+        self.default_tax = DEFAULT_TAX_RATE
+        self.tax_by_category = {}
+        self.tax_by_product = {}
+        self.promos_by_category = {}
+        self.promos_by_product = {}
+        self.cart_promos = []
+        # Recompile at the next moment a rule starts or ends
+        self.valid_until = None
+
+        for rule in rules:
+            starts_at, ends_at = rule.get('starts_at'), rule.get('ends_at')
+            for boundary in (starts_at, ends_at):
+                if boundary and boundary > now and (self.valid_until is None or boundary < self.valid_until):
+                    self.valid_until = boundary
+            if not rule.get('active', 1):
+                continue
+            if (starts_at and starts_at > now) or (ends_at and ends_at <= now):
+                continue
+
+            kind, scope, target = rule['kind'], rule['scope'], rule.get('target')
+            value = Decimal(str(rule['value']))
+            if kind == 'tax':
+                if scope == 'cart':
+                    self.default_tax = value
+                elif scope == 'category':
+                    self.tax_by_category[target] = value
+                else:
+                    self.tax_by_product[int(target)] = value
+                continue
+
+            promo = (rule['name'], kind, value if kind == 'percent_off' else to_cents(value))
+            if scope == 'cart':
+                self.cart_promos.append(promo + (to_cents(rule.get('min_subtotal') or 0),))
+            elif scope == 'category':
+                self.promos_by_category.setdefault(target, []).append(promo)
+            else:
+                self.promos_by_product.setdefault(int(target), []).append(promo)
+
+    def is_current(self, now=None):
+        return self.valid_until is None or (now or datetime.now()) < self.valid_until
+
+    @staticmethod
+    def _best_line_discount(promos, unit_cents, quantity, line_cents):
+        best_name, best = None, 0
+        for name, kind, value in promos:
+            if kind == 'percent_off':
+                discount = _percent_of(line_cents, value)
+            else:
+                discount = min(value, unit_cents) * quantity
+            if discount > best:
+                best_name, best = name, discount
+        return best_name, min(best, line_cents)
+
+    def price(self, items):
+        """Price cart lines (dicts with product_id, category, price, quantity).
+
+        Returns a dict of integer-cent amounts: per-line results plus
+        ``subtotal`` (before discounts), ``discount``, ``total`` (after
+        discounts, before tax), ``tax`` and ``grand_total``. Each line's
+        ``cart_discount`` is its pro rata share of the cart promotion, so
+        line ``total`` minus ``cart_discount`` sums to the cart ``total``.
+        """
+        lines = []
+        applied = []
+        subtotal = 0
+        line_discounts = 0
+        taxable_by_rate = {}
+
+        for item in items:
+            product_id = item['product_id']
+            category = item.get('category')
+            quantity = int(item['quantity'])
+            unit_cents = to_cents(item['price'])
+            line_cents = unit_cents * quantity
+
+            promos = self.promos_by_product.get(product_id, [])
+            category_promos = self.promos_by_category.get(category)
+            if category_promos:
+                promos = list(promos) + category_promos
+            name, discount = (
+                self._best_line_discount(promos, unit_cents, quantity, line_cents)
+                if promos else (None, 0)
+            )
+            if name:
+                applied.append(name)
+
+            net = line_cents - discount
+            rate = self.tax_by_product.get(product_id)
+            if rate is None:
+                rate = self.tax_by_category.get(category, self.default_tax)
+            taxable_by_rate[rate] = taxable_by_rate.get(rate, 0) + net
+
+            subtotal += line_cents
+            line_discounts += discount
+            lines.append({
+                'product_id': product_id,
+                'quantity': quantity,
+                'unit_price': unit_cents,
+                'subtotal': line_cents,
+                'discount': discount,
+                'total': net,
+            })
+
+        net_subtotal = subtotal - line_discounts
+        cart_discount, cart_promo = 0, None
+        for name, kind, value, min_subtotal in self.cart_promos:
+            if net_subtotal < min_subtotal:
+                continue
+            discount = _percent_of(net_subtotal, value) if kind == 'percent_off' else value
+            discount = min(discount, net_subtotal)
+            if discount > cart_discount:
+                cart_discount, cart_promo = discount, name
+        if cart_discount:
+            applied.append(cart_promo)
+        shares = _allocate(cart_discount, [line['total'] for line in lines])
+        for line, share in zip(lines, shares):
+            line['cart_discount'] = share
+
+        tax = self._tax(taxable_by_rate, net_subtotal, cart_discount)
+        total = net_subtotal - cart_discount
+        return {
+            'lines': lines,
+            'subtotal': subtotal,
+            'discount': line_discounts + cart_discount,
+            'total': total,
+            'tax': tax,
+            'grand_total': total + tax,
+            'promotions': applied,
+        }
+
+    @staticmethod
+    def _tax(taxable_by_rate, net_subtotal, cart_discount):
+        """Tax each rate group after spreading the cart discount pro rata."""
+        if not cart_discount or not net_subtotal:
+            return sum(_percent_of(base, rate) for rate, base in taxable_by_rate.items())
+
+        groups = list(taxable_by_rate.items())
+        shares = _allocate(cart_discount, [base for _, base in groups])
+        return sum(
+            _percent_of(base - share, rate)
+            for (rate, base), share in zip(groups, shares)
+        )
+
+
+def get_plan():
+    """Return the cached pricing plan, recompiling it when rules may have changed."""
+    global _plan, _plan_loaded_at
+    plan = _plan
+    if plan is not None and time.monotonic() - _plan_loaded_at < RULES_TTL_SECONDS and plan.is_current():
+        return plan
+
+    with _plan_lock:
+        # Another thread may have reloaded (keep its plan) or invalidated
+        # (``None``) since the unlocked read
+        if _plan is None or _plan is plan:
+            _plan = PricingPlan(db.get_pricing_rules())
+            _plan_loaded_at = time.monotonic()
+        return _plan
+
+
+def invalidate():
+    """Drop the cached plan so the next cart recompiles it from the database."""
+    global _plan
+    with _plan_lock:
+        _plan = None
+
+
+def serialize(priced):
+    """Convert a priced cart's cent amounts to two-decimal floats for JSON."""
+    money = ('subtotal', 'discount', 'total', 'tax', 'grand_total')
+    result = {key: priced[key] / 100 for key in money}
+    result['promotions'] = priced['promotions']
+    return result
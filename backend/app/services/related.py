@@ -0,0 +1,211 @@
+""""Frequently bought together" index served from a memory-mapped file.
+
+The ``order.placed`` job counts every pair of products bought in the same
+order in the ``product_pairs`` table (see ``db.count_product_pairs``). ``build_index``
+streams that table once, keeps the top ``RELATED_TOP_K`` partners of each
+product and writes them as a compact CSR-style file::
+
+    header   magic, version, product count N, pair count M
+    ids      int32[N]     product ids, sorted
+    offsets  uint32[N+1]  partners of ids[i] are at offsets[i]:offsets[i+1]
+    related  int32[M]     partner product ids, strongest first
+    orders   uint32[M]    orders containing both products
+
+Job workers build the file and publish it in the ``related_index`` table,
+since web and job processes may not share a filesystem (Railway, Heroku).
+Web workers download a newer build within ``RELATED_SYNC_SECONDS`` and map
+the file read-only, so the OS page cache holds one copy for all workers on
+a host; a lookup is a binary search plus a slice, with no SQL. Files are
+replaced atomically and workers pick up a new one within
+``RELATED_RELOAD_SECONDS``. Arrays use the host's native byte order, so
+all hosts must share one.
+"""
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+from array import array
+from bisect import bisect_left
+from threading import Lock
+
+from app.models import db
+
+logger = logging.getLogger(__name__)
+
+RELATED_INDEX_PATH = os.environ.get(
+    'RELATED_INDEX_PATH',
+    os.path.join(os.path.dirname(__file__), '..', '..', 'index', 'related.bin'),
+)
+RELATED_TOP_K = int(os.environ.get('RELATED_TOP_K', 20))
+# Pairs seen in fewer orders than this are noise, not affinity
+RELATED_MIN_ORDERS = int(os.environ.get('RELATED_MIN_ORDERS', 2))
+RELATED_REBUILD_SECONDS = int(os.environ.get('RELATED_REBUILD_SECONDS', 300))
+RELATED_RELOAD_SECONDS = 1.0
+# How often web workers check the database for a newer published build
+RELATED_SYNC_SECONDS = int(os.environ.get('RELATED_SYNC_SECONDS', 30))
+
+MAGIC = b'RELX'
+VERSION = 1
+HEADER = struct.Struct('=4sIII')
+
+
+class RelatedIndex:
+    """Read-only view of an index file."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, pairs = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a related-products index: {path}")
+
+        view = memoryview(self._mmap)
+        position = HEADER.size
+
+        def take(typecode, length):
+            nonlocal position
+            end = position + 4 * length
+            part = view[position:end].cast(typecode)
+            position = end
+            return part
+
+        self.ids = take('i', count)
+        self.offsets = take('I', count + 1)
+        self.related = take('i', pairs)
+        self.orders = take('I', pairs)
+
+    def lookup(self, product_id, limit=RELATED_TOP_K):
+        """Return up to ``limit`` ``(related_id, orders)`` pairs, strongest first."""
+        index = bisect_left(self.ids, product_id)
+        if index == len(self.ids) or self.ids[index] != product_id:
+            return []
+        start = self.offsets[index]
+        end = min(self.offsets[index + 1], start + limit)
+        return list(zip(self.related[start:end], self.orders[start:end]))
+
+
+def _write_file(path, content, mtime=None):
+    """Atomically replace ``path`` with ``content``, optionally stamping its mtime."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # A unique name per writer, so concurrent builds never share a tmp file
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.related-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.chmod(tmp_path, 0o644)
+        if mtime is not None:
+            os.utime(tmp_path, (mtime, mtime))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def build_index(path=RELATED_INDEX_PATH, top_k=RELATED_TOP_K, min_orders=RELATED_MIN_ORDERS):
+    """Build the index from product_pairs, write it locally and publish it.
+
+    Returns its product and pair counts.
+    """
+    ids = array('i')
+    offsets = array('I', [0])
+    related = array('i')
+    orders = array('I')
+
+    current = None
+    taken = 0
+    for product_id, related_id, count in db.iter_product_pairs():
+        if count < min_orders:
+            continue
+        if product_id != current:
+            if current is not None:
+                offsets.append(len(related))
+            ids.append(product_id)
+            current = product_id
+            taken = 0
+        if taken < top_k:
+            related.append(related_id)
+            orders.append(count)
+            taken += 1
+    if current is not None:
+        offsets.append(len(related))
+
+    content = b''.join([
+        HEADER.pack(MAGIC, VERSION, len(ids), len(related)),
+        *(part.tobytes() for part in (ids, offsets, related, orders)),
+    ])
+    built_at = db.publish_related_index(content)
+    _write_file(path, content, built_at.timestamp())
+    return {'products': len(ids), 'pairs': len(related), 'path': path}
+
+
+def sync_index(path=RELATED_INDEX_PATH):
+    """Download the published index if it is newer than the local file.
+
+    The local file's mtime is set to the build time, so every worker on a
+    host recognises a file another one already fetched. Returns True when
+    it downloaded.
+    """
+    built_at = db.get_related_index_built_at()
+    if built_at is None:
+        return False
+    try:
+        if abs(os.stat(path).st_mtime - built_at.timestamp()) < 0.001:
+            return False
+    except FileNotFoundError:
+        pass
+    published = db.get_related_index()
+    if published is None:
+        return False
+    content, built_at = published
+    _write_file(path, content, built_at.timestamp())
+    return True
+
+
+_index = None
+_index_stamp = None
+_checked_at = 0.0
+_synced_at = float('-inf')
+_lock = Lock()
+
+
+def get_index():
+    """Return the current index, reopening the file when it was replaced."""
+    global _index, _index_stamp, _checked_at, _synced_at
+    now = time.monotonic()
+    if now - _checked_at < RELATED_RELOAD_SECONDS:
+        return _index
+    with _lock:
+        if now - _checked_at < RELATED_RELOAD_SECONDS:
+            return _index
+        _checked_at = now
+        if now - _synced_at >= RELATED_SYNC_SECONDS:
+            _synced_at = now
+            try:
+                sync_index()
+            except Exception as e:
+                # Keep serving the local file until the database is back
+                logger.warning('Related index sync failed', extra={'error': str(e)})
+        try:
+            stat = os.stat(RELATED_INDEX_PATH)
+        except FileNotFoundError:
+            _index = _index_stamp = None
+            return None
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp != _index_stamp:
+            _index = RelatedIndex(RELATED_INDEX_PATH)
+            _index_stamp = stamp
+        return _index
+
+
+def related_products(product_id, limit=RELATED_TOP_K):
+    """Return ``[{'product_id', 'orders'}]`` bought together with a product."""
+    index = get_index()
+    if index is None:
+        return []
+    return [
+        {'product_id': related_id, 'orders': count}
+        for related_id, count in index.lookup(product_id, limit)
+    ]
@@ -0,0 +1,175 @@
+"""Structured, sampled request logging off the request path.
+
+Every log record is formatted as one JSON line and handed to a queue; a
+background thread drains the queue to stdout, so a slow or blocked stdout
+never adds latency to requests. If the queue fills up, records are dropped
+(and counted) rather than blocking.
+
+Per-request lines carry route, method, status, latency, DB time and worker
+pid. Successful requests are sampled at ``LOG_SAMPLE_RATE``; errors (5xx)
+and requests slower than ``LOG_SLOW_MS`` are always logged.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from threading import Lock
+
+from flask import g, request
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.1))
+LOG_SLOW_MS = float(os.environ.get('LOG_SLOW_MS', 500))
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+
+# LogRecord attributes that are not user-supplied ``extra`` fields
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+_listener = None
+_listener_lock = Lock()
+dropped_records = 0
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON, including ``extra`` fields."""
+
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'service': self.service,
+            'logger': record.name,
+            'pid': record.process,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that formats on the caller and never blocks on a full queue."""
+
+    def prepare(self, record):
+        # Format here so the listener thread only writes bytes
+        message = self.format(record)
+        record = logging.makeLogRecord({'msg': message, 'levelno': record.levelno,
+                                        'levelname': record.levelname})
+        return record
+
+    def enqueue(self, record):
+        global dropped_records
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records += 1
+
+
+def _start_listener(service):
+    global _listener
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter('%(message)s'))
+    _listener = logging.handlers.QueueListener(log_queue, stream)
+    _listener.start()
+
+    handler = _DroppingQueueHandler(log_queue)
+    handler.setFormatter(JsonFormatter(service))
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+
+
+def configure_logging(service):
+    """Route all logging through the async JSON pipeline (once per process)."""
+    with _listener_lock:
+        if _listener is not None:
+            return
+        _start_listener(service)
+        atexit.register(_stop_listener)
+        # A forked worker inherits the queue but not the listener thread
+        os.register_at_fork(after_in_child=lambda: _start_listener(service))
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def _should_log(status, latency_ms):
+    if status >= 500 or latency_ms >= LOG_SLOW_MS:
+        return True
+    return random.random() < LOG_SAMPLE_RATE
+
+
+def init_app(app, service, db_timer=None):
+    """Install async JSON logging and per-request log lines on a Flask app.
+
+    ``db_timer`` is an optional ``(reset, read)`` pair of callables used to
+    report time spent in the database during each request.
+    """
+    configure_logging(service)
+    logger = logging.getLogger(f'{service}.requests')
+    # Flask's own handler would format errors inline on stderr
+    app.logger.handlers.clear()
+
+    @app.before_request
+    def _start_timer():
+        g._request_started = time.perf_counter()
+        if db_timer:
+            db_timer[0]()
+
+    @app.after_request
+    def _log_request(response):
+        started = g.pop('_request_started', None)
+        if started is None:
+            return response
+        log_request(
+            logger,
+            request.url_rule.rule if request.url_rule else request.path,
+            request.method,
+            response.status_code,
+            (time.perf_counter() - started) * 1000,
+            db_timer[1]() if db_timer else None,
+        )
+        return response
+
+    return app
+
+
+def log_request(logger, route, method, status, latency_ms, db_seconds=None):
+    """Emit one sampled per-request line (errors and slow requests always)."""
+    if not _should_log(status, latency_ms):
+        return
+    fields = {
+        'route': route,
+        'method': method,
+        'status': status,
+        'latency_ms': round(latency_ms, 2),
+        # Weight for reconstructing totals from sampled lines
+        'sample_rate': LOG_SAMPLE_RATE if status < 500 and latency_ms < LOG_SLOW_MS else 1.0,
+    }
+    if db_seconds is not None:
+        fields['db_ms'] = round(db_seconds * 1000, 2)
+    if status >= 500:
+        level = logging.ERROR
+    elif latency_ms >= LOG_SLOW_MS:
+        level = logging.WARNING
+    else:
+        level = logging.INFO
+    logger.log(level, 'request', extra=fields)
@@ -0,0 +1,319 @@
+"""Lightweight request tracing with OTLP-compatible JSON export.
+
+A root span is opened per request (see ``init_app``) and child spans are
+opened with ``span(name)`` -- ``db.py`` wraps every query function and pool
+checkout this way. Sampling is decided once at the root (head sampling):
+an incoming W3C ``traceparent`` header's sampled flag is honored, otherwise
+``TRACE_SAMPLE_RATE`` applies. Unsampled requests get a shared no-op span,
+so the cost of an unsampled ``span()`` call is a context-variable lookup.
+
+Finished traces are queued to a background thread that appends them, one
+OTLP ``ExportTraceServiceRequest`` JSON object per line, to a size-rotated
+file (``TRACE_EXPORT_PATH``). Any OTLP/JSON-aware collector can ingest it.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from flask import g, request
+
+TRACING_ENABLED = os.environ.get('TRACING_ENABLED', '1') in ('1', 'true', 'True')
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0.01))
+TRACE_EXPORT_PATH = os.environ.get(
+    'TRACE_EXPORT_PATH',
+    os.path.join(os.path.dirname(__file__), '..', '..', 'traces', 'traces.jsonl'),
+)
+TRACE_FILE_MAX_BYTES = int(os.environ.get('TRACE_FILE_MAX_BYTES', 50 * 1024 * 1024))
+TRACE_FILE_BACKUPS = int(os.environ.get('TRACE_FILE_BACKUPS', 5))
+TRACE_QUEUE_SIZE = 1000
+
+TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current = ContextVar('current_span', default=None)
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'kind',
+                 'start_ns', 'end_ns', 'attributes', 'status', '_token')
+
+    def __init__(self, trace, name, parent_id=None, kind=SPAN_KIND_INTERNAL, attributes=None):
+        self.trace = trace
+        self.span_id = '%016x' % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.status = None
+        self._token = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.status = STATUS_ERROR
+            self.attributes['exception.type'] = exc_type.__name__
+            self.attributes['exception.message'] = str(exc)
+        self.end()
+        _current.reset(self._token)
+        return False
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.trace.spans.append(self)
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.status:
+            span['status'] = {'code': self.status}
+        return span
+
+
+class _NoopSpan:
+    """Stand-in for spans of unsampled requests."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """Spans collected for one sampled request."""
+
+    __slots__ = ('trace_id', 'spans')
+
+    def __init__(self, trace_id):
+        self.trace_id = trace_id
+        self.spans = []
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        wrapped = {'boolValue': value}
+    elif isinstance(value, int):
+        wrapped = {'intValue': str(value)}
+    elif isinstance(value, float):
+        wrapped = {'doubleValue': value}
+    else:
+        wrapped = {'stringValue': str(value)}
+    return {'key': key, 'value': wrapped}
+
+
+def span(name, kind=SPAN_KIND_INTERNAL, **attributes):
+    """Open a child span of the current span (a no-op when not sampled)."""
+    parent = _current.get()
+    if parent is None or parent is NOOP_SPAN:
+        return NOOP_SPAN
+    return Span(parent.trace, name, parent.span_id, kind, attributes)
+
+
+def traced(name=None, kind=SPAN_KIND_INTERNAL):
+    """Decorate a function so each call runs inside a child span."""
+    def decorator(func):
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            parent = _current.get()
+            if parent is None or parent is NOOP_SPAN:
+                return func(*args, **kwargs)
+            with Span(parent.trace, span_name, parent.span_id, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def parse_traceparent(header):
+    """Return ``(trace_id, parent_span_id, sampled)`` or None for a bad header."""
+    match = TRACEPARENT_RE.match((header or '').strip().lower())
+    if not match or match.group(1) == '0' * 32 or match.group(2) == '0' * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+def start_trace(name, traceparent=None, sample_rate=None, attributes=None):
+    """Open the root span of a trace, applying head sampling.
+
+    Returns ``(span, traceparent)``: the span to close when the request
+    ends (``NOOP_SPAN`` if unsampled) and the header value to propagate.
+    """
+    parsed = parse_traceparent(traceparent) if traceparent else None
+    if parsed:
+        trace_id, parent_id, sampled = parsed
+    else:
+        trace_id, parent_id = '%032x' % random.getrandbits(128), None
+        rate = TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+        sampled = random.random() < rate
+
+    if not sampled:
+        span_id = '%016x' % random.getrandbits(64)
+        _current.set(NOOP_SPAN)
+        return NOOP_SPAN, f"00-{trace_id}-{span_id}-00"
+
+    root = Span(Trace(trace_id), name, parent_id, SPAN_KIND_SERVER, attributes)
+    root._token = _current.set(root)
+    return root, f"00-{trace_id}-{root.span_id}-01"
+
+
+def finish_trace(root):
+    """Close a root span and hand its trace to the exporter."""
+    if root is NOOP_SPAN or root is None:
+        _current.set(None)
+        return
+    root.end()
+    _current.set(None)
+    exporter.submit(root.trace)
+
+
+class FileExporter:
+    """Background writer of OTLP JSON lines to a size-rotated file."""
+
+    def __init__(self, path, service='backend'):
+        self.path = path
+        self.service = service
+        self.dropped = 0
+        self._queue = queue.Queue(TRACE_QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+            self._thread.start()
+
+    def submit(self, trace):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _encode(self, trace):
+        return json.dumps({
+            'resourceSpans': [{
+                'resource': {'attributes': [
+                    _otlp_attribute('service.name', self.service),
+                    _otlp_attribute('process.pid', os.getpid()),
+                ]},
+                'scopeSpans': [{
+                    'scope': {'name': 'stationary.tracing'},
+                    'spans': [s.to_otlp() for s in trace.spans],
+                }],
+            }],
+        }, separators=(',', ':'))
+
+    def _run(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            self.path, maxBytes=TRACE_FILE_MAX_BYTES, backupCount=TRACE_FILE_BACKUPS,
+        )
+        while True:
+            trace = self._queue.get()
+            if trace is None:
+                break
+            try:
+                handler.emit(logging.makeLogRecord({'msg': self._encode(trace)}))
+            except Exception:
+                self.dropped += 1
+        handler.close()
+
+    def flush(self, timeout=2.0):
+        """Stop the writer after it drains the queue (used at exit)."""
+        if self._thread is not None and self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                return
+            self._thread.join(timeout)
+
+
+exporter = FileExporter(TRACE_EXPORT_PATH)
+atexit.register(exporter.flush)
+
+
+def init_app(app, service='backend'):
+    """Trace every request of a Flask app with a root span."""
+    exporter.service = service
+
+    @app.before_request
+    def _start_request_span():
+        root, traceparent = start_trace('request', request.headers.get('traceparent'))
+        if root is not NOOP_SPAN:
+            rule = request.url_rule.rule if request.url_rule else request.path
+            root.name = f"{request.method} {rule}"
+            root.attributes.update({
+                'http.method': request.method,
+                'http.route': rule,
+                'http.target': request.full_path.rstrip('?'),
+            })
+        g._trace_root = root
+        g._traceparent = traceparent
+
+    @app.after_request
+    def _tag_response(response):
+        root = g.get('_trace_root')
+        # Only sampled traces are worth correlating from the client side
+        if root is not None and root is not NOOP_SPAN:
+            root.set_attribute('http.status_code', response.status_code)
+            if response.status_code >= 500:
+                root.status = STATUS_ERROR
+            response.headers['traceparent'] = g._traceparent
+        return response
+
+    @app.teardown_request
+    def _finish_request_span(exc):
+        root = g.pop('_trace_root', None)
+        if exc is not None and root is not None and root is not NOOP_SPAN:
+            root.status = STATUS_ERROR
+            root.set_attribute('exception.type', type(exc).__name__)
+        finish_trace(root)
+
+    return app
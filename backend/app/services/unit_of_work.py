@@ -0,0 +1,26 @@
+"""Bind a database unit of work to each Flask request.
+
+Every ``db`` call made while handling a request shares one pooled
+connection per shard (see ``db.UnitOfWork``). The connections return to
+their pools in ``teardown_request``, after any streamed response finishes.
+A route that needs several calls to commit or fail together wraps them in
+``db.transaction()``.
+"""
+from flask import g
+
+from app.models import db
+
+
+def init_app(app):
+    """Give every request of a Flask app its own unit of work."""
+
+    @app.before_request
+    def _begin_unit_of_work():
+        g.unit_of_work = db.begin_unit_of_work()
+
+    @app.teardown_request
+    def _end_unit_of_work(exc):
+        if g.pop('unit_of_work', None) is not None:
+            db.end_unit_of_work()
+
+    return app
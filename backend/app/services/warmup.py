@@ -0,0 +1,51 @@
+"""Warm a freshly started worker before it accepts traffic.
+
+Called from gunicorn's ``post_worker_init`` hook, which runs after the app
+is loaded but before the worker enters its accept loop. Each step opens or
+primes something the first customer requests would otherwise pay for: the
+MySQL pool, the catalog query (and MySQL's buffer pool behind it), the
+compiled pricing plan, catalog facets, the related-products index (fetched
+from the database if this host has no current copy), the readiness
+snapshot, and Flask's request path. A failing step is logged and skipped;
+a cold worker beats no worker.
+"""
+import logging
+import time
+
+from app.models import db
+from app.services import facets, pricing, related
+from app.services.health import monitor
+
+logger = logging.getLogger(__name__)
+
+# Read-only routes requested once through the app to exercise the full stack
+WARMUP_PATHS = ('/api/products', '/api/health/ready')
+
+
+def _warm_routes(app):
+    client = app.test_client()
+    for path in WARMUP_PATHS:
+        client.get(path)
+
+
+def warm_worker(app):
+    """Run every warm-up step and return their durations in milliseconds."""
+    steps = (
+        ('pool', db.get_pool),
+        ('catalog', db.get_all_products),
+        ('pricing', pricing.get_plan),
+        ('facets', facets.warm),
+        ('related', related.get_index),
+        ('health', monitor.refresh),
+        ('routes', lambda: _warm_routes(app)),
+    )
+    timings = {}
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.warning('Warm-up step failed', extra={'step': name, 'error': str(e)})
+        timings[name] = round((time.perf_counter() - started) * 1000, 2)
+    logger.info('Worker warmed up', extra={'warmup_ms': timings})
+    return timings
@@ -0,0 +1,64 @@
+"""
+Order partition maintenance and cold archival.
+
+Usage:
+    python archive_orders.py --partition        # one-off: partition orders tables by month
+    python archive_orders.py                    # add upcoming partitions, archive expired ones
+    python archive_orders.py --dry-run          # list what would be archived
+
+Run the default mode from a daily/monthly scheduler. Partitions older than
+ORDER_RETENTION_MONTHS are exported to gzip NDJSON files in ORDER_ARCHIVE_DIR
+and dropped; the API keeps serving them via the archived_orders index.
+"""
+
+import argparse
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.models import db
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Partition and archive order tables.')
+    parser.add_argument('--partition', action='store_true',
+                        help='convert orders/order_items to monthly partitions')
+    parser.add_argument('--retention-months', type=int, default=db.ORDER_RETENTION_MONTHS,
+                        help='keep this many months in MySQL (default: %(default)s)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='only list partitions that would be archived')
+    args = parser.parse_args()
+
+    db.init_db()
+
+    if args.partition:
+        if db.partition_order_tables():
+            print("✓ orders and order_items are now partitioned by month")
+        else:
+            print("✓ orders is already partitioned")
+
+    if not db.is_orders_partitioned():
+        print("❌ orders is not partitioned yet — run with --partition first")
+        sys.exit(1)
+
+    expired = db.get_archivable_partitions(args.retention_months)
+    if args.dry_run:
+        print(f"Would archive {len(expired)} partition(s): {', '.join(expired) or '-'}")
+        return
+
+    for name in db.ensure_order_partitions():
+        print(f"✓ Added partition {name}")
+
+    for name in expired:
+        result = db.archive_order_partition(name)
+        print(f"✓ Archived {result['partition']}: {result['orders']} orders -> {result['file']}")
+
+    print("✅ Order maintenance complete")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error during order maintenance: {e}")
+        sys.exit(1)
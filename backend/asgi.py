@@ -0,0 +1,21 @@
+"""ASGI entry point: ``gunicorn -c gunicorn.conf.py asgi:app`` with
+GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker (see app/asgi.py)."""
+import logging
+import sys
+
+from app.asgi import create_asgi_app
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
+    stream=sys.stdout
+)
+
+logger = logging.getLogger(__name__)
+
+try:
+    app = create_asgi_app()
+    logger.info("ASGI application is ready")
+except Exception as e:
+    logger.error(f"Failed to create application: {e}", exc_info=True)
+    sys.exit(1)
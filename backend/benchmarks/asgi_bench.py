@@ -0,0 +1,191 @@
+"""
+Compare the sync WSGI deployment with the ASGI one under many concurrent clients.
+
+For each mode, starts gunicorn with gunicorn.conf.py on a local port:
+
+* ``wsgi``: ``run:app`` with the default sync workers;
+* ``asgi``: ``asgi:app`` with uvicorn workers (GUNICORN_WORKER_CLASS).
+
+Then opens ``--clients`` keep-alive connections from one asyncio event
+loop (1000 by default), each sending requests back to back across a mix of
+catalog, cart and order reads, and reports requests/s, p50, p99 and errors.
+Connections the server closes are reopened; the reconnect time counts
+toward that request's latency. Requires uvicorn for the ASGI mode.
+
+Usage:
+    python benchmarks/asgi_bench.py [--modes wsgi,asgi] [--workers 2]
+        [--clients 1000] [--seconds 20] [--user-id 1]
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import os
+import resource
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..')
+MODES = {
+    'wsgi': ('run:app', 'sync'),
+    'asgi': ('asgi:app', 'uvicorn.workers.UvicornWorker'),
+}
+REQUEST_TIMEOUT_SECONDS = 30
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _wait_until_up(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return True
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    return False
+
+
+async def _read_response(reader):
+    """Read one HTTP/1.1 response; return (status, keep_alive)."""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip().lower()
+
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get('connection') != 'close'
+
+
+async def _client(port, paths, offset, deadline, results):
+    reader = writer = None
+    i = offset
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        ok = True
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(
+                f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n"
+                f"Connection: keep-alive\r\n\r\n".encode()
+            )
+            status, keep_alive = await asyncio.wait_for(
+                _read_response(reader), REQUEST_TIMEOUT_SECONDS,
+            )
+            ok = status < 500
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+            ok, keep_alive = False, False
+        results.append(((time.perf_counter() - started) * 1000, ok))
+        if not keep_alive and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def _load(port, paths, clients, seconds):
+    results = []
+    deadline = time.monotonic() + seconds
+    await asyncio.gather(*(
+        _client(port, paths, i, deadline, results) for i in range(clients)
+    ))
+    return results
+
+
+def run_mode(mode, args, paths):
+    target, worker_class = MODES[mode]
+    env = {
+        **os.environ, 'PORT': str(args.port), 'WEB_CONCURRENCY': str(args.workers),
+        'GUNICORN_WORKER_CLASS': worker_class,
+        # Sampled request lines would only add noise to the benchmark
+        'LOG_SAMPLE_RATE': '0',
+    }
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+         '--backlog', str(max(2048, args.clients * 2)), target],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not _wait_until_up(f"http://127.0.0.1:{args.port}/api/health/live", timeout=60):
+            print(f"❌ gunicorn ({mode}) did not come up")
+            return
+        # Short warm-up at low concurrency so both modes start with hot caches
+        asyncio.run(_load(args.port, paths, 8, 2))
+        started = time.monotonic()
+        results = asyncio.run(_load(args.port, paths, args.clients, args.seconds))
+        elapsed = time.monotonic() - started
+    finally:
+        server.terminate()
+        try:
+            server.wait(60)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    latencies = [latency for latency, _ in results]
+    errors = sum(1 for _, ok in results if not ok)
+    print(f"{mode:<5} {len(results) / elapsed:9.1f} req/s  p50 {_percentile(latencies, 50):8.1f} ms  "
+          f"p99 {_percentile(latencies, 99):8.1f} ms  errors {errors}/{len(results)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync WSGI vs ASGI under many concurrent clients.')
+    parser.add_argument('--modes', default='wsgi,asgi')
+    parser.add_argument('--port', type=int, default=18082)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--user-id', type=int, default=1)
+    args = parser.parse_args()
+
+    paths = [
+        '/api/products',
+        f'/api/cart/{args.user_id}',
+        '/api/products/1',
+        f'/api/cart/{args.user_id}/count',
+        f'/api/orders/{args.user_id}',
+    ]
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(unknown)}")
+    if 'asgi' in modes and importlib.util.find_spec('uvicorn') is None:
+        print("uvicorn not installed: skipping the asgi mode (pip install -r requirements.txt)")
+        modes.remove('asgi')
+
+    # One socket per client, plus headroom
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < args.clients + 256:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, args.clients + 256), hard))
+
+    print(f"{args.clients} concurrent clients, {args.workers} workers, {args.seconds:.0f}s per mode")
+    for mode in modes:
+        run_mode(mode, args, paths)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+Measure how throughput and tail latency degrade under injected database faults.
+
+Starts gunicorn with gunicorn.conf.py and DB_FAULT_PLAN pointing at a
+temporary plan file (see app/models/faults.py), keeps a steady mix of
+catalog and cart requests going from a few client threads, and runs a
+series of phases. Each phase atomically replaces the plan file; workers
+pick it up within a second, and measurement starts after a short settle.
+
+The built-in phases cover a baseline, slow cart queries (pool exhaustion),
+lock-wait timeouts on cart writes and reads, dropped connections, and a
+bandwidth-limited catalog. ``--phases FILE`` runs a JSON list of
+``{"name": ..., "seconds": ..., "rules": [...]}`` instead.
+
+Usage:
+    python benchmarks/db_faults.py [--workers 2] [--clients 8] [--seconds 10]
+        [--user-id 1] [--phases phases.json] [--pool-size 5]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..')
+# Workers re-read the plan this often (faults.PLAN_CHECK_SECONDS), plus margin
+SETTLE_SECONDS = 1.5
+
+
+def default_phases(seconds):
+    return [
+        {'name': 'baseline', 'seconds': seconds, 'rules': []},
+        {'name': 'slow-cart', 'seconds': seconds, 'rules': [
+            {'match': r'\bcart_items\b', 'latency': {'median_ms': 25, 'p99_ms': 400}},
+        ]},
+        {'name': 'lock-wait', 'seconds': seconds, 'rules': [
+            {'match': r'\bcart_items\b', 'lock_wait_rate': 0.02, 'lock_wait_seconds': 2},
+        ]},
+        {'name': 'drops', 'seconds': seconds, 'rules': [
+            {'drop_rate': 0.01},
+        ]},
+        {'name': 'slow-link', 'seconds': seconds, 'rules': [
+            {'match': r'\bFROM products\b', 'bandwidth_kbps': 2000,
+             'latency': {'min_ms': 1, 'max_ms': 5}},
+        ]},
+    ]
+
+
+def _write_plan(path, rules, seed):
+    # Replace atomically so a worker never reads a half-written plan
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump({'seed': seed, 'rules': rules}, f)
+    os.replace(tmp, path)
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _wait_until_up(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return True
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    return False
+
+
+def _client(urls, offset, stop, results):
+    i = offset
+    while not stop.is_set():
+        url = urls[i % len(urls)]
+        i += 1
+        started = time.perf_counter()
+        ok = True
+        try:
+            with urllib.request.urlopen(url, timeout=120) as response:
+                response.read()
+                ok = response.status < 500
+        except urllib.error.HTTPError as e:
+            ok = e.code < 500
+        except (urllib.error.URLError, ConnectionError):
+            ok = False
+        results.append((time.monotonic(), (time.perf_counter() - started) * 1000, ok))
+
+
+def _report(label, samples, seconds):
+    latencies = [latency for _, latency, _ in samples]
+    errors = sum(1 for _, _, ok in samples if not ok)
+    print(f"{label:<10} {len(samples) / seconds:8.1f} req/s  p50 {_percentile(latencies, 50):7.1f} ms  "
+          f"p99 {_percentile(latencies, 99):8.1f} ms  max {max(latencies, default=0):8.1f} ms  "
+          f"errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput and latency under injected DB faults.')
+    parser.add_argument('--port', type=int, default=18081)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10, help='measured seconds per phase')
+    parser.add_argument('--user-id', type=int, default=1, help='user whose cart is read')
+    parser.add_argument('--pool-size', type=int, help='override MYSQL_POOL_SIZE')
+    parser.add_argument('--phases', help='JSON file with a list of phases')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.phases:
+        with open(args.phases) as f:
+            phases = json.load(f)
+    else:
+        phases = default_phases(args.seconds)
+
+    workdir = tempfile.mkdtemp(prefix='db_faults_')
+    plan_path = os.path.join(workdir, 'plan.json')
+    _write_plan(plan_path, [], args.seed)
+
+    env = {
+        **os.environ, 'PORT': str(args.port), 'WEB_CONCURRENCY': str(args.workers),
+        'DB_FAULT_PLAN': plan_path,
+    }
+    if args.pool_size:
+        env['MYSQL_POOL_SIZE'] = str(args.pool_size)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'run:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    urls = [
+        base_url + '/api/products',
+        base_url + f'/api/cart/{args.user_id}',
+        base_url + '/api/products/1',
+        base_url + f'/api/cart/{args.user_id}/count',
+    ]
+    windows = []
+    results = []
+    stop = threading.Event()
+    try:
+        if not _wait_until_up(base_url + '/api/health/live', timeout=60):
+            print("❌ gunicorn did not come up")
+            sys.exit(1)
+
+        clients = [
+            threading.Thread(target=_client, args=(urls, i, stop, results), daemon=True)
+            for i in range(args.clients)
+        ]
+        for thread in clients:
+            thread.start()
+
+        for phase in phases:
+            _write_plan(plan_path, phase.get('rules', []), args.seed)
+            time.sleep(SETTLE_SECONDS)
+            started = time.monotonic()
+            time.sleep(phase['seconds'])
+            windows.append((phase['name'], started, time.monotonic()))
+            print(f"✓ Phase '{phase['name']}' done")
+        stop.set()
+        for thread in clients:
+            thread.join(130)
+    finally:
+        stop.set()
+        server.terminate()
+        try:
+            server.wait(60)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    print()
+    for name, started, ended in windows:
+        _report(name, [r for r in results if started <= r[0] < ended], ended - started)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark the demand forecast over a synthetic catalog and year of sales.
+
+Runs entirely in-process (no database): the two db reads the forecast makes
+are replaced with synthetic stock levels and rollup rows, pre-built in the
+chunks the real cursor fetches, so only the computation is timed. For
+comparison, the same projections are also computed with a plain per-row
+Python fold over the same rows.
+
+Usage:
+    python benchmarks/forecast_bench.py [--products 100000] [--days 365] [--density 0.03]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.models import db
+from app.services import forecast
+
+CHUNK_SIZE = 50000
+
+
+def build_sales(products, days, density, rng):
+    """Rollup rows ``(product_id, age, units)``: each product sells on about
+    ``density`` of the days."""
+    rows = []
+    for age in range(days):
+        for product_id in rng.sample(range(1, products + 1), int(products * density)):
+            rows.append((product_id, age, rng.randint(1, 6)))
+    return [rows[start:start + CHUNK_SIZE] for start in range(0, len(rows), CHUNK_SIZE)]
+
+
+def python_fold(today, window, half_life, levels, chunks):
+    """The per-row reference: fold each row into a dict, then project."""
+    weights = [0.5 ** (age / half_life) for age in range(window)]
+    total_weight = sum(weights)
+    weighted_units = {}
+    for chunk in chunks:
+        for product_id, age, units in chunk:
+            weighted_units[product_id] = weighted_units.get(product_id, 0.0) + units * weights[age]
+
+    projections = []
+    for product_id, stock in levels:
+        rate = weighted_units.get(product_id, 0.0) / total_weight
+        days_of_cover = stockout_date = None
+        if stock <= 0:
+            days_of_cover, stockout_date = 0.0, today
+        elif rate > 0 and stock / rate <= forecast.MAX_COVER_DAYS:
+            days_of_cover = round(stock / rate, 1)
+            stockout_date = today + timedelta(days=int(days_of_cover))
+        projections.append((product_id, stock, round(rate, 4), days_of_cover, stockout_date))
+    return projections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--density', type=float, default=0.03,
+                        help='share of products selling on a given day')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    today = date.today()
+    levels = [(product_id, rng.randint(0, 500)) for product_id in range(1, args.products + 1)]
+    chunks = build_sales(args.products, args.days, args.density, rng)
+    rows = sum(len(chunk) for chunk in chunks)
+    print(f"{args.products:,} products, {rows:,} rollup rows over {args.days} days")
+
+    db.get_stock_levels = lambda: levels
+    db.iter_product_sales_by_age = lambda today, window: iter(chunks)
+    forecast.demand_weights()  # import NumPy outside the timed run
+
+    started = time.perf_counter()
+    vectorized = forecast.compute_projections(today, window=args.days)
+    vectorized_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    reference = python_fold(today, args.days, forecast.FORECAST_HALF_LIFE_DAYS, levels, chunks)
+    python_seconds = time.perf_counter() - started
+
+    mismatched = sum(
+        1 for a, b in zip(vectorized, reference)
+        if a[3] != b[3] or abs(a[2] - b[2]) > 1e-4
+    )
+    print(f"{'numpy':>8} {vectorized_seconds:>8.2f} s")
+    print(f"{'python':>8} {python_seconds:>8.2f} s  ({python_seconds / vectorized_seconds:.1f}x)")
+    print(f"{mismatched} of {len(reference):,} projections differ")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark the pricing engine on carts of 1 to 500 lines.
+
+Runs entirely in-process (no database): a synthetic rule set with a default
+tax, category taxes and product/category/cart promotions is compiled once,
+then each cart size is priced repeatedly.
+
+Usage:
+    python benchmarks/pricing_bench.py [--repeat 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.pricing import PricingPlan
+
+CATEGORIES = ['Writing Instruments', 'Notebooks', 'School Supplies', 'Art Supplies']
+CART_SIZES = [1, 5, 20, 50, 100, 250, 500]
+
+
+def build_rules(product_count):
+    rules = [
+        {'name': 'Default tax', 'kind': 'tax', 'scope': 'cart', 'value': Decimal('0.10')},
+        {'name': 'Art tax', 'kind': 'tax', 'scope': 'category', 'target': 'Art Supplies',
+         'value': Decimal('0.075')},
+        {'name': 'Notebook sale', 'kind': 'percent_off', 'scope': 'category', 'target': 'Notebooks',
+         'value': Decimal('0.15')},
+        {'name': 'Big basket', 'kind': 'percent_off', 'scope': 'cart', 'value': Decimal('0.05'),
+         'min_subtotal': Decimal('100')},
+        {'name': 'Five off', 'kind': 'amount_off', 'scope': 'cart', 'value': Decimal('5'),
+         'min_subtotal': Decimal('50')},
+    ]
+    for product_id in range(1, product_count + 1, 7):
+        rules.append({'name': f'Deal {product_id}', 'kind': 'amount_off', 'scope': 'product',
+                      'target': str(product_id), 'value': Decimal('0.50')})
+    return rules
+
+
+def build_cart(lines, rng):
+    return [
+        {
+            'product_id': product_id,
+            'category': rng.choice(CATEGORIES),
+            'price': Decimal(rng.randint(99, 4999)) / 100,
+            'quantity': rng.randint(1, 5),
+        }
+        for product_id in rng.sample(range(1, 1001), lines)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    started = time.perf_counter()
+    plan = PricingPlan(build_rules(1000))
+    compile_ms = (time.perf_counter() - started) * 1000
+    print(f"Compiled plan in {compile_ms:.2f} ms")
+    print(f"{'lines':>6} {'µs/cart':>10} {'µs/line':>9} {'carts/s':>10}")
+
+    for lines in CART_SIZES:
+        cart = build_cart(lines, rng)
+        repeat = max(10, args.repeat // max(1, lines // 10))
+        started = time.perf_counter()
+        for _ in range(repeat):
+            plan.price(cart)
+        elapsed = time.perf_counter() - started
+        per_cart = elapsed / repeat * 1e6
+        print(f"{lines:>6} {per_cart:>10.1f} {per_cart / lines:>9.2f} {repeat / elapsed:>10,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Measure request latency across a rolling gunicorn reload.
+
+Starts gunicorn with gunicorn.conf.py on a local port, keeps a steady stream
+of requests going from a few client threads, sends the master SIGHUP (new
+workers are forked and warmed while the old ones drain) and compares latency
+before and after the signal. Exits with status 1 if any request failed or
+the reload window's p99 exceeds the budget.
+
+Usage:
+    python benchmarks/rolling_reload.py [--path /api/health/live] [--workers 2]
+        [--clients 4] [--steady 5] [--after 10] [--budget-ms 250]
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..')
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _wait_until_up(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return True
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    return False
+
+
+def _client(url, stop, results):
+    while not stop.is_set():
+        started = time.perf_counter()
+        ok = True
+        try:
+            with urllib.request.urlopen(url, timeout=10) as response:
+                response.read()
+                ok = response.status < 500
+        except urllib.error.HTTPError as e:
+            ok = e.code < 500
+        except (urllib.error.URLError, ConnectionError):
+            ok = False
+        results.append((time.monotonic(), (time.perf_counter() - started) * 1000, ok))
+
+
+def _report(label, samples):
+    latencies = [latency for _, latency, _ in samples]
+    errors = sum(1 for _, _, ok in samples if not ok)
+    print(f"{label:<8} {len(samples):6d} req  p50 {_percentile(latencies, 50):7.1f} ms  "
+          f"p99 {_percentile(latencies, 99):7.1f} ms  max {max(latencies, default=0):7.1f} ms  "
+          f"errors {errors}")
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latency across a rolling gunicorn reload.')
+    parser.add_argument('--path', default='/api/health/live')
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--steady', type=float, default=5, help='seconds measured before the reload')
+    parser.add_argument('--after', type=float, default=10, help='seconds measured after the reload')
+    parser.add_argument('--budget-ms', type=float, default=250)
+    args = parser.parse_args()
+
+    env = {**os.environ, 'PORT': str(args.port), 'WEB_CONCURRENCY': str(args.workers)}
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'run:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        if not _wait_until_up(base_url + '/api/health/live', timeout=60):
+            print("❌ gunicorn did not come up")
+            sys.exit(1)
+
+        results = []
+        stop = threading.Event()
+        clients = [
+            threading.Thread(target=_client, args=(base_url + args.path, stop, results), daemon=True)
+            for _ in range(args.clients)
+        ]
+        for thread in clients:
+            thread.start()
+
+        time.sleep(args.steady)
+        reloaded_at = time.monotonic()
+        server.send_signal(signal.SIGHUP)
+        print(f"Sent SIGHUP to gunicorn master {server.pid}")
+        time.sleep(args.after)
+        stop.set()
+        for thread in clients:
+            thread.join(15)
+    finally:
+        server.terminate()
+        try:
+            server.wait(60)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    _report('steady', [r for r in results if r[0] < reloaded_at])
+    latencies, errors = _report('reload', [r for r in results if r[0] >= reloaded_at])
+    p99 = _percentile(latencies, 99)
+    if errors or p99 > args.budget_ms:
+        print(f"❌ Rolling reload degraded requests (budget p99 {args.budget_ms:.0f} ms)")
+        sys.exit(1)
+    print(f"✅ No failed requests and p99 within {args.budget_ms:.0f} ms across the reload")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Compare result decoding and row objects on the catalog read path.
+
+Two measurements over product-shaped rows:
+
+* in-process, no database: building dict rows vs ``Row`` objects from the
+  tuples a cursor returns, their memory per 10k rows (tracemalloc), and
+  JSON encoding through the app's JSON provider;
+* against MySQL (skipped when it is unreachable): fetching the same rows,
+  generated server-side, with the pure-Python and C-extension protocols,
+  each as dict rows and as ``Row`` objects.
+
+Usage:
+    python benchmarks/row_types_bench.py [--rows 10000] [--repeat 5]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import mysql.connector
+from flask import Flask
+
+from app.models import db
+from app.models.rows import Product, RowJSONProvider, fetch_rows
+
+# Same columns as Product, generated without touching any table
+GENERATE_ROWS = """
+    WITH RECURSIVE seq (n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < %s)
+    SELECT n, CONCAT('Product ', n), REPEAT('Smooth writing, acid-free paper. ', 4),
+           CAST((n %% 5000) / 100 AS DECIMAL(10, 2)), 'Notebooks',
+           CONCAT('/api/images/', SHA2(n, 256), '.jpg'), n %% 50, NOW(), NOW()
+    FROM seq
+"""
+
+
+def synthetic_rows(count):
+    now = datetime.now()
+    return [
+        (n, f'Product {n}', 'Smooth writing, acid-free paper. ' * 4,
+         Decimal(n % 5000) / 100, 'Notebooks', f'/api/images/{n:064x}.jpg', n % 50, now, now)
+        for n in range(1, count + 1)
+    ]
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def bytes_per_10k(build, count):
+    gc.collect()
+    tracemalloc.start()
+    rows = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del rows
+    return size / count * 10000
+
+
+def as_dicts(tuples):
+    fields = Product._fields
+    return [dict(zip(fields, values)) for values in tuples]
+
+
+def as_rows(tuples):
+    return [Product(values) for values in tuples]
+
+
+def in_process(count, repeat):
+    tuples = synthetic_rows(count)
+    app = Flask(__name__)
+    app.json = RowJSONProvider(app)
+
+    print(f"In-process, {count:,} rows")
+    print(f"{'rows':<6} {'build rows/s':>14} {'KiB/10k rows':>14} {'json rows/s':>14}")
+    for label, build in (('dict', as_dicts), ('Row', as_rows)):
+        built = build(tuples)
+        build_s = best_of(repeat, lambda: build(tuples))
+        # Excludes the shared tuples: only what each representation adds
+        memory = bytes_per_10k(lambda: build(tuples), count)
+        with app.app_context():
+            json_s = best_of(repeat, lambda: app.json.dumps({'products': built}))
+        print(f"{label:<6} {count / build_s:>14,.0f} {memory / 1024:>14,.0f} {count / json_s:>14,.0f}")
+    print()
+
+
+def fetch(conn, count, row_kind):
+    cursor = conn.cursor(dictionary=row_kind == 'dict')
+    cursor.execute(GENERATE_ROWS, (count,))
+    if row_kind == 'dict':
+        rows = cursor.fetchall()
+    else:
+        rows = fetch_rows(cursor, Product)
+    cursor.close()
+    return rows
+
+
+def against_mysql(count, repeat):
+    drivers = [('pure', True)]
+    if mysql.connector.HAVE_CEXT:
+        drivers.append(('c', False))
+    else:
+        print("(C extension not installed: measuring the pure driver only)")
+
+    print(f"MySQL fetch, {count:,} rows")
+    print(f"{'driver':<7} {'rows':<6} {'rows/s':>12} {'KiB/10k rows':>14}")
+    for driver, use_pure in drivers:
+        try:
+            conn = mysql.connector.connect(
+                **db.MYSQL_SETTINGS, charset='utf8mb4', use_pure=use_pure,
+            )
+        except mysql.connector.Error as e:
+            print(f"MySQL unavailable, skipped: {e}")
+            return
+        cursor = conn.cursor()
+        cursor.execute('SET SESSION cte_max_recursion_depth = %s', (count + 1,))
+        cursor.close()
+        for row_kind in ('dict', 'Row'):
+            fetch(conn, count, row_kind)
+            seconds = best_of(repeat, lambda: fetch(conn, count, row_kind))
+            memory = bytes_per_10k(lambda: fetch(conn, count, row_kind), count)
+            print(f"{driver:<7} {row_kind:<6} {count / seconds:>12,.0f} {memory / 1024:>14,.0f}")
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    in_process(args.rows, args.repeat)
+    against_mysql(args.rows, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
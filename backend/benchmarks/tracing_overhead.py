@@ -0,0 +1,123 @@
+"""
+Measure tracing overhead per request and check it against a budget.
+
+Two measurements:
+
+* the tracing work of one request -- root span, five traced DB calls each
+  with a pool-checkout span (like a checkout), and for sampled requests the
+  exporter's JSON encoding, counted synchronously -- timed directly for an
+  unsampled and a sampled request;
+* end-to-end requests through the Flask app with the DB functions replaced
+  by traced no-ops, for context (includes hook dispatch, noisier).
+
+The budget applies to the average tracing cost per request at the
+configured TRACE_SAMPLE_RATE; the script exits with status 1 if exceeded.
+
+Usage:
+    python benchmarks/tracing_overhead.py [--requests 20000] [--budget-us 10]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('TRACE_EXPORT_PATH', os.path.join(tempfile.mkdtemp(), 'traces.jsonl'))
+os.environ.setdefault('LOG_SAMPLE_RATE', '0')
+
+from app import create_app
+from app.models import db
+from app.services import tracing
+
+DB_CALLS_PER_REQUEST = 5
+
+
+@tracing.traced('db.fake_query', tracing.SPAN_KIND_CLIENT)
+def fake_query():
+    with tracing.span('db.pool.checkout', tracing.SPAN_KIND_CLIENT):
+        pass
+    return []
+
+
+def fake_request_work():
+    for _ in range(DB_CALLS_PER_REQUEST - 1):
+        fake_query()
+    return fake_query()
+
+
+def _time_lifecycle(requests, sample_rate, encode):
+    started = time.perf_counter()
+    for _ in range(requests):
+        root, _ = tracing.start_trace('GET /api/products', sample_rate=sample_rate)
+        fake_request_work()
+        if encode and root is not tracing.NOOP_SPAN:
+            root.end()
+            tracing.exporter._encode(root.trace)
+        tracing.finish_trace(tracing.NOOP_SPAN if encode else root)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def _time_untraced(requests):
+    started = time.perf_counter()
+    for _ in range(requests):
+        fake_request_work()
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def _time_app(client, requests, sample_rate):
+    tracing.TRACE_SAMPLE_RATE = sample_rate
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get('/api/products')
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tracing overhead benchmark.')
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--sample-rate', type=float, default=tracing.TRACE_SAMPLE_RATE)
+    parser.add_argument('--budget-us', type=float,
+                        default=float(os.environ.get('TRACE_OVERHEAD_BUDGET_US', 10)))
+    args = parser.parse_args()
+
+    # Direct measurement of tracing work (best of three)
+    base = unsampled = sampled = float('inf')
+    for _ in range(3):
+        base = min(base, _time_untraced(args.requests))
+        unsampled = min(unsampled, _time_lifecycle(args.requests, 0.0, encode=False))
+        sampled = min(sampled, _time_lifecycle(args.requests // 10, 1.0, encode=True))
+    unsampled_cost = unsampled - base
+    sampled_cost = sampled - base
+    average = unsampled_cost + (sampled_cost - unsampled_cost) * args.sample_rate
+
+    spans = DB_CALLS_PER_REQUEST * 2 + 1
+    print(f"unsampled request tracing cost: {unsampled_cost:7.2f} µs")
+    print(f"sampled request tracing cost:   {sampled_cost:7.2f} µs ({spans} spans incl. export encoding)")
+
+    # End-to-end through Flask, for context
+    db.get_all_products = fake_request_work
+    app = create_app()
+    logging.getLogger().setLevel(logging.WARNING)
+    client = app.test_client()
+    e2e_requests = max(1000, args.requests // 10)
+    _time_app(client, 200, 0.0)
+    e2e_unsampled = _time_app(client, e2e_requests, 0.0)
+    e2e_sampled = _time_app(client, e2e_requests, 1.0)
+    tracing.exporter.flush()
+    print(f"end-to-end request, unsampled:  {e2e_unsampled:7.1f} µs")
+    print(f"end-to-end request, sampled:    {e2e_sampled:7.1f} µs "
+          f"({tracing.exporter.dropped} traces dropped)")
+
+    print(f"average tracing cost at sample rate {args.sample_rate}: "
+          f"{average:.2f} µs/request (budget {args.budget_us:.0f} µs)")
+    if average > args.budget_us:
+        print("❌ Tracing overhead exceeds budget")
+        sys.exit(1)
+    print("✅ Tracing overhead within budget")
+
+
+if __name__ == '__main__':
+    main()
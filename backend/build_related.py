@@ -0,0 +1,49 @@
+"""
+Build the "frequently bought together" index.
+
+Usage:
+    python build_related.py             # rewrite the index file from product_pairs
+    python build_related.py --full      # recount product_pairs from order_items first
+
+Pair counts are kept current by order.placed jobs; job workers rebuild the index
+every RELATED_REBUILD_SECONDS and publish it in MySQL, where web workers
+fetch it. Run --full once after deploying, or whenever order history was
+changed outside of checkout.
+"""
+
+import argparse
+import time
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.models import db
+from app.services import related
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the related products index.')
+    parser.add_argument('--full', action='store_true',
+                        help='recount product pairs from order history first')
+    args = parser.parse_args()
+
+    db.init_db()
+
+    if args.full:
+        started = time.perf_counter()
+        pairs = db.rebuild_product_pairs()
+        print(f"✓ Recounted {pairs} product pairs in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    result = related.build_index()
+    print(f"✓ Indexed {result['pairs']} pairs for {result['products']} products "
+          f"in {time.perf_counter() - started:.1f}s")
+    print(f"✅ Wrote and published {os.path.abspath(result['path'])}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error building related index: {e}")
+        sys.exit(1)
@@ -0,0 +1,71 @@
+"""
+Abandoned cart expiry and cart table hygiene.
+
+Usage:
+    python expire_carts.py                      # delete carts idle past CART_RETENTION_DAYS
+    python expire_carts.py --dry-run            # only count what would be deleted
+    python expire_carts.py --days 14 --batch-size 200 --pause 0.5
+    python expire_carts.py --optimize           # also rebuild cart_items afterwards
+
+Run daily from a scheduler. A cart is abandoned when its newest line is
+older than the retention window; it is deleted in small batches so the job
+never holds long locks or lets the replica fall behind. With sharding, every
+shard is processed in turn.
+"""
+
+import argparse
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.models import db
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Expire abandoned carts.')
+    parser.add_argument('--days', type=int, default=db.CART_RETENTION_DAYS,
+                        help='retention window in days (default: %(default)s)')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--pause', type=float, default=0.1,
+                        help='seconds to sleep between batches (default: %(default)s)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='only count carts that would be deleted')
+    parser.add_argument('--optimize', action='store_true',
+                        help='rebuild cart_items after purging to reclaim space')
+    args = parser.parse_args()
+
+    db.init_db()
+    shards = db.get_shard_map().shard_names() if db.SHARD_CONFIG else ['global']
+
+    total = 0
+    for shard in shards:
+        if args.dry_run:
+            counts = db.count_abandoned_cart_items(args.days, shard)
+            print(f"Would delete {counts['rows']} line(s) of {counts['carts']} cart(s) on {shard}")
+            continue
+
+        def report(deleted, elapsed):
+            rate = deleted / elapsed if elapsed else 0.0
+            print(f"  {shard}: {deleted} rows deleted ({rate:.0f} rows/s)")
+
+        result = db.expire_abandoned_carts(
+            args.days, args.batch_size, args.pause, shard, progress=report,
+        )
+        total += result['deleted']
+        print(f"✓ {shard}: purged {result['deleted']} rows in {result['seconds']}s "
+              f"({result['rows_per_second']} rows/s)")
+
+        if args.optimize and result['deleted']:
+            db.optimize_cart_table(shard)
+            print(f"✓ {shard}: rebuilt cart_items")
+
+    if not args.dry_run:
+        print(f"✅ Cart expiry complete — {total} rows purged")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error during cart expiry: {e}")
+        sys.exit(1)
@@ -0,0 +1,53 @@
+"""
+Stream a full table export to a file or stdout with flat memory use.
+
+Usage:
+    python export_data.py orders --format ndjson --gzip -o orders.ndjson.gz
+    python export_data.py products > products.csv
+"""
+
+import argparse
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.models import db
+from app.services import export
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export a table as CSV or NDJSON.')
+    parser.add_argument('dataset', choices=sorted(db.EXPORT_QUERIES))
+    parser.add_argument('--format', choices=sorted(export.FORMATS), default='csv')
+    parser.add_argument('--gzip', action='store_true', help='gzip-compress the output')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('-o', '--output', help='output file (default: stdout)')
+    args = parser.parse_args()
+
+    rows = db.stream_rows(args.dataset, args.chunk_size)
+    columns = next(rows)
+    stats = export.ExportStats()
+    body = export.encode(args.format, columns, rows, stats)
+
+    if args.gzip:
+        body = export.gzip_stream(body)
+        out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    else:
+        out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+
+    try:
+        for chunk in body:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+    print(f"✓ Exported {args.dataset}: {stats.summary()}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error exporting data: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,47 @@
+"""
+Recompute demand forecasts and stock-out projections.
+
+Usage:
+    python forecast.py                  # refresh projections for every product
+    python forecast.py --show 7         # also list products out of stock within 7 days
+
+Job workers refresh projections every FORECAST_INTERVAL_SECONDS; run this to
+refresh on demand. Results are served by GET /api/admin/inventory/stockouts.
+"""
+
+import argparse
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.models import db
+from app.services import forecast
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh stock-out projections.')
+    parser.add_argument('--show', type=int, metavar='DAYS',
+                        help='list products projected to run out within DAYS')
+    args = parser.parse_args()
+
+    db.init_db()
+
+    result = forecast.run_forecast()
+    print(f"✓ Forecast {result['products']} products in {result['seconds']}s "
+          f"(compute {result['compute_seconds']}s)")
+    print(f"✅ {result['at_risk']} product(s) projected to run out within "
+          f"{forecast.STOCKOUT_HORIZON_DAYS} days")
+
+    if args.show is not None:
+        for row in db.get_projected_stockouts(args.show, limit=1000):
+            print(f"  #{row['product_id']:<8} {row['name'][:40]:<40} stock={row['stock']:<6} "
+                  f"demand/day={row['daily_demand']}  cover={row['days_of_cover']}d "
+                  f"({row['stockout_date']})")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error during forecasting: {e}")
+        sys.exit(1)
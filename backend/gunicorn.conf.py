@@ -1,7 +1,9 @@
 """Gunicorn configuration file."""
 import os
 import logging
+import signal
 import sys
+import threading
 
 # Get port from environment (Railway sets this)
 port = os.environ.get('PORT', '8080')
@@ -21,14 +23,29 @@ logger.info(f"PORT environment variable: {port}")
 bind = bind_address
 
 # Worker configuration
-workers = 1
-worker_class = "sync"
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+# "sync" for run:app; uvicorn.workers.UvicornWorker for the ASGI app (asgi:app)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
 worker_connections = 1000
 timeout = 120
 keepalive = 2
 
+# Worker rotation
+# Recycle workers after this many requests (0 disables); the jitter keeps
+# them from all restarting at once.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+# Time an old worker gets to finish in-flight requests after TERM
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+# On a reload (HUP) gunicorn forks the new workers and TERMs the old ones
+# right away, while the new ones are still warming up. Old workers keep
+# accepting for this long after TERM so traffic never waits on a cold one.
+DRAIN_OVERLAP_SECONDS = float(os.environ.get('GUNICORN_DRAIN_OVERLAP_SECONDS', 5))
+
 # Logging
-accesslog = "-"
+# Access lines come from the app's async, sampled JSON request log instead
+# of gunicorn's synchronous access log (see app/services/request_log.py).
+accesslog = None
 errorlog = "-"
 loglevel = "info"
 
@@ -48,8 +65,33 @@ def when_ready(server):
     logger.info(f"Workers: {workers}")
     logger.info("=" * 60)
 
+def _delay_shutdown(worker):
+    """Replace the worker's TERM handler with one that stops accepting later."""
+    def stop_accepting():
+        worker.alive = False
+        # Wake the accept loop so it notices
+        os.write(worker.PIPE[1], b"1")
+
+    def handle_term(signum, frame):
+        if getattr(worker, '_draining', False):
+            return
+        worker._draining = True
+        logger.info(f"Worker {worker.pid} draining, stops accepting in {DRAIN_OVERLAP_SECONDS}s")
+        timer = threading.Timer(DRAIN_OVERLAP_SECONDS, stop_accepting)
+        timer.daemon = True
+        timer.start()
+
+    signal.signal(signal.SIGTERM, handle_term)
+
 def post_worker_init(worker):
-    """Called just after a worker has been forked."""
+    """Called just after a worker has been forked, before it accepts requests."""
+    from app.services.warmup import warm_worker
+    # The ASGI app wraps the Flask app; warm-up drives the Flask app directly
+    timings = warm_worker(getattr(worker.wsgi, 'flask_app', worker.wsgi))
+    logger.info(f"Worker {worker.pid} warmed up in {sum(timings.values()):.0f} ms")
+    # Async workers install their own signal handling when they start serving
+    if DRAIN_OVERLAP_SECONDS > 0 and worker_class == 'sync':
+        _delay_shutdown(worker)
     logger.info(f"Worker {worker.pid} initialized and ready to accept requests")
     logger.info(f"Worker {worker.pid} is listening on {bind_address}")
 
@@ -0,0 +1,35 @@
+"""
+Script to rebuild the sales rollup tables from existing orders.
+Run this once after upgrading, or if rollups were ever edited by hand.
+
+Usage:
+    python rebuild_rollups.py                     # every day still in MySQL, on every shard
+    python rebuild_rollups.py --since 2026-01-01  # only from that day on
+
+Rollups for archived months are left as they are.
+"""
+
+import argparse
+import sys
+import os
+from datetime import date
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.models import db
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild the sales rollups from orders.')
+    parser.add_argument('--since', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                        help='rebuild from this day on (default: every day still in MySQL)')
+    args = parser.parse_args()
+
+    print("🔧 Rebuilding sales rollups from orders...")
+    try:
+        db.init_db()
+        since = db.rebuild_sales_rollups(args.since)
+        scope = f"from {since}" if since is not None else "for every day"
+        print(f"✅ Sales rollups rebuilt {scope}!")
+    except Exception as e:
+        print(f"❌ Error rebuilding rollups: {e}")
+        sys.exit(1)
@@ -54,6 +54,8 @@ def reset_order_tables():
                     product_price DECIMAL(10, 2) NOT NULL,
                     quantity INT NOT NULL,
                     subtotal DECIMAL(10, 2) NOT NULL,
+                    discount DECIMAL(10, 2) NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (order_id) REFERENCES orders(id) ON DELETE CASCADE,
                     FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE SET NULL
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
@@ -0,0 +1,77 @@
+"""
+Inspect the shard map and move user ranges between shards online.
+
+Usage:
+    python reshard.py                                   # show the shard map
+    python reshard.py --move 100000 150000 --to s2      # move users [100000, 150000) to s2
+    python reshard.py --move 100000 150000 --to s2 --dry-run
+
+Shards are configured with SHARD_MAP (see app/models/sharding.py). A move
+keeps serving the range throughout; writes for it pause only while recent
+orders and carts are re-synced.
+"""
+
+import argparse
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.models import db
+
+
+def show_map():
+    for entry in db.get_shard_map(refresh=True).ranges:
+        state = entry['state']
+        if entry['target']:
+            state += f" -> {entry['target']}"
+        print(f"  [{entry['lo']}, {entry['hi']})  {entry['shard']:<12} {state}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect and rebalance user shards.')
+    parser.add_argument('--move', nargs=2, type=int, metavar=('LO', 'HI'),
+                        help='move users with LO <= user_id < HI')
+    parser.add_argument('--to', help='target shard of --move')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--dry-run', action='store_true',
+                        help='only show what --move would copy')
+    args = parser.parse_args()
+
+    if db.SHARD_CONFIG is None:
+        print("❌ Sharding is not configured — set SHARD_MAP first")
+        sys.exit(1)
+
+    db.init_db()
+
+    if not args.move:
+        print("Shard map:")
+        show_map()
+        return
+    if not args.to:
+        parser.error('--move requires --to')
+
+    lo, hi = args.move
+    source = db.get_shard_map(refresh=True).lookup(lo)['shard']
+    if args.dry_run:
+        counts = db.count_user_rows(source, lo, hi)
+        print(f"Would move users [{lo}, {hi}) from {source} to {args.to}:")
+        for table, count in counts.items():
+            print(f"  {table}: {count} rows")
+        return
+
+    result = db.move_user_range(
+        lo, hi, args.to, batch_size=args.batch_size,
+        progress=lambda message: print(f"✓ {message}"),
+    )
+    for table, count in result['deleted'].items():
+        print(f"✓ Removed {count} {table} rows from {result['source']}")
+    print(f"✅ Users [{lo}, {hi}) now live on {result['target']}")
+    show_map()
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Error during resharding: {e}")
+        sys.exit(1)
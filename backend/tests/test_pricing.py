@@ -0,0 +1,188 @@
+"""Unit tests for cart pricing; no database needed (rules are passed in or stubbed)."""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app.services import pricing
+
+NOW = datetime(2026, 1, 15, 12, 0)
+
+
+def rule(name, kind, scope, value, target=None, **extra):
+    return {'name': name, 'kind': kind, 'scope': scope, 'target': target,
+            'value': Decimal(value), **extra}
+
+
+def item(product_id, price, quantity, category=None):
+    return {'product_id': product_id, 'price': Decimal(price), 'quantity': quantity,
+            'category': category}
+
+
+@pytest.fixture(autouse=True)
+def fresh_plan(monkeypatch):
+    monkeypatch.setattr(pricing, '_plan', None)
+    monkeypatch.setattr(pricing, '_plan_loaded_at', 0.0)
+
+
+# Cent arithmetic
+@pytest.mark.parametrize('value, cents', [
+    (Decimal('19.99'), 1999),
+    ('0.005', 1),
+    ('0.004', 0),
+    (10, 1000),
+    (0.1 + 0.2, 30),
+    (Decimal('-1.005'), -101),
+])
+def test_to_cents_rounds_half_up(value, cents):
+    assert pricing.to_cents(value) == cents
+
+
+def test_cents_to_decimal_has_two_places():
+    assert pricing.cents_to_decimal(1999) == Decimal('19.99')
+    assert str(pricing.cents_to_decimal(500)) == '5.00'
+
+
+def test_percent_of_rounds_half_up():
+    assert pricing._percent_of(105, Decimal('0.10')) == 11
+    assert pricing._percent_of(104, Decimal('0.10')) == 10
+
+
+def test_allocate_sums_exactly_and_favours_largest():
+    assert pricing._allocate(100, [1, 1, 1]) == [34, 33, 33]
+    assert pricing._allocate(7, [300, 100]) == [6, 1]
+    assert pricing._allocate(0, [5, 5]) == [0, 0]
+    assert pricing._allocate(5, [0, 0]) == [0, 0]
+
+
+# Rule compilation
+def test_compiles_rules_by_scope():
+    plan = pricing.PricingPlan([
+        rule('VAT', 'tax', 'cart', '0.20'),
+        rule('Books tax', 'tax', 'category', '0.05', target='Books'),
+        rule('Pen tax', 'tax', 'product', '0', target='7'),
+        rule('Book sale', 'percent_off', 'category', '0.10', target='Books'),
+        rule('Pen deal', 'amount_off', 'product', '0.50', target='7'),
+        rule('Big cart', 'amount_off', 'cart', '5', min_subtotal=Decimal('50')),
+    ], now=NOW)
+
+    assert plan.default_tax == Decimal('0.20')
+    assert plan.tax_by_category == {'Books': Decimal('0.05')}
+    assert plan.tax_by_product == {7: Decimal('0')}
+    assert plan.promos_by_category == {'Books': [('Book sale', 'percent_off', Decimal('0.10'))]}
+    assert plan.promos_by_product == {7: [('Pen deal', 'amount_off', 50)]}
+    assert plan.cart_promos == [('Big cart', 'amount_off', 500, 5000)]
+    assert plan.valid_until is None
+
+
+def test_skips_inactive_and_out_of_window_rules():
+    later = NOW + timedelta(days=1)
+    plan = pricing.PricingPlan([
+        rule('Off', 'percent_off', 'cart', '0.5', active=0),
+        rule('Future', 'percent_off', 'cart', '0.5', starts_at=later),
+        rule('Past', 'percent_off', 'cart', '0.5', ends_at=NOW),
+        rule('Current', 'percent_off', 'cart', '0.1', ends_at=NOW + timedelta(hours=2)),
+    ], now=NOW)
+
+    assert [promo[0] for promo in plan.cart_promos] == ['Current']
+    # The next rule boundary after now is when the plan goes stale
+    assert plan.valid_until == NOW + timedelta(hours=2)
+    assert plan.is_current(NOW)
+    assert not plan.is_current(NOW + timedelta(hours=2))
+
+
+# Pricing
+def test_best_line_promotion_wins_and_promotions_do_not_stack():
+    plan = pricing.PricingPlan([
+        rule('Tax', 'tax', 'cart', '0'),
+        rule('Ten off', 'percent_off', 'category', '0.10', target='Books'),
+        rule('Two off', 'amount_off', 'product', '2', target='1'),
+    ], now=NOW)
+
+    priced = plan.price([item(1, '15.00', 2, 'Books')])
+
+    assert priced['lines'][0]['discount'] == 400
+    assert priced['discount'] == 400
+    assert priced['total'] == 2600
+    assert priced['promotions'] == ['Two off']
+
+
+def test_amount_off_never_exceeds_unit_price():
+    plan = pricing.PricingPlan([
+        rule('Tax', 'tax', 'cart', '0'),
+        rule('Huge', 'amount_off', 'product', '100', target='1'),
+    ], now=NOW)
+
+    priced = plan.price([item(1, '3.00', 2)])
+
+    assert priced['total'] == 0
+    assert priced['discount'] == 600
+
+
+def test_cart_promotion_needs_min_subtotal():
+    plan = pricing.PricingPlan([
+        rule('Tax', 'tax', 'cart', '0'),
+        rule('Five off', 'amount_off', 'cart', '5', min_subtotal=Decimal('50')),
+    ], now=NOW)
+
+    assert plan.price([item(1, '49.99', 1)])['discount'] == 0
+    assert plan.price([item(1, '50.00', 1)])['discount'] == 500
+
+
+def test_cart_discount_is_spread_over_lines_and_tax_groups():
+    plan = pricing.PricingPlan([
+        rule('VAT', 'tax', 'cart', '0.20'),
+        rule('Food tax', 'tax', 'category', '0.05', target='Food'),
+        rule('Ten percent', 'percent_off', 'cart', '0.10'),
+    ], now=NOW)
+
+    priced = plan.price([item(1, '10.00', 1, 'Food'), item(2, '20.01', 1, 'Toys')])
+
+    # 10% of 30.01 rounds to 3.00; the leftover cent goes to the larger line
+    assert [line['cart_discount'] for line in priced['lines']] == [99, 201]
+    assert sum(line['total'] - line['cart_discount'] for line in priced['lines']) == priced['total']
+    assert priced['total'] == 2701
+    # 5% of 9.01 plus 20% of 18.00
+    assert priced['tax'] == 45 + 360
+    assert priced['grand_total'] == priced['total'] + priced['tax']
+
+
+def test_serialize_converts_cents():
+    plan = pricing.PricingPlan([rule('Tax', 'tax', 'cart', '0.10')], now=NOW)
+    result = pricing.serialize(plan.price([item(1, '9.99', 1)]))
+    assert result == {'subtotal': 9.99, 'discount': 0.0, 'total': 9.99, 'tax': 1.0,
+                      'grand_total': 10.99, 'promotions': []}
+
+
+# Plan cache
+def test_get_plan_compiles_once_and_reloads_after_invalidate(monkeypatch):
+    loads = []
+    monkeypatch.setattr(pricing.db, 'get_pricing_rules', lambda: loads.append(1) or [])
+
+    plan = pricing.get_plan()
+    assert pricing.get_plan() is plan
+    assert len(loads) == 1
+
+    pricing.invalidate()
+    reloaded = pricing.get_plan()
+    assert reloaded is not None and reloaded is not plan
+    assert len(loads) == 2
+
+
+def test_get_plan_reloads_when_invalidated_while_waiting_for_lock(monkeypatch):
+    monkeypatch.setattr(pricing.db, 'get_pricing_rules', lambda: [])
+    stale = pricing.PricingPlan([], now=NOW)
+    monkeypatch.setattr(pricing, '_plan', stale)
+    monkeypatch.setattr(pricing, '_plan_loaded_at', -pricing.RULES_TTL_SECONDS - 1.0)
+
+    @contextmanager
+    def lock_after_invalidate():
+        # invalidate() runs between the unlocked read and taking the lock
+        pricing._plan = None
+        yield
+
+    monkeypatch.setattr(pricing, '_plan_lock', lock_after_invalidate())
+    plan = pricing.get_plan()
+
+    assert plan is not None and plan is not stale
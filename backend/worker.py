@@ -0,0 +1,60 @@
+"""
+Background job worker.
+
+Usage:
+    python worker.py                    # run jobs until SIGTERM/SIGINT
+    python worker.py --once             # run one batch of due jobs and exit
+    python worker.py --dead             # list dead-lettered jobs
+    python worker.py --retry-dead [ID ...]  # requeue dead jobs (all, or the given ids)
+
+Run as many workers as needed; they share the MySQL jobs table without
+blocking each other.
+"""
+
+import argparse
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.models import db
+from app.services import jobs, request_log
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run background jobs.')
+    parser.add_argument('--once', action='store_true', help='run one batch and exit')
+    parser.add_argument('--dead', action='store_true', help='list dead-lettered jobs')
+    parser.add_argument('--retry-dead', nargs='*', type=int, metavar='ID',
+                        help='requeue dead-lettered jobs')
+    args = parser.parse_args()
+
+    db.init_db()
+
+    if args.dead:
+        dead = db.get_jobs('dead')
+        for job in dead:
+            error = (job['last_error'] or '').strip().splitlines()
+            print(f"  #{job['id']} {job['kind']} attempts={job['attempts']} "
+                  f"updated={job['updated_at']} error={error[-1] if error else '-'}")
+        print(f"{len(dead)} dead job(s)")
+        return
+
+    if args.retry_dead is not None:
+        count = db.retry_dead_jobs(args.retry_dead)
+        print(f"✓ Requeued {count} dead job(s)")
+        return
+
+    request_log.configure_logging('worker')
+    worker = jobs.Worker()
+    if args.once:
+        print(f"✓ Ran {worker.run_once()} job(s)")
+        return
+    worker.run()
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Worker error: {e}")
+        sys.exit(1)
@@ -94,12 +94,16 @@ function displayCartItems(items) {
 
 // Update cart summary
 function updateSummary(data) {
-    const subtotal = parseFloat(data.total || 0);
-    const tax = subtotal * 0.1;
-    const total = subtotal + tax;
+    // Totals come from the server-side pricing engine (same as checkout)
+    const subtotal = parseFloat(data.subtotal || 0);
+    const discount = parseFloat(data.discount || 0);
+    const tax = parseFloat(data.tax || 0);
+    const total = parseFloat(data.grand_total || 0);
     
     document.getElementById('itemCount').textContent = data.item_count || 0;
     document.getElementById('subtotal').textContent = `$${subtotal.toFixed(2)}`;
+    document.getElementById('discount').textContent = `-$${discount.toFixed(2)}`;
+    document.getElementById('discountRow').style.display = discount > 0 ? 'flex' : 'none';
     document.getElementById('tax').textContent = `$${tax.toFixed(2)}`;
     document.getElementById('total').textContent = `$${total.toFixed(2)}`;
 }
@@ -121,7 +125,7 @@ async function updateQuantity(cartItemId, newQuantity) {
         const response = await fetch(`${API_URL}/cart/${cartItemId}`, {
             method: 'PUT',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ quantity: newQuantity })
+            body: JSON.stringify({ quantity: newQuantity, user_id: USER_ID })
         });
         
         const data = await response.json();
@@ -144,7 +148,7 @@ async function removeItem(cartItemId) {
     }
     
     try {
-        const response = await fetch(`${API_URL}/cart/${cartItemId}`, {
+        const response = await fetch(`${API_URL}/cart/${cartItemId}?user_id=${USER_ID}`, {
             method: 'DELETE'
         });
         
@@ -170,10 +174,8 @@ async function checkout() {
         
         if (response.ok && data.cart_items && data.cart_items.length > 0) {
             // Process checkout
-            const checkoutResponse = await fetch(`${API_URL}/orders/checkout`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ user_id: USER_ID })
+            const checkoutResponse = await postIdempotent(`${API_URL}/orders/checkout`, {
+                user_id: USER_ID
             });
             
             const checkoutData = await checkoutResponse.json();
@@ -198,6 +200,25 @@ async function checkout() {
     }
 }
 
+// POST with an Idempotency-Key so a network retry cannot apply twice
+async function postIdempotent(url, body, retries = 1) {
+    const key = crypto.randomUUID();
+    for (let attempt = 0; ; attempt++) {
+        try {
+            return await fetch(url, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Idempotency-Key': key
+                },
+                body: JSON.stringify(body)
+            });
+        } catch (error) {
+            if (attempt >= retries) throw error;
+        }
+    }
+}
+
 // Show success popup
 function showSuccessPopup(orderId, total) {
     // Create popup backdrop
@@ -5,10 +5,17 @@ This can be deployed separately on Railway for the frontend.
 from flask import Flask, send_from_directory, send_file
 from flask_cors import CORS
 import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from app.services import request_log
 
 app = Flask(__name__, static_folder='.', static_url_path='')
 CORS(app)
 
+# Async JSON request logging (sampled; errors and slow requests always logged)
+request_log.init_app(app, 'frontend')
+
 # Health check endpoint
 @app.route('/health')
 def health():
@@ -20,14 +27,13 @@ def index():
     try:
         current_dir = os.path.dirname(os.path.abspath(__file__))
         index_path = os.path.join(current_dir, 'index.html')
-        app.logger.info(f"Serving index.html from: {index_path}")
         if os.path.exists(index_path):
             return send_file(index_path)
         else:
             app.logger.error(f"index.html not found at: {index_path}")
             return "index.html not found", 404
     except Exception as e:
-        app.logger.error(f"Error serving index.html: {e}")
+        app.logger.exception("Error serving index.html")
         return f"Error: {str(e)}", 500
 
 # Serve other HTML files and static assets
@@ -60,12 +66,9 @@ def serve_file(filename):
                 app.logger.warning(f"File not found: {file_path}")
                 return "File not found", 404
         
-        app.logger.info(f"Serving file: {file_path}")
         return send_file(file_path)
     except Exception as e:
-        app.logger.error(f"Error serving {filename}: {e}")
-        import traceback
-        app.logger.error(traceback.format_exc())
+        app.logger.exception("Error serving file", extra={'filename': filename})
         return f"Error: {str(e)}", 500
 
 if __name__ == '__main__':
@@ -101,7 +101,7 @@ function displayOrders(orders) {
 // View order details
 async function viewOrderDetails(orderId) {
     try {
-        const response = await fetch(`${API_URL}/orders/detail/${orderId}`);
+        const response = await fetch(`${API_URL}/orders/detail/${orderId}?user_id=${USER_ID}`);
         const data = await response.json();
         
         if (response.ok) {
@@ -188,7 +188,7 @@ function showOrderDetailModal(order) {
 // Update cart badge
 async function updateCartBadge() {
     try {
-        const response = await fetch(`${API_URL}/cart/${USER_ID}`);
+        const response = await fetch(`${API_URL}/cart/${USER_ID}/count`);
         const data = await response.json();
         
         if (response.ok) {
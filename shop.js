@@ -1,11 +1,17 @@
 const API_URL = 'https://stationary-app-production.up.railway.app/api';
 let allProducts = [];
 let currentUser = null;
+// Local catalog copy kept current via /products/changes
+let productIndex = new Map();
+let catalogSince = null;
+const CATALOG_SYNC_INTERVAL = 60000;
 
 // Initialize
 document.addEventListener('DOMContentLoaded', function() {
     loadProducts();
+    loadCategoryFacets();
     updateCartBadge();
+    setInterval(syncProducts, CATALOG_SYNC_INTERVAL);
     
     // Event listeners
     document.getElementById('searchInput').addEventListener('input', filterProducts);
@@ -31,14 +37,13 @@ async function loadProducts() {
         loading.style.display = 'block';
         errorMessage.style.display = 'none';
         
-        const response = await fetch(`${API_URL}/products`);
-        const data = await response.json();
+        const data = await fetchProductChanges();
         
-        if (response.ok) {
-            allProducts = data.products || [];
+        if (data) {
+            applyProductChanges(data);
             displayProducts(allProducts);
         } else {
-            throw new Error(data.error || 'Failed to load products');
+            throw new Error('Failed to load products');
         }
     } catch (error) {
         console.error('Error loading products:', error);
@@ -50,6 +55,60 @@ async function loadProducts() {
     }
 }
 
+// Fetch catalog changes since the last sync (full snapshot on first call)
+async function fetchProductChanges() {
+    const query = catalogSince ? `?since=${encodeURIComponent(catalogSince)}` : '';
+    const response = await fetch(`${API_URL}/products/changes${query}`);
+    const data = await response.json();
+    return response.ok ? data : null;
+}
+
+// Merge a change set into the local catalog copy
+function applyProductChanges(data) {
+    if (data.reset) {
+        productIndex = new Map();
+    }
+    (data.products || []).forEach(product => productIndex.set(product.id, product));
+    (data.deleted || []).forEach(id => productIndex.delete(id));
+    catalogSince = data.since;
+    
+    allProducts = Array.from(productIndex.values()).sort((a, b) =>
+        (Date.parse(b.created_at) - Date.parse(a.created_at)) || (b.id - a.id)
+    );
+    return (data.products || []).length + (data.deleted || []).length;
+}
+
+// Refresh the local catalog in the background
+async function syncProducts() {
+    try {
+        const data = await fetchProductChanges();
+        if (data && applyProductChanges(data) > 0) {
+            filterProducts();
+            loadCategoryFacets();
+        }
+    } catch (error) {
+        console.error('Error syncing products:', error);
+    }
+}
+
+// Fill the category filter from server-side facet counts
+async function loadCategoryFacets() {
+    try {
+        const response = await fetch(`${API_URL}/products/facets`);
+        if (!response.ok) return;
+        const data = await response.json();
+        const select = document.getElementById('categoryFilter');
+        const selected = select.value;
+        select.innerHTML = `<option value="">All Categories (${data.total})</option>` +
+            data.categories.map(facet => `
+                <option value="${facet.category}">${facet.category} (${facet.count})</option>
+            `).join('');
+        select.value = selected;
+    } catch (error) {
+        console.error('Error loading category facets:', error);
+    }
+}
+
 // Display products
 function displayProducts(products) {
     const productsGrid = document.getElementById('productsGrid');
@@ -73,7 +132,7 @@ function displayProducts(products) {
 
 // Create product card HTML
 function createProductCard(product) {
-    const imageUrl = product.image_url || 'https://via.placeholder.com/300x200?text=Product+Image';
+    const imageUrl = imageVariant(product.image_url, 'thumb') || 'https://via.placeholder.com/300x200?text=Product+Image';
     const stockStatus = product.stock > 0 ? 'in-stock' : 'out-of-stock';
     const stockText = product.stock > 0 ? `${product.stock} in stock` : 'Out of stock';
     
@@ -104,6 +163,12 @@ function createProductCard(product) {
     `;
 }
 
+// Map a locally stored image URL to one of its pre-generated variants
+function imageVariant(url, variant) {
+    const match = url && url.match(/^(.*\/api\/images\/[0-9a-f]{64})\.\w+$/);
+    return match ? `${match[1]}/${variant}.webp` : url;
+}
+
 // Filter products
 function filterProducts() {
     const searchTerm = document.getElementById('searchInput').value.toLowerCase();
@@ -112,7 +177,7 @@ function filterProducts() {
     const filtered = allProducts.filter(product => {
         const matchesSearch = product.name.toLowerCase().includes(searchTerm) ||
                             (product.description && product.description.toLowerCase().includes(searchTerm));
-        const matchesCategory = !category || product.category === category;
+        const matchesCategory = !category || (product.category || 'Uncategorized') === category;
         return matchesSearch && matchesCategory;
     });
     
@@ -123,7 +188,7 @@ function filterProducts() {
 function viewProduct(product) {
     const modal = document.getElementById('productModal');
     const modalBody = document.getElementById('modalBody');
-    const imageUrl = product.image_url || 'https://via.placeholder.com/400x300?text=Product+Image';
+    const imageUrl = imageVariant(product.image_url, 'medium') || 'https://via.placeholder.com/400x300?text=Product+Image';
     
     modalBody.innerHTML = `
         <div class="product-detail">
@@ -146,9 +211,44 @@ function viewProduct(product) {
                 </button>
             </div>
         </div>
+        <div id="relatedProducts" class="related-products" style="display: none;"></div>
     `;
     
     modal.style.display = 'block';
+    loadRelatedProducts(product.id);
+}
+
+// "Frequently bought together" — the API returns ids; details come from the local catalog
+async function loadRelatedProducts(productId) {
+    try {
+        const response = await fetch(`${API_URL}/products/${productId}/related?limit=6`);
+        if (!response.ok) return;
+        const data = await response.json();
+        const related = (data.related || [])
+            .map(entry => productIndex.get(entry.product_id))
+            .filter(Boolean);
+        const container = document.getElementById('relatedProducts');
+        if (!container || related.length === 0) return;
+
+        container.innerHTML = `
+            <h3>Frequently bought together</h3>
+            <div class="related-list">
+                ${related.map(item => `
+                    <div class="related-item" data-id="${item.id}">
+                        <img src="${imageVariant(item.image_url, 'thumb') || 'https://via.placeholder.com/120x90?text=Product'}" alt="${item.name}" loading="lazy">
+                        <div>${item.name}</div>
+                        <div class="product-price">$${parseFloat(item.price).toFixed(2)}</div>
+                    </div>
+                `).join('')}
+            </div>
+        `;
+        container.querySelectorAll('.related-item').forEach(element => {
+            element.addEventListener('click', () => viewProduct(productIndex.get(Number(element.dataset.id))));
+        });
+        container.style.display = 'block';
+    } catch (error) {
+        console.error('Error loading related products:', error);
+    }
 }
 
 // Add to cart
@@ -157,16 +257,10 @@ async function addToCart(product) {
     const userId = 1;
     
     try {
-        const response = await fetch(`${API_URL}/cart`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                user_id: userId,
-                product_id: product.id,
-                quantity: 1
-            })
+        const response = await postIdempotent(`${API_URL}/cart`, {
+            user_id: userId,
+            product_id: product.id,
+            quantity: 1
         });
         
         const data = await response.json();
@@ -186,12 +280,31 @@ async function addToCart(product) {
     }
 }
 
+// POST with an Idempotency-Key so a network retry cannot apply twice
+async function postIdempotent(url, body, retries = 1) {
+    const key = crypto.randomUUID();
+    for (let attempt = 0; ; attempt++) {
+        try {
+            return await fetch(url, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Idempotency-Key': key
+                },
+                body: JSON.stringify(body)
+            });
+        } catch (error) {
+            if (attempt >= retries) throw error;
+        }
+    }
+}
+
 // Update cart badge
 async function updateCartBadge() {
     const userId = 1; // Demo user
     
     try {
-        const response = await fetch(`${API_URL}/cart/${userId}`);
+        const response = await fetch(`${API_URL}/cart/${userId}/count`);
         const data = await response.json();
         
         if (response.ok) {